@@ -1,11 +1,12 @@
 from logging.config import fileConfig
 
-from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
 
 # Import your models
+from data.config import DATABASE_URL
+from database.backend import create_sync_engine, sync_url
 from database.db import Base
 from database.models import Channel, Settings, ScheduledPost
 
@@ -42,7 +43,7 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = config.get_main_option("sqlalchemy.url")
+    url = sync_url(DATABASE_URL)
     context.configure(
         url=url,
         target_metadata=target_metadata,
@@ -61,11 +62,8 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section, {}),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
+    # Same URL and connection profile as the bot (DATABASE_URL), not sqlalchemy.url from alembic.ini
+    connectable = create_sync_engine(poolclass=pool.NullPool)
 
     with connectable.connect() as connection:
         context.configure(
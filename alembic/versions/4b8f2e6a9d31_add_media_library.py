@@ -0,0 +1,43 @@
+"""Add media_library table
+
+Revision ID: 4b8f2e6a9d31
+Revises: 9c4e7a2d5f18
+Create Date: 2026-10-19 21:48:12.530914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8f2e6a9d31'
+down_revision: Union[str, Sequence[str], None] = '9c4e7a2d5f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('media_library',
+    sa.Column('file_unique_id', sa.String(), nullable=False),
+    sa.Column('file_id', sa.String(), nullable=False),
+    sa.Column('media_type', sa.String(), nullable=False),
+    sa.Column('file_size', sa.BigInteger(), nullable=True),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=True),
+    sa.Column('file_name', sa.String(), nullable=True),
+    sa.Column('uses', sa.Integer(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('file_unique_id')
+    )
+    op.create_index(op.f('ix_media_library_last_used_at'), 'media_library', ['last_used_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_media_library_last_used_at'), table_name='media_library')
+    op.drop_table('media_library')
@@ -0,0 +1,93 @@
+"""Add bot_id to bot-owned tables (multi-bot tenancy)
+
+Revision ID: 5d1c8f3b7a60
+Revises: 4b8f2e6a9d31
+Create Date: 2026-10-19 22:31:54.206187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from data.config import BOT_TOKENS
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1c8f3b7a60'
+down_revision: Union[str, Sequence[str], None] = '4b8f2e6a9d31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('channels', 'bot_settings', 'scheduled_posts', 'published_messages', 'publish_outbox')
+# Existing rows belong to the bot that ran until now, the primary one; rows left
+# NULL (no token configured here) are adopted by the bot at startup instead
+PRIMARY_BOT_ID = int(BOT_TOKENS[0].split(':')[0]) if BOT_TOKENS else None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.add_column(table, sa.Column('bot_id', sa.BigInteger(), nullable=True))
+        op.create_index(op.f(f'ix_{table}_bot_id'), table, ['bot_id'], unique=False)
+        if PRIMARY_BOT_ID is not None:
+            op.execute(sa.table(table, sa.column('bot_id', sa.BigInteger)).update().values(bot_id=PRIMARY_BOT_ID))
+
+    # file_id is only valid for the bot that received it: the library is keyed per bot.
+    # Without a known primary bot the old entries can't be attributed and are dropped;
+    # files are added again the next time they are sent.
+    op.create_table('media_library_new',
+    sa.Column('bot_id', sa.BigInteger(), nullable=False),
+    sa.Column('file_unique_id', sa.String(), nullable=False),
+    sa.Column('file_id', sa.String(), nullable=False),
+    sa.Column('media_type', sa.String(), nullable=False),
+    sa.Column('file_size', sa.BigInteger(), nullable=True),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=True),
+    sa.Column('file_name', sa.String(), nullable=True),
+    sa.Column('uses', sa.Integer(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('bot_id', 'file_unique_id')
+    )
+    columns = ('file_unique_id, file_id, media_type, file_size, width, height, duration, file_name, uses, '
+               'last_used_at, created_at')
+    if PRIMARY_BOT_ID is not None:
+        op.execute(f"INSERT INTO media_library_new (bot_id, {columns}) SELECT {PRIMARY_BOT_ID}, {columns} FROM media_library")
+    op.drop_index(op.f('ix_media_library_last_used_at'), table_name='media_library')
+    op.drop_table('media_library')
+    op.rename_table('media_library_new', 'media_library')
+    op.create_index('ix_media_library_bot_id_last_used_at', 'media_library', ['bot_id', 'last_used_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table('media_library_old',
+    sa.Column('file_unique_id', sa.String(), nullable=False),
+    sa.Column('file_id', sa.String(), nullable=False),
+    sa.Column('media_type', sa.String(), nullable=False),
+    sa.Column('file_size', sa.BigInteger(), nullable=True),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=True),
+    sa.Column('file_name', sa.String(), nullable=True),
+    sa.Column('uses', sa.Integer(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('file_unique_id')
+    )
+    columns = ('file_unique_id, file_id, media_type, file_size, width, height, duration, file_name, uses, '
+               'last_used_at, created_at')
+    # Only the primary bot's library fits the single-bot table
+    if PRIMARY_BOT_ID is not None:
+        op.execute(f"INSERT INTO media_library_old ({columns}) SELECT {columns} FROM media_library WHERE bot_id = {PRIMARY_BOT_ID}")
+    op.drop_index('ix_media_library_bot_id_last_used_at', table_name='media_library')
+    op.drop_table('media_library')
+    op.rename_table('media_library_old', 'media_library')
+    op.create_index(op.f('ix_media_library_last_used_at'), 'media_library', ['last_used_at'], unique=False)
+
+    for table in reversed(TABLES):
+        op.drop_index(op.f(f'ix_{table}_bot_id'), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('bot_id')
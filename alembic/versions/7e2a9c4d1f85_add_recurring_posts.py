@@ -0,0 +1,33 @@
+"""Add recurrence rule columns and the (status, run_date) index to scheduled_posts
+
+Revision ID: 7e2a9c4d1f85
+Revises: 5d1c8f3b7a60
+Create Date: 2026-10-19 23:12:40.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2a9c4d1f85'
+down_revision: Union[str, Sequence[str], None] = '5d1c8f3b7a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('scheduled_posts', sa.Column('recurrence', sa.String(), nullable=True))
+    op.add_column('scheduled_posts', sa.Column('timezone', sa.String(), nullable=True))
+    op.create_index('ix_scheduled_posts_status_run_date', 'scheduled_posts', ['status', 'run_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_scheduled_posts_status_run_date', table_name='scheduled_posts')
+    with op.batch_alter_table('scheduled_posts') as batch_op:
+        batch_op.drop_column('timezone')
+        batch_op.drop_column('recurrence')
@@ -0,0 +1,31 @@
+"""Add claim/lease columns to scheduled_posts
+
+Revision ID: 8d1e6b0c5a27
+Revises: 3f9c2a7d1b44
+Create Date: 2026-10-19 11:02:17.530941
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d1e6b0c5a27'
+down_revision: Union[str, Sequence[str], None] = '3f9c2a7d1b44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('scheduled_posts', sa.Column('claimed_by', sa.String(), nullable=True))
+    op.add_column('scheduled_posts', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('scheduled_posts') as batch_op:
+        batch_op.drop_column('lease_expires_at')
+        batch_op.drop_column('claimed_by')
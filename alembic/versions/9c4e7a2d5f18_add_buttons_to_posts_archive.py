@@ -0,0 +1,29 @@
+"""Add scheduled_posts_archive.buttons
+
+Revision ID: 9c4e7a2d5f18
+Revises: b3e8d1f4c967
+Create Date: 2026-10-19 21:05:37.418260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e7a2d5f18'
+down_revision: Union[str, Sequence[str], None] = 'b3e8d1f4c967'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('scheduled_posts_archive', sa.Column('buttons', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('scheduled_posts_archive') as batch_op:
+        batch_op.drop_column('buttons')
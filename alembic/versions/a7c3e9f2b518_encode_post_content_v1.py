@@ -0,0 +1,78 @@
+"""Encode post content with the v1 post model codec
+
+Revision ID: a7c3e9f2b518
+Revises: f1b7d3e8a046
+Create Date: 2026-10-19 17:35:41.502118
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9f2b518'
+down_revision: Union[str, Sequence[str], None] = 'f1b7d3e8a046'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MEDIA_TYPES = ('photo', 'video', 'document', 'audio')
+MEDIA_KEYS = ('type', 'file_id', 'caption', 'caption_entities')
+
+# The conversion is copied here on purpose: migrations must not change when utils/post_model.py does
+
+def _item(data):
+    return {key: data[key] for key in MEDIA_KEYS if data.get(key)}
+
+def to_v1(content):
+    if content is None or (isinstance(content, dict) and content.get('v') == 1):
+        return content
+    if isinstance(content, str):
+        return {'v': 1, 'text': content}
+    if isinstance(content, list):
+        return {'v': 1, 'type': 'album', 'items': [_item(item) for item in content if item.get('type') in MEDIA_TYPES]}
+    if 'text' in content:
+        data = {'v': 1, 'text': content.get('text') or ""}
+        if content.get('entities'):
+            data['entities'] = content['entities']
+        return data
+    return {'v': 1, **_item(content)}
+
+def to_legacy(content):
+    if not isinstance(content, dict) or content.get('v') != 1:
+        return content
+    data = {key: value for key, value in content.items() if key != 'v'}
+    if data.get('type') == 'album':
+        return data['items']
+    return data
+
+
+def _convert(convert):
+    conn = op.get_bind()
+    posts = sa.table('scheduled_posts', sa.column('id', sa.Integer), sa.column('content', sa.JSON))
+    for row_id, content in conn.execute(sa.select(posts.c.id, posts.c.content)).all():
+        new = convert(content)
+        if new != content:
+            conn.execute(posts.update().where(posts.c.id == row_id).values(content=new))
+
+    outbox = sa.table('publish_outbox', sa.column('id', sa.Integer), sa.column('payload', sa.JSON))
+    for row_id, payload in conn.execute(sa.select(outbox.c.id, outbox.c.payload)).all():
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        if not payload or 'content' not in payload:
+            continue
+        new = convert(payload['content'])
+        if new != payload['content']:
+            conn.execute(outbox.update().where(outbox.c.id == row_id).values(payload=dict(payload, content=new)))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _convert(to_v1)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _convert(to_legacy)
@@ -0,0 +1,45 @@
+"""Add scheduled_posts_archive and alert_storage.created_at
+
+Revision ID: b3e8d1f4c967
+Revises: a7c3e9f2b518
+Create Date: 2026-10-19 18:12:09.641733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8d1f4c967'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e9f2b518'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('scheduled_posts_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('chat_id', sa.BigInteger(), nullable=False),
+    sa.Column('run_date', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('preview', sa.String(), nullable=False),
+    sa.Column('alert_ids', sa.JSON(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_scheduled_posts_archive_run_date'), 'scheduled_posts_archive', ['run_date'], unique=False)
+    # Existing alerts keep created_at NULL and are never pruned: posts published right away
+    # only wrote the alert row, so nothing else refers to alerts still clickable in channels
+    op.add_column('alert_storage', sa.Column('created_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('alert_storage') as batch_op:
+        batch_op.drop_column('created_at')
+    op.drop_index(op.f('ix_scheduled_posts_archive_run_date'), table_name='scheduled_posts_archive')
+    op.drop_table('scheduled_posts_archive')
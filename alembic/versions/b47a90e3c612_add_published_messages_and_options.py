@@ -0,0 +1,41 @@
+"""Add published_messages table and scheduled post options
+
+Revision ID: b47a90e3c612
+Revises: 8d1e6b0c5a27
+Create Date: 2026-10-19 12:21:05.004816
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b47a90e3c612'
+down_revision: Union[str, Sequence[str], None] = '8d1e6b0c5a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('published_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('publication_id', sa.String(), nullable=False),
+    sa.Column('channel_id', sa.BigInteger(), nullable=False),
+    sa.Column('message_id', sa.BigInteger(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_published_messages_publication_id'), 'published_messages', ['publication_id'], unique=False)
+    op.add_column('scheduled_posts', sa.Column('options', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('scheduled_posts') as batch_op:
+        batch_op.drop_column('options')
+    op.drop_index(op.f('ix_published_messages_publication_id'), table_name='published_messages')
+    op.drop_table('published_messages')
@@ -0,0 +1,31 @@
+"""Add catch-up policy columns to channels
+
+Revision ID: c2f58d9e7a13
+Revises: b47a90e3c612
+Create Date: 2026-10-19 13:40:52.271664
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f58d9e7a13'
+down_revision: Union[str, Sequence[str], None] = 'b47a90e3c612'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('channels', sa.Column('catchup_policy', sa.String(), nullable=True))
+    op.add_column('channels', sa.Column('catchup_max_age_minutes', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('channels') as batch_op:
+        batch_op.drop_column('catchup_max_age_minutes')
+        batch_op.drop_column('catchup_policy')
@@ -0,0 +1,43 @@
+"""Add publish_outbox table
+
+Revision ID: d93b1f4e2c85
+Revises: c2f58d9e7a13
+Create Date: 2026-10-19 14:55:31.862047
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93b1f4e2c85'
+down_revision: Union[str, Sequence[str], None] = 'c2f58d9e7a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('publish_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('requested_by', sa.BigInteger(), nullable=True),
+    sa.Column('scheduled_post_id', sa.Integer(), nullable=True),
+    sa.Column('publication_id', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_publish_outbox_status'), 'publish_outbox', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_publish_outbox_status'), table_name='publish_outbox')
+    op.drop_table('publish_outbox')
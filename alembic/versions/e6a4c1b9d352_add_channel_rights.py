@@ -0,0 +1,35 @@
+"""Add bot rights health columns to channels
+
+Revision ID: e6a4c1b9d352
+Revises: d93b1f4e2c85
+Create Date: 2026-10-19 16:12:08.413927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a4c1b9d352'
+down_revision: Union[str, Sequence[str], None] = 'd93b1f4e2c85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('channels', sa.Column('can_post', sa.Boolean(), nullable=True))
+    op.add_column('channels', sa.Column('can_pin', sa.Boolean(), nullable=True))
+    op.add_column('channels', sa.Column('rights_checked_at', sa.DateTime(), nullable=True))
+    op.add_column('channels', sa.Column('rights_error', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('channels') as batch_op:
+        batch_op.drop_column('rights_error')
+        batch_op.drop_column('rights_checked_at')
+        batch_op.drop_column('can_pin')
+        batch_op.drop_column('can_post')
@@ -0,0 +1,33 @@
+"""Add alert_click_stats table
+
+Revision ID: f1b7d3e8a046
+Revises: e6a4c1b9d352
+Create Date: 2026-10-19 16:48:22.107345
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b7d3e8a046'
+down_revision: Union[str, Sequence[str], None] = 'e6a4c1b9d352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('alert_click_stats',
+    sa.Column('alert_id', sa.String(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('clicks', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('alert_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('alert_click_stats')
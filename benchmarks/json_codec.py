@@ -0,0 +1,29 @@
+"""Compare the available JSON libraries on a media group update: python -m benchmarks.json_codec"""
+import timeit
+
+from utils.json_codec import JSON_NAME, _LIBRARIES
+
+PHOTO = [{'file_id': 'AgACAgIAAxkBAAI' * 4, 'file_unique_id': 'AQADx', 'width': 1280, 'height': 960,
+          'file_size': 123456}] * 4
+UPDATE = {'update_id': 1, 'message': {'message_id': 7, 'date': 1760000000, 'media_group_id': '1354',
+                                      'chat': {'id': 42, 'type': 'private', 'first_name': 'Админ'},
+                                      'caption': "Подпись " * 40, 'photo': PHOTO}}
+
+
+def benchmark(rounds: int = 2000):
+    batch = [UPDATE] * 10
+    for name, factory in _LIBRARIES.items():
+        try:
+            lib_dumps, lib_loads = factory()
+        except ImportError:
+            print(f"{name:>6}: not installed")
+            continue
+        encoded = lib_dumps(batch)
+        dump = timeit.timeit(lambda: lib_dumps(batch), number=rounds) / rounds
+        load = timeit.timeit(lambda: lib_loads(encoded), number=rounds) / rounds
+        print(f"{name:>6}: dumps {dump * 1e6:.1f} us, loads {load * 1e6:.1f} us per 10 updates")
+    print(f"In use: {JSON_NAME}")
+
+
+if __name__ == '__main__':
+    benchmark()
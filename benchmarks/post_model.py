@@ -0,0 +1,36 @@
+"""Encode/decode cost and memory per draft of the post model codec: python -m benchmarks.post_model"""
+import json
+import timeit
+import tracemalloc
+
+from utils.post_model import decode_content, encode_content
+
+DRAFTS = {
+    'text': {'text': "<b>Hello</b> world " * 20},
+    'media': {'type': 'photo', 'file_id': 'AgACAgIAAxkBAAI' * 4, 'caption': "Caption " * 10},
+    'album': [{'type': 'photo', 'file_id': f'AgACAgIAAxkBAAI{i}' * 4, 'caption': "Caption" if i == 0 else ""} for i in range(10)],
+}
+
+
+def benchmark(rounds: int = 20000):
+    for name, legacy in DRAFTS.items():
+        encoded = json.dumps(encode_content(legacy))
+        decode = timeit.timeit(lambda: decode_content(json.loads(encoded)), number=rounds) / rounds
+        typed = decode_content(legacy)
+        encode = timeit.timeit(lambda: json.dumps(typed.to_dict()), number=rounds) / rounds
+
+        tracemalloc.start()
+        kept = [decode_content(json.loads(encoded)) for _ in range(1000)]
+        typed_bytes = tracemalloc.get_traced_memory()[0] / len(kept)
+        tracemalloc.stop()
+        tracemalloc.start()
+        kept = [json.loads(encoded) for _ in range(1000)]
+        dict_bytes = tracemalloc.get_traced_memory()[0] / len(kept)
+        tracemalloc.stop()
+
+        print(f"{name:>5}: decode {decode * 1e6:.1f} us, encode {encode * 1e6:.1f} us, "
+              f"{len(encoded)} bytes encoded, ~{typed_bytes:.0f} B typed vs ~{dict_bytes:.0f} B dict in memory")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,64 @@
+"""Concurrent writers/readers on a scratch SQLite file, stock settings vs tuned: python -m benchmarks.sqlite_backend"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine
+
+from database.backend import apply_sqlite_profile, sqlite_pragmas
+
+
+def run(pragmas: Dict[str, Any], writers: int, readers: int, rounds: int):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+    # No connect_args: the default run keeps sqlite3's own 5 s busy timeout, as the app had before
+    engine = create_engine(f"sqlite:///{path}")
+    if pragmas:
+        apply_sqlite_profile(engine, pragmas)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE posts (id INTEGER PRIMARY KEY, status TEXT, body TEXT)")
+    stats = {'locked': 0, 'wait': 0.0}
+    lock = threading.Lock()
+
+    def work(write: bool):
+        for i in range(rounds):
+            started = time.perf_counter()
+            while True:
+                try:
+                    with engine.begin() as conn:
+                        if write:
+                            conn.exec_driver_sql("INSERT INTO posts (status, body) VALUES ('pending', ?)", ("x" * 500,))
+                        else:
+                            conn.exec_driver_sql("SELECT count(*) FROM posts WHERE status = 'pending'").scalar()
+                    break
+                except Exception as e:
+                    if not isinstance(getattr(e, 'orig', None), sqlite3.OperationalError):
+                        raise
+                    with lock:
+                        stats['locked'] += 1
+                    time.sleep(0.001)
+            with lock:
+                stats['wait'] += time.perf_counter() - started
+
+    threads = [threading.Thread(target=work, args=(i < writers,)) for i in range(writers + readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return elapsed, stats
+
+def benchmark(writers: int = 8, readers: int = 8, rounds: int = 200):
+    for name, pragmas in (('default', {}), ('tuned', sqlite_pragmas())):
+        elapsed, stats = run(pragmas, writers, readers, rounds)
+        operations = (writers + readers) * rounds
+        print(f"{name:>7}: {elapsed:.2f} s total, {stats['locked']} 'database is locked' retries, "
+              f"{stats['wait'] / operations * 1000:.2f} ms average per operation")
+
+
+if __name__ == '__main__':
+    benchmark()
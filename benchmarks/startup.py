@@ -0,0 +1,100 @@
+"""
+Cold start, time to first update: python -m benchmarks.startup
+
+Starts a fake Bot API server, runs `main.py` against it (TELEGRAM_API_URL) with a
+scratch database, feeds it one /start and waits for the reply. Exits non-zero when
+the reply takes longer than STARTUP_BUDGET_SECONDS. tests/test_startup.py runs the
+same measurement.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+from aiohttp import web
+
+from data.config import STARTUP_BUDGET_SECONDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_ID = 1001
+USER = {'id': ADMIN_ID, 'is_bot': False, 'first_name': "Admin"}
+BOT_USER = {'id': 42, 'is_bot': True, 'first_name': "Bench", 'username': "bench_bot"}
+
+
+async def time_to_first_update(timeout: float = 60) -> Tuple[float, List[str]]:
+    """Seconds from process start to the reply to /start, and the bot's "Startup" log lines."""
+    replied = asyncio.get_running_loop().create_future()
+    delivered = False
+
+    async def api(request: web.Request) -> web.Response:
+        nonlocal delivered
+        method = request.match_info['method']
+        result = True
+        if method == 'getMe':
+            result = BOT_USER
+        elif method == 'getUpdates':
+            if delivered:
+                await asyncio.sleep(1)
+                result = []
+            else:
+                delivered = True
+                result = [{'update_id': 1, 'message': {
+                    'message_id': 1, 'date': int(time.time()), 'text': "/start", 'from': USER,
+                    'chat': {'id': ADMIN_ID, 'type': 'private', 'first_name': "Admin"},
+                    'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}]}}]
+        elif method == 'getChatMember':
+            result = {'status': 'member', 'user': USER}
+        elif method == 'sendMessage':
+            result = {'message_id': 2, 'date': int(time.time()), 'text': "ok", 'from': BOT_USER,
+                      'chat': {'id': ADMIN_ID, 'type': 'private', 'first_name': "Admin"}}
+            if not replied.done():
+                replied.set_result(time.perf_counter())
+        return web.json_response({'ok': True, 'result': result})
+
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', api)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    scratch = tempfile.mkdtemp()
+    env = dict(os.environ, BOT_TOKEN="42:bench", ADMIN_IDS=str(ADMIN_ID), WORKERS="1",
+               TELEGRAM_API_URL=f"http://127.0.0.1:{port}",
+               DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(scratch, 'bench.sqlite')}")
+    env.pop('BOT_TOKENS', None)
+    # -P: the repo's alembic/ directory must not shadow the alembic package
+    await asyncio.to_thread(
+        subprocess.run, [sys.executable, '-P', '-c', 'from alembic.config import main; main(["-q", "upgrade", "head"])'],
+        cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'main.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        first_reply = await asyncio.wait_for(replied, timeout)
+    finally:
+        process.terminate()
+        # The fake server keeps answering while the bot shuts down
+        try:
+            output = (await asyncio.to_thread(process.communicate, None, 10))[0]
+        except subprocess.TimeoutExpired:
+            process.kill()
+            output = process.communicate()[0]
+        await runner.cleanup()
+    return first_reply - started, [line for line in output.splitlines() if "Startup" in line]
+
+def benchmark(budget: float = STARTUP_BUDGET_SECONDS, timeout: float = 60) -> float:
+    elapsed, lines = asyncio.run(time_to_first_update(timeout))
+    for line in lines:
+        print(line)
+    print(f"Time to first update: {elapsed:.2f}s (budget {budget:.1f}s)")
+    return elapsed
+
+
+if __name__ == '__main__':
+    sys.exit(1 if benchmark() > STARTUP_BUDGET_SECONDS else 0)
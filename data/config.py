@@ -1,9 +1,102 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 # Load .env from data directory
 load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Several bots in one process (comma-separated); they share the database, scheduler and caches.
+# The first one is the primary bot; BOT_TOKEN alone means a single bot.
+BOT_TOKENS = [token.strip() for token in os.getenv("BOT_TOKENS", BOT_TOKEN or "").split(",") if token.strip()]
+# Logging: LOG_FORMAT 'json' (one JSON object per line) or 'text'
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Share of alert clicks that get a log record
+LOG_SAMPLE_ALERT_CLICKS = float(os.getenv("LOG_SAMPLE_ALERT_CLICKS", "0.01"))
+
+# Base URL of a local Bot API server (or a fake one in benchmarks); empty = api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+# Cold start budget: process start to polling, warned about at boot and checked by python -m benchmarks.startup
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
 ADMIN_IDS = [int(id_str) for id_str in os.getenv("ADMIN_IDS", "").split(",") if id_str.strip()]
-DATABASE_URL = f"sqlite+aiosqlite:///{os.path.join(os.path.dirname(__file__), 'database.sqlite')}"
\ No newline at end of file
+# Async SQLAlchemy URL; point it at a server database (e.g. postgresql+asyncpg://...) to share it between instances
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(os.path.dirname(__file__), 'database.sqlite')}")
+# Connection pool per process for server databases
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+# SQLite profile applied to every connection (WAL journal is always on)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "128"))
+
+# JSON library for DB columns, FSM data and Bot API responses: 'auto' (orjson > ujson > json), 'orjson', 'ujson', 'json'
+JSON_LIBRARY = os.getenv("JSON_LIBRARY", "auto")
+
+# Worker mode: a front process receives updates and shards them by user across N workers.
+# WORKERS=1 keeps the classic single-process polling.
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+# Optional webhook for the front process (polling is used when WEBHOOK_URL is empty)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+
+# Updates handled at once per process; updates of one user always run one after another
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "50"))
+
+# Throttling of non-admin updates (in memory, before any filter): token bucket per user,
+# at most one "Access Denied" reply per window, and a temporary ban after a flood of dropped updates
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "1"))
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "5"))
+THROTTLE_DENY_WINDOW = int(os.getenv("THROTTLE_DENY_WINDOW", "60"))
+THROTTLE_BAN_AFTER = int(os.getenv("THROTTLE_BAN_AFTER", "20"))
+THROTTLE_BAN_SECONDS = int(os.getenv("THROTTLE_BAN_SECONDS", "600"))
+
+# Identifies this instance when claiming scheduled posts (several instances may share one DB)
+INSTANCE_ID = os.getenv("INSTANCE_ID", f"{socket.gethostname()}-{os.getpid()}")
+PUBLISH_LEASE_SECONDS = int(os.getenv("PUBLISH_LEASE_SECONDS", "120"))
+
+# Startup catch-up for posts that became due while the bot was down.
+# Policy: 'publish' (send all, staggered), 'skip' (send only if younger than max age), 'ask' (admins decide).
+# Channels can override policy / max age with their own columns.
+CATCHUP_POLICY = os.getenv("CATCHUP_POLICY", "skip")
+CATCHUP_MAX_AGE_MINUTES = int(os.getenv("CATCHUP_MAX_AGE_MINUTES", "360"))
+CATCHUP_STAGGER_SECONDS = float(os.getenv("CATCHUP_STAGGER_SECONDS", "2"))
+
+# Publish outbox retries
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "5"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "3600"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+
+# Publish executor: one ordered lane per channel, shared worker pool, Bot API rate limits
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", "8"))
+GLOBAL_RATE_PER_SECOND = float(os.getenv("GLOBAL_RATE_PER_SECOND", "25"))
+CHANNEL_RATE_PER_MINUTE = float(os.getenv("CHANNEL_RATE_PER_MINUTE", "20"))
+
+# Coalesced dispatch: warn when the last post of a batch goes out later than this after its run_date
+DISPATCH_LAG_TARGET_SECONDS = float(os.getenv("DISPATCH_LAG_TARGET_SECONDS", "30"))
+
+# Pre-flight checks (channel rights, file_ids, button URLs) run this long before a post's run_date
+PREFLIGHT_MINUTES = int(os.getenv("PREFLIGHT_MINUTES", "10"))
+
+# Background check of the bot's rights in every channel
+CHANNEL_HEALTH_INTERVAL = int(os.getenv("CHANNEL_HEALTH_INTERVAL", "1800"))
+CHANNEL_HEALTH_CONCURRENCY = int(os.getenv("CHANNEL_HEALTH_CONCURRENCY", "5"))
+
+# Alert button clicks are counted in memory and written to alert_click_stats this often
+CLICK_FLUSH_INTERVAL = int(os.getenv("CLICK_FLUSH_INTERVAL", "30"))
+
+# Retention: published/failed posts older than RETENTION_DAYS move to scheduled_posts_archive (0 = keep forever).
+# Alerts of archived posts are kept for ALERT_RETENTION_DAYS after their run date (0 = forever).
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "30"))
+ALERT_RETENTION_DAYS = int(os.getenv("ALERT_RETENTION_DAYS", "180"))
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "500"))
+RETENTION_INTERVAL_HOURS = int(os.getenv("RETENTION_INTERVAL_HOURS", "24"))
+# Optional JSONL file that receives the full rows before they are archived
+RETENTION_EXPORT_PATH = os.getenv("RETENTION_EXPORT_PATH", "")
+# Pages freed per incremental vacuum step (each step is its own short transaction)
+VACUUM_STEP_PAGES = int(os.getenv("VACUUM_STEP_PAGES", "256"))
@@ -0,0 +1,68 @@
+"""
+Engine configuration shared by the bot, the scheduler jobstore and Alembic.
+
+DATABASE_URL picks the backend. SQLite (the default) gets a tuned profile applied
+on every new connection: WAL journal so readers don't block the writer, a busy
+timeout instead of instant "database is locked", NORMAL sync (safe with WAL),
+a bigger page cache and memory-mapped reads. Server databases (PostgreSQL, MySQL)
+get a connection pool with pre-ping instead; several instances can then share one
+database, claims and the outbox already coordinate through it.
+
+The app uses the async URL; the scheduler and Alembic use its sync twin.
+"""
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+from data.config import (DATABASE_URL, DB_POOL_SIZE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_SYNCHRONOUS,
+                         SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE_MB)
+
+# async driver -> sync driver of the same backend
+SYNC_DRIVERS = {'aiosqlite': None, 'asyncpg': 'psycopg2', 'psycopg_async': 'psycopg', 'aiomysql': 'pymysql', 'asyncmy': 'pymysql'}
+
+
+def is_sqlite(url: str = DATABASE_URL) -> bool:
+    return make_url(url).get_backend_name() == 'sqlite'
+
+def sync_url(url: str = DATABASE_URL) -> str:
+    parsed = make_url(url)
+    driver = parsed.get_driver_name()
+    if driver in SYNC_DRIVERS:
+        backend = parsed.get_backend_name()
+        parsed = parsed.set(drivername=f"{backend}+{SYNC_DRIVERS[driver]}" if SYNC_DRIVERS[driver] else backend)
+    return parsed.render_as_string(hide_password=False)
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    return {
+        'journal_mode': 'WAL',
+        'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+        'synchronous': SQLITE_SYNCHRONOUS,
+        # Negative cache_size is in KiB
+        'cache_size': -SQLITE_CACHE_SIZE_KB,
+        'mmap_size': SQLITE_MMAP_SIZE_MB * 1024 * 1024,
+    }
+
+def apply_sqlite_profile(engine: Engine, pragmas: Dict[str, Any] = None):
+    """Run the pragmas on every new DBAPI connection (sync engine, or async_engine.sync_engine)."""
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def engine_options(url: str = DATABASE_URL) -> Dict[str, Any]:
+    if is_sqlite(url):
+        return {}
+    return {'pool_size': DB_POOL_SIZE, 'max_overflow': DB_POOL_SIZE, 'pool_pre_ping': True, 'pool_recycle': 1800}
+
+def create_sync_engine(url: str = DATABASE_URL, **kwargs) -> Engine:
+    """Sync engine for APScheduler and Alembic with the same profile as the app engine."""
+    options = {} if 'poolclass' in kwargs else engine_options(url)
+    engine = create_engine(sync_url(url), **options, **kwargs)
+    if is_sqlite(url):
+        apply_sqlite_profile(engine)
+    return engine
@@ -0,0 +1,168 @@
+"""
+Atomic claiming of scheduled posts.
+
+Several bot instances may load the same APScheduler jobstore and fire the same job.
+Before publishing, an instance claims the row with a single UPDATE ... WHERE
+(`pending -> publishing`, owner + lease expiry); only the instance whose UPDATE
+matched the row publishes it. Leases are renewed while publishing, and rows whose
+lease expired (instance died mid-publish) are put back to `pending`.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import update, select, or_, and_
+
+from data.config import INSTANCE_ID, PUBLISH_LEASE_SECONDS
+from database.db import get_db_session
+from database.models import ScheduledPost
+
+
+def _utcnow() -> datetime:
+    # run_date / lease columns are stored as naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+async def claim_post(post_id: int, owner: str = INSTANCE_ID, lease_seconds: int = PUBLISH_LEASE_SECONDS) -> bool:
+    """Try to take ownership of a post. Returns True only for the single winner."""
+    now = _utcnow()
+    async for session in get_db_session():
+        result = await session.execute(
+            update(ScheduledPost)
+            .where(
+                ScheduledPost.id == post_id,
+                or_(
+                    ScheduledPost.status == 'pending',
+                    # Expired lease of a crashed instance can be taken over directly
+                    and_(ScheduledPost.status == 'publishing', ScheduledPost.lease_expires_at < now),
+                ),
+            )
+            .values(status='publishing', claimed_by=owner, lease_expires_at=now + timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return result.rowcount == 1
+    return False
+
+async def renew_lease(post_id: int, owner: str = INSTANCE_ID, lease_seconds: int = PUBLISH_LEASE_SECONDS) -> bool:
+    async for session in get_db_session():
+        result = await session.execute(
+            update(ScheduledPost)
+            .where(ScheduledPost.id == post_id, ScheduledPost.status == 'publishing', ScheduledPost.claimed_by == owner)
+            .values(lease_expires_at=_utcnow() + timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return result.rowcount == 1
+    return False
+
+async def finish_post(post_id: int, status: str, owner: str = INSTANCE_ID) -> bool:
+    """Move a claimed post to its final status ('published' / 'failed'), only if we still own it."""
+    async for session in get_db_session():
+        result = await session.execute(
+            update(ScheduledPost)
+            .where(ScheduledPost.id == post_id, ScheduledPost.status == 'publishing', ScheduledPost.claimed_by == owner)
+            .values(status=status, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return result.rowcount == 1
+    return False
+
+async def claim_posts(post_ids: List[int], owner: str, lease_seconds: int = PUBLISH_LEASE_SECONDS) -> List[int]:
+    """
+    Batch version of claim_post: one UPDATE for all ids, then read back which rows we won.
+    `owner` must be unique per batch (e.g. INSTANCE_ID + batch uuid) for the read-back to be exact.
+    """
+    if not post_ids:
+        return []
+    now = _utcnow()
+    async for session in get_db_session():
+        await session.execute(
+            update(ScheduledPost)
+            .where(
+                ScheduledPost.id.in_(post_ids),
+                or_(
+                    ScheduledPost.status == 'pending',
+                    and_(ScheduledPost.status == 'publishing', ScheduledPost.lease_expires_at < now),
+                ),
+            )
+            .values(status='publishing', claimed_by=owner, lease_expires_at=now + timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        result = await session.execute(
+            select(ScheduledPost.id).where(
+                ScheduledPost.id.in_(post_ids), ScheduledPost.status == 'publishing', ScheduledPost.claimed_by == owner
+            )
+        )
+        return list(result.scalars().all())
+    return []
+
+async def renew_leases(post_ids: List[int], owner: str, lease_seconds: int = PUBLISH_LEASE_SECONDS) -> int:
+    async for session in get_db_session():
+        result = await session.execute(
+            update(ScheduledPost)
+            .where(ScheduledPost.id.in_(post_ids), ScheduledPost.status == 'publishing', ScheduledPost.claimed_by == owner)
+            .values(lease_expires_at=_utcnow() + timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return result.rowcount
+    return 0
+
+async def finish_posts(post_ids: List[int], status: str, owner: str) -> int:
+    if not post_ids:
+        return 0
+    async for session in get_db_session():
+        result = await session.execute(
+            update(ScheduledPost)
+            .where(ScheduledPost.id.in_(post_ids), ScheduledPost.status == 'publishing', ScheduledPost.claimed_by == owner)
+            .values(status=status, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return result.rowcount
+    return 0
+
+@asynccontextmanager
+async def hold_lease(post_ids: List[int], owner: str = INSTANCE_ID, lease_seconds: int = PUBLISH_LEASE_SECONDS):
+    """Keep renewing the leases in the background while the body runs."""
+    async def keeper():
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            if not await renew_leases(post_ids, owner, lease_seconds):
+                return
+
+    task = asyncio.create_task(keeper())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+async def recover_expired_leases() -> List[int]:
+    """Put posts whose lease expired back to 'pending' and return their ids."""
+    now = _utcnow()
+    async for session in get_db_session():
+        result = await session.execute(
+            select(ScheduledPost.id).where(ScheduledPost.status == 'publishing', ScheduledPost.lease_expires_at < now)
+        )
+        expired_ids = list(result.scalars().all())
+        if not expired_ids:
+            return []
+        # Same condition again in the UPDATE so a concurrent renewal wins
+        result = await session.execute(
+            update(ScheduledPost)
+            .where(ScheduledPost.id.in_(expired_ids), ScheduledPost.status == 'publishing', ScheduledPost.lease_expires_at < now)
+            .values(status='pending', claimed_by=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        if result.rowcount != len(expired_ids):
+            # Some were renewed in between; report only the ones actually reset
+            result = await session.execute(
+                select(ScheduledPost.id).where(ScheduledPost.id.in_(expired_ids), ScheduledPost.status == 'pending')
+            )
+            expired_ids = list(result.scalars().all())
+        return expired_ids
+    return []
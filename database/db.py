@@ -1,8 +1,13 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from data.config import DATABASE_URL
+from database.backend import apply_sqlite_profile, engine_options, is_sqlite
+from utils.json_codec import dumps, loads
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+engine = create_async_engine(DATABASE_URL, echo=False, json_serializer=dumps, json_deserializer=loads,
+                             **engine_options(DATABASE_URL))
+if is_sqlite(DATABASE_URL):
+    apply_sqlite_profile(engine.sync_engine)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 class Base(DeclarativeBase):
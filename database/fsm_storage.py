@@ -0,0 +1,58 @@
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from database.db import get_db_session
+from database.models import FSMRecord
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    FSM storage backed by the `fsm_storage` table.
+    Used in worker mode so every process sees the same state; updates of one user
+    always land on the same worker, so plain read-modify-write is safe here.
+    """
+
+    def __init__(self, key_builder: Optional[KeyBuilder] = None):
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        new_state = state.state if isinstance(state, State) else state
+        async for session in get_db_session():
+            record = await session.get(FSMRecord, self.key_builder.build(key))
+            if record is None:
+                if new_state is None:
+                    return
+                record = FSMRecord(key=self.key_builder.build(key), data={})
+                session.add(record)
+            record.state = new_state
+            if record.state is None and not record.data:
+                await session.delete(record)
+            await session.commit()
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        async for session in get_db_session():
+            record = await session.get(FSMRecord, self.key_builder.build(key))
+            return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        async for session in get_db_session():
+            record = await session.get(FSMRecord, self.key_builder.build(key))
+            if record is None:
+                if not data:
+                    return
+                record = FSMRecord(key=self.key_builder.build(key), state=None)
+                session.add(record)
+            record.data = dict(data)
+            if record.state is None and not record.data:
+                await session.delete(record)
+            await session.commit()
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        async for session in get_db_session():
+            record = await session.get(FSMRecord, self.key_builder.build(key))
+            return dict(record.data) if record and record.data else {}
+
+    async def close(self) -> None:
+        pass
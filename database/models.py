@@ -1,7 +1,8 @@
-from sqlalchemy import BigInteger, String, Integer, DateTime, JSON
+from sqlalchemy import BigInteger, String, Integer, Boolean, Date, DateTime, Index, JSON, func
 from sqlalchemy.orm import Mapped, mapped_column
 from database.db import Base
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
 
 class User(Base):
     __tablename__ = 'users'
@@ -15,13 +16,24 @@ class Channel(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     telegram_id: Mapped[int] = mapped_column(BigInteger, unique=True)
+    # Bot that posts here (see utils/tenants.py); a channel belongs to one bot
+    bot_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True, index=True)
     title: Mapped[str] = mapped_column(String)
     added_by: Mapped[int] = mapped_column(BigInteger)
+    # Overrides for overdue posts after downtime (None = global CATCHUP_* settings)
+    catchup_policy: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    catchup_max_age_minutes: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # Bot rights from the last background health check (None = not checked yet), see utils/channel_health.py
+    can_post: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
+    can_pin: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
+    rights_checked_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    rights_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
 
 class Settings(Base):
     __tablename__ = 'bot_settings'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bot_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True, index=True)
     access_denied_text: Mapped[str] = mapped_column(String, default="Access Denied.")
     # language column here is deprecated in favor of User table, but keeping for compatibility or global fallback if needed
 
@@ -30,15 +42,119 @@ class ScheduledPost(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     chat_id: Mapped[int] = mapped_column(BigInteger)
-    # content will store JSON: {'text': ..., 'entities': [...], 'media': [...]}
+    bot_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True, index=True)
+    # content stores the versioned post model encoding, see utils/post_model.py
     content: Mapped[dict] = mapped_column(JSON) 
     buttons: Mapped[list] = mapped_column(JSON)
     run_date: Mapped[datetime] = mapped_column(DateTime)
     status: Mapped[str] = mapped_column(String, default="pending") 
+    # Set while an instance is publishing ('publishing' status); see database/claims.py
+    claimed_by: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # {'is_pinned': bool, 'is_silent': bool, 'extra_channel_ids': [channel DB ids to replicate to]}
+    options: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    # Cron rule (minute hour day month weekday) read in `timezone`; run_date is then the next
+    # occurrence and the row stays 'pending' between occurrences, see utils/recurrence.py
+    recurrence: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    timezone: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+
+    # The dispatcher looks for pending rows whose run_date has passed
+    __table_args__ = (Index('ix_scheduled_posts_status_run_date', 'status', 'run_date'),)
 
 class AlertStorage(Base):
     """Stores text for alert buttons to handle callback data limits."""
     __tablename__ = 'alert_storage'
 
     id: Mapped[str] = mapped_column(String, primary_key=True) # UUID
-    text: Mapped[str] = mapped_column(String)
\ No newline at end of file
+    text: Mapped[str] = mapped_column(String)
+    # Unreferenced alerts younger than a day are kept: they may belong to a draft in progress
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, default=func.now())
+
+class ArchivedPost(Base):
+    """Compact copy of a published/failed scheduled post, moved here by utils/retention.py."""
+    __tablename__ = 'scheduled_posts_archive'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)  # id it had in scheduled_posts
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    run_date: Mapped[datetime] = mapped_column(DateTime, index=True)
+    status: Mapped[str] = mapped_column(String)
+    kind: Mapped[str] = mapped_column(String)  # 'text', 'media', 'album'
+    preview: Mapped[str] = mapped_column(String)  # first 200 characters of the plain text
+    # Alert buttons of the post stay clickable in the channel, so their ids are kept
+    alert_ids: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    # Keyboard of the post, so published copies can still be edited (None for rows archived before it was kept)
+    buttons: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+class FSMRecord(Base):
+    """Persistent FSM state/data, shared by all worker processes."""
+    __tablename__ = 'fsm_storage'
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    data: Mapped[dict] = mapped_column(JSON, default=dict)
+
+
+class PublishedMessage(Base):
+    """Every message sent to a channel (album parts and the separate keyboard message included)."""
+    __tablename__ = 'published_messages'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Groups all messages of one publication across channels
+    publication_id: Mapped[str] = mapped_column(String, index=True)
+    bot_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True, index=True)
+    channel_id: Mapped[int] = mapped_column(BigInteger)  # Telegram chat id
+    message_id: Mapped[int] = mapped_column(BigInteger)
+    kind: Mapped[str] = mapped_column(String)  # 'content', 'album', 'keyboard'
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+
+class OutboxItem(Base):
+    """A publish request waiting for (or being retried by) the outbox worker."""
+    __tablename__ = 'publish_outbox'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # {'channel_ids': [channel DB ids], 'content': ..., 'buttons': [...], 'is_pinned': bool, 'is_silent': bool}
+    payload: Mapped[dict] = mapped_column(JSON)
+    # Bot that publishes it
+    bot_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True, index=True)
+    # 'pending' -> 'processing' -> 'done' | 'pending' (retry) | 'dead'
+    status: Mapped[str] = mapped_column(String, default="pending", index=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime)
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    requested_by: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # admin to notify
+    scheduled_post_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    publication_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+class AlertClickStat(Base):
+    """Clicks on an alert button per day, written in batches by utils/click_stats.py."""
+    __tablename__ = 'alert_click_stats'
+
+    alert_id: Mapped[str] = mapped_column(String, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    clicks: Mapped[int] = mapped_column(Integer, default=0)
+
+class MediaItem(Base):
+    """A file admins sent to the bot, once per bot and file_unique_id; see utils/media_library.py."""
+    __tablename__ = 'media_library'
+
+    # file_id only works for the bot that received it, so each bot has its own library
+    bot_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    # Same file for every upload; file_id differs per upload, the latest one is kept
+    file_unique_id: Mapped[str] = mapped_column(String, primary_key=True)
+    file_id: Mapped[str] = mapped_column(String)
+    media_type: Mapped[str] = mapped_column(String)  # 'photo', 'video', 'document', 'audio'
+    file_size: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    width: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    height: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    duration: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    file_name: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    uses: Mapped[int] = mapped_column(Integer, default=1)
+    # The library lists a bot's most recently used files first
+    last_used_at: Mapped[datetime] = mapped_column(DateTime)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+    __table_args__ = (Index('ix_media_library_bot_id_last_used_at', 'bot_id', 'last_used_at'),)
@@ -6,6 +6,7 @@ from sqlalchemy import select
 from data.config import ADMIN_IDS
 from database.db import get_db_session
 from database.models import Settings
+from utils.cache import settings_cache
 
 class AdminFilter(BaseFilter):
     async def __call__(self, event: Union[Message, CallbackQuery]) -> bool:
@@ -13,14 +14,19 @@ class AdminFilter(BaseFilter):
             return True
         
         # If not admin, send denied message and return False
-        async for session in get_db_session():
-            result = await session.execute(select(Settings))
-            settings = result.scalars().first()
-            denied_text = settings.access_denied_text if settings else "Access Denied."
-            
-            if isinstance(event, Message):
-                await event.answer(denied_text)
-            elif isinstance(event, CallbackQuery):
-                await event.answer(denied_text, show_alert=True)
-            
-            return False
\ No newline at end of file
+        # Each bot has its own settings row
+        bot_id = event.bot.id
+        denied_text = settings_cache.get(bot_id)
+        if denied_text is None:
+            async for session in get_db_session():
+                result = await session.execute(select(Settings).where(Settings.bot_id == bot_id))
+                settings = result.scalars().first()
+                denied_text = settings.access_denied_text if settings else "Access Denied."
+            settings_cache.set(bot_id, denied_text)
+
+        if isinstance(event, Message):
+            await event.answer(denied_text)
+        elif isinstance(event, CallbackQuery):
+            await event.answer(denied_text, show_alert=True)
+
+        return False
\ No newline at end of file
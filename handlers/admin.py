@@ -1,19 +1,33 @@
 from aiogram import Router, F, types
+from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from database.db import get_db_session
-from database.models import Settings, ScheduledPost, Channel, User
+from database.models import Settings, ScheduledPost, User, OutboxItem
 from utils.keyboards import get_main_menu
-from utils.texts import get_text
+from utils.texts import get_text, all_texts
+from utils.cache import user_lang_cache, settings_cache
+from utils.states import ImportState, PublishedState
+from utils.scheduler import scheduler, add_publish_jobs, PUBLISH_JOB
+from utils.bulk_import import import_posts, summarize
+from utils.outbox import stuck_items, retry_dead
+from utils.publish_executor import executor
+from middlewares.ordering import ordering
+from middlewares.throttling import throttling
+from utils.channel_registry import get_registry
+from utils.click_stats import clicks_by_alert
+from utils.bulk_edit import recent_publications, publication_messages, edit_publication, delete_publication
+from utils.preflight import check_button_urls
+from utils.post_model import decode_content, plain_text
 
 router = Router()
 
 class AdminState(StatesGroup):
     waiting_for_denied_text = State()
 
-@router.message(F.text.in_({"⚙️ Settings", "⚙️ Настройки"}))
+@router.message(F.text.in_(all_texts('main_menu_settings')))
 async def settings_menu(message: types.Message):
     from handlers.base import get_lang
     lang = await get_lang(message.from_user.id)
@@ -23,6 +37,10 @@ async def settings_menu(message: types.Message):
             inline_keyboard=[
                 [types.InlineKeyboardButton(text="🚫 Edit 'Access Denied' Text", callback_data="edit_denied_text")],
                 [types.InlineKeyboardButton(text="📅 View Scheduled Posts", callback_data="view_scheduled")],
+                [types.InlineKeyboardButton(text="📤 Outbox", callback_data="view_outbox"),
+                 types.InlineKeyboardButton(text="📊 Publish queues", callback_data="view_lanes")],
+                [types.InlineKeyboardButton(text="📈 Button stats", callback_data="view_click_stats"),
+                 types.InlineKeyboardButton(text="🗂 Published posts", callback_data="view_publications")],
                 [types.InlineKeyboardButton(text="🇷🇺 Switch to Russian / English 🇺🇸", callback_data="switch_lang")]
             ]
         )
@@ -41,6 +59,7 @@ async def switch_language(callback: types.CallbackQuery):
         new_lang = 'en' if user.language == 'ru' else 'ru'
         user.language = new_lang
         await session.commit()
+        user_lang_cache.invalidate(user_id)
         
         from handlers.base import get_lang
         lang = new_lang
@@ -60,14 +79,15 @@ async def edit_denied_text(callback: types.CallbackQuery, state: FSMContext):
 async def save_denied_text(message: types.Message, state: FSMContext):
     async for session in get_db_session():
         # Get or create settings
-        result = await session.execute(select(Settings))
+        result = await session.execute(select(Settings).where(Settings.bot_id == message.bot.id))
         settings = result.scalars().first()
         if not settings:
-            settings = Settings()
+            settings = Settings(bot_id=message.bot.id)
             session.add(settings)
         
         settings.access_denied_text = message.text
         await session.commit()
+    settings_cache.invalidate(message.bot.id)
     
     from handlers.base import get_lang
     lang = await get_lang(message.from_user.id)
@@ -78,7 +98,11 @@ async def save_denied_text(message: types.Message, state: FSMContext):
 async def view_scheduled(callback: types.CallbackQuery):
     async for session in get_db_session():
         # Get pending posts
-        result = await session.execute(select(ScheduledPost).where(ScheduledPost.status == 'pending').order_by(ScheduledPost.run_date))
+        result = await session.execute(
+            select(ScheduledPost)
+            .where(ScheduledPost.bot_id == callback.bot.id, ScheduledPost.status.in_(('pending', 'awaiting')))
+            .order_by(ScheduledPost.run_date)
+        )
         posts = result.scalars().all()
         
         if not posts:
@@ -89,10 +113,333 @@ async def view_scheduled(callback: types.CallbackQuery):
             return
 
         text = "📅 **Scheduled Posts:**\n\n"
+        registry = await get_registry(callback.bot.id)
+        rows = []
         for post in posts:
-            channel = await session.get(Channel, post.chat_id)
+            channel = registry.get(post.chat_id)
             channel_name = channel.title if channel else "Unknown"
-            text += f"🆔 {post.id} | 📢 {channel_name}\n🕒 {post.run_date}\n\n"
+            text += f"🆔 {post.id} | 📢 {channel_name}\n🕒 {post.run_date}\n"
+            if post.recurrence:
+                # run_date is the next occurrence
+                text += f"🔁 {post.recurrence} ({post.timezone})\n"
+                rows.append([types.InlineKeyboardButton(text=f"⏹ Stop repeating #{post.id}", callback_data=f"repeat_stop_{post.id}")])
+            text += "\n"
         
-        await callback.message.answer(text)
-        await callback.answer()
\ No newline at end of file
+        await callback.message.answer(text, reply_markup=types.InlineKeyboardMarkup(inline_keyboard=rows) if rows else None)
+        await callback.answer()
+
+@router.callback_query(F.data.startswith("repeat_stop_"))
+async def stop_repeating(callback: types.CallbackQuery):
+    post_id = int(callback.data.split("_")[-1])
+    async for session in get_db_session():
+        # Only between occurrences; one being sent right now moves on first
+        result = await session.execute(
+            update(ScheduledPost)
+            .where(ScheduledPost.id == post_id, ScheduledPost.bot_id == callback.bot.id,
+                   ScheduledPost.recurrence.is_not(None), ScheduledPost.status == 'pending')
+            .values(status='cancelled')
+        )
+        await session.commit()
+    if result.rowcount == 1:
+        await callback.answer(f"⏹ Post {post_id} won't repeat anymore.", show_alert=True)
+    else:
+        await callback.answer("Post is being published or already stopped, try again in a moment.", show_alert=True)
+
+@router.message(Command("import"))
+async def start_import(message: types.Message, state: FSMContext):
+    from handlers.base import get_lang
+    lang = await get_lang(message.from_user.id)
+    await message.answer(await get_text('import_prompt', lang))
+    await state.set_state(ImportState.waiting_for_file)
+
+@router.message(ImportState.waiting_for_file)
+async def process_import_file(message: types.Message, state: FSMContext):
+    from handlers.base import get_lang
+    lang = await get_lang(message.from_user.id)
+    document = message.document
+    if not document or not (document.file_name or '').lower().endswith(('.csv', '.jsonl', '.json', '.ndjson')):
+        await message.answer(await get_text('import_bad_file', lang))
+        return
+
+    file = await message.bot.download(document)
+    posts, errors = await import_posts(file.read(), document.file_name, message.bot.id)
+    if errors:
+        # Keep the report readable; the admin fixes the file and sends it again
+        shown = "\n".join(errors[:20]) + (f"\n... and {len(errors) - 20} more" if len(errors) > 20 else "")
+        await message.answer(await get_text('import_failed', lang, errors=shown), parse_mode=None)
+        return
+
+    # One scheduler wake for the whole batch
+    add_publish_jobs(posts)
+
+    registry = await get_registry(message.bot.id)
+    await message.answer(summarize(posts, registry.titles()), parse_mode=None)
+    await state.clear()
+
+
+# --- Catch-up decisions for posts that were due during downtime ---
+
+@router.callback_query(F.data.startswith("catchup_pub_"))
+async def catchup_publish(callback: types.CallbackQuery):
+    post_id = int(callback.data.split("_")[-1])
+    async for session in get_db_session():
+        result = await session.execute(
+            update(ScheduledPost)
+            .where(ScheduledPost.id == post_id, ScheduledPost.bot_id == callback.bot.id, ScheduledPost.status == 'awaiting')
+            .values(status='pending')
+        )
+        await session.commit()
+        if result.rowcount != 1:
+            await callback.answer("Already handled.", show_alert=True)
+            return
+    # Run as soon as possible through the normal scheduled path (claiming included)
+    scheduler.add_job(PUBLISH_JOB, 'date', args=[post_id], id=str(post_id), replace_existing=True)
+    await callback.message.edit_text(f"🚀 Post {post_id} is being published.")
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("catchup_skip_"))
+async def catchup_skip(callback: types.CallbackQuery):
+    post_id = int(callback.data.split("_")[-1])
+    async for session in get_db_session():
+        await session.execute(
+            update(ScheduledPost)
+            .where(ScheduledPost.id == post_id, ScheduledPost.bot_id == callback.bot.id, ScheduledPost.status == 'awaiting')
+            .values(status='skipped')
+        )
+        await session.commit()
+    await callback.message.edit_text(f"⏭ Post {post_id} skipped.")
+    await callback.answer()
+
+
+# --- Outbox ---
+
+@router.callback_query(F.data == "view_outbox")
+async def view_outbox(callback: types.CallbackQuery):
+    items = await stuck_items(callback.bot.id)
+    if not items:
+        await callback.message.answer("📤 Outbox is clear: nothing failed or stuck.")
+        await callback.answer()
+        return
+
+    text = "📤 Outbox: failing / dead items\n\n"
+    rows = []
+    for item in items:
+        icon = "💀" if item.status == 'dead' else "⏳"
+        text += f"{icon} #{item.id} | {item.status} | attempts: {item.attempts}\n"
+        if item.status != 'dead':
+            text += f"🕒 next try: {item.next_attempt_at:%d.%m.%Y %H:%M:%S} UTC\n"
+        text += f"⚠️ {(item.last_error or '')[:200]}\n\n"
+        if item.status == 'dead':
+            rows.append([types.InlineKeyboardButton(text=f"🔁 Retry #{item.id}", callback_data=f"outbox_retry_{item.id}")])
+
+    await callback.message.answer(text, parse_mode=None, reply_markup=types.InlineKeyboardMarkup(inline_keyboard=rows) if rows else None)
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("outbox_retry_"))
+async def outbox_retry(callback: types.CallbackQuery):
+    item_id = int(callback.data.split("_")[-1])
+    if await retry_dead(item_id, callback.bot.id):
+        await callback.answer(f"🔁 #{item_id} queued again.", show_alert=True)
+    else:
+        await callback.answer("Item is not dead anymore.", show_alert=True)
+
+
+@router.callback_query(F.data == "view_lanes")
+async def view_lanes(callback: types.CallbackQuery):
+    updates = ordering.stats()
+    text = (
+        f"📥 Updates: {updates['active']}/{updates['limit']} running | queued: {updates['queued']} | "
+        f"max wait: {updates['max_wait']:.1f}s | handled: {updates['processed']}\n"
+    )
+    if updates['busiest']:
+        text += "   waiting per user: " + ", ".join(f"{user_id}: {count}" for user_id, count in updates['busiest']) + "\n"
+    throttled = throttling.stats()
+    text += (
+        f"🚧 Non-admins: {throttled['denied']} denied | dropped: {throttled['dropped_denied']} repeat, "
+        f"{throttled['dropped_rate']} over limit, {throttled['dropped_banned']} banned | "
+        f"bans: {throttled['bans']} ({throttled['active_bans']} active)\n"
+    )
+
+    lanes = executor.stats()
+    if not lanes:
+        await callback.message.answer(text + "\n📊 No channel has been published to since startup.", parse_mode=None)
+        await callback.answer()
+        return
+
+    titles = {channel.telegram_id: channel.title for channel in (await get_registry(callback.bot.id)).entries}
+
+    text += "\n📊 Publish queues (per channel)\n\n"
+    for lane in lanes[:30]:
+        text += (
+            f"📢 {titles.get(lane['lane'], lane['lane'])}\n"
+            f"   queued: {lane['depth']} | oldest wait: {lane['oldest_wait']:.1f}s | "
+            f"last wait: {lane['last_wait']:.1f}s | max wait: {lane['max_wait']:.1f}s | sent: {lane['processed']}\n"
+        )
+    await callback.message.answer(text, parse_mode=None)
+    await callback.answer()
+
+
+# --- Alert button statistics ---
+
+def _preview(content) -> str:
+    try:
+        content = decode_content(content)
+    except ValueError:
+        return ""
+    text = plain_text(content) or (content.type if content.kind == 'media' else content.kind)
+    return text[:40].replace("\n", " ")
+
+@router.callback_query(F.data == "view_click_stats")
+async def view_click_stats(callback: types.CallbackQuery):
+    """Clicks per alert button of the latest published posts, from the daily aggregates."""
+    async for session in get_db_session():
+        scheduled = (await session.execute(
+            select(ScheduledPost)
+            .where(ScheduledPost.bot_id == callback.bot.id, ScheduledPost.status == 'published')
+            .order_by(ScheduledPost.run_date.desc()).limit(10)
+        )).scalars().all()
+        # Posts published right away only exist as outbox items
+        immediate = (await session.execute(
+            select(OutboxItem)
+            .where(OutboxItem.bot_id == callback.bot.id, OutboxItem.status == 'done', OutboxItem.scheduled_post_id.is_(None))
+            .order_by(OutboxItem.id.desc()).limit(10)
+        )).scalars().all()
+
+    # (when, label, channel id, content, buttons)
+    posts = [(post.run_date, f"#{post.id}", post.chat_id, post.content, post.buttons) for post in scheduled]
+    posts += [(item.created_at, f"now #{item.id}", (item.payload.get('channel_ids') or [None])[0],
+               item.payload.get('content'), item.payload.get('buttons')) for item in immediate]
+    posts = [post for post in posts if any(btn.get('alert_id') for btn in post[4] or [])]
+    posts.sort(key=lambda post: post[0], reverse=True)
+    posts = posts[:10]
+    if not posts:
+        await callback.message.answer("📈 No published posts with alert buttons yet.")
+        await callback.answer()
+        return
+
+    clicks = await clicks_by_alert([btn['alert_id'] for post in posts for btn in post[4] if btn.get('alert_id')])
+    registry = await get_registry(callback.bot.id)
+    text = "📈 Alert button clicks (total / today)\n\n"
+    for when, label, channel_id, content, buttons in posts:
+        channel = registry.get(channel_id)
+        text += f"📝 {label} | {channel.title if channel else 'Unknown'} | {when:%d.%m.%Y %H:%M}\n{_preview(content)}\n"
+        for btn in buttons:
+            if btn.get('alert_id'):
+                total, today = clicks.get(btn['alert_id'], (0, 0))
+                text += f"   🔔 {btn['text']}: {total} / {today}\n"
+        text += "\n"
+    await callback.message.answer(text, parse_mode=None)
+    await callback.answer()
+
+
+# --- Published posts: bulk edit / delete across channels ---
+
+def _publication_menu(publication_id: str) -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text="✏️ Edit text", callback_data=f"pubedit_text_{publication_id}"),
+         types.InlineKeyboardButton(text="⌨️ Edit buttons", callback_data=f"pubedit_kb_{publication_id}")],
+        [types.InlineKeyboardButton(text="🧹 Remove buttons", callback_data=f"pubedit_nokb_{publication_id}"),
+         types.InlineKeyboardButton(text="🗑 Delete everywhere", callback_data=f"pubdel_ask_{publication_id}")],
+    ])
+
+async def _results_summary(bot_id: int, title: str, results: dict) -> str:
+    registry = await get_registry(bot_id)
+    ok = sum(1 for error in results.values() if error is None)
+    text = f"{title}: {ok}/{len(results)} channels\n\n"
+    for chat_id, error in results.items():
+        channel = registry.by_telegram_id(chat_id)
+        name = channel.title if channel else chat_id
+        text += f"✅ {name}\n" if error is None else f"❌ {name}: {error[:150]}\n"
+    return text
+
+@router.callback_query(F.data == "view_publications")
+async def view_publications(callback: types.CallbackQuery):
+    publications = await recent_publications(callback.bot.id)
+    if not publications:
+        await callback.message.answer("🗂 Nothing has been published yet.")
+        await callback.answer()
+        return
+    rows = [
+        [types.InlineKeyboardButton(text=f"{publication_id} | {channels} ch. | {sent_at:%d.%m %H:%M}",
+                                    callback_data=f"pubopen_{publication_id}")]
+        for publication_id, channels, sent_at in publications
+    ]
+    await callback.message.answer("🗂 Latest published posts:", reply_markup=types.InlineKeyboardMarkup(inline_keyboard=rows))
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("pubopen_"))
+async def open_publication(callback: types.CallbackQuery):
+    publication_id = callback.data.split("_", 1)[1]
+    messages = await publication_messages(publication_id, callback.bot.id)
+    if not messages:
+        await callback.answer("No messages left for this post.", show_alert=True)
+        return
+    total = sum(len(sent) for sent in messages.values())
+    await callback.message.answer(
+        f"🗂 {publication_id}\n📢 {len(messages)} channels, {total} messages",
+        parse_mode=None, reply_markup=_publication_menu(publication_id)
+    )
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("pubedit_text_"))
+async def ask_publication_text(callback: types.CallbackQuery, state: FSMContext):
+    await state.update_data(publication_id=callback.data.split("_", 2)[2])
+    await state.set_state(PublishedState.waiting_for_text)
+    await callback.message.answer("✏️ Send the new text (or caption) for every copy of this post.")
+    await callback.answer()
+
+@router.message(PublishedState.waiting_for_text, F.text)
+async def apply_publication_text(message: types.Message, state: FSMContext):
+    publication_id = (await state.get_data()).get('publication_id')
+    await state.clear()
+    results = await edit_publication(message.bot, publication_id, text=message.html_text)
+    await message.answer(await _results_summary(message.bot.id, "✏️ Text updated", results), parse_mode=None)
+
+@router.callback_query(F.data.startswith("pubedit_kb_"))
+async def ask_publication_buttons(callback: types.CallbackQuery, state: FSMContext):
+    await state.update_data(publication_id=callback.data.split("_", 2)[2])
+    await state.set_state(PublishedState.waiting_for_buttons)
+    await callback.message.answer("⌨️ Send the new URL buttons, one per line:\nText | https://example.com", parse_mode=None)
+    await callback.answer()
+
+@router.message(PublishedState.waiting_for_buttons, F.text)
+async def apply_publication_buttons(message: types.Message, state: FSMContext):
+    buttons = []
+    for line in message.text.splitlines():
+        label, sep, url = line.partition("|")
+        if line.strip() and (not sep or not label.strip()):
+            await message.answer(f"Can't read this line: {line}\nUse: Text | https://example.com", parse_mode=None)
+            return
+        if line.strip():
+            buttons.append({'type': 'url', 'text': label.strip(), 'url': url.strip()})
+    problems = check_button_urls(buttons)
+    if problems or not buttons:
+        await message.answer("\n".join(problems) or "Send at least one button.", parse_mode=None)
+        return
+
+    publication_id = (await state.get_data()).get('publication_id')
+    await state.clear()
+    results = await edit_publication(message.bot, publication_id, buttons=buttons)
+    await message.answer(await _results_summary(message.bot.id, "⌨️ Buttons updated", results), parse_mode=None)
+
+@router.callback_query(F.data.startswith("pubedit_nokb_"))
+async def remove_publication_buttons(callback: types.CallbackQuery):
+    results = await edit_publication(callback.bot, callback.data.split("_", 2)[2], buttons=[])
+    await callback.message.answer(await _results_summary(callback.bot.id, "🧹 Buttons removed", results), parse_mode=None)
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("pubdel_ask_"))
+async def confirm_publication_delete(callback: types.CallbackQuery):
+    publication_id = callback.data.split("_", 2)[2]
+    await callback.message.edit_reply_markup(reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+        types.InlineKeyboardButton(text="🗑 Yes, delete everywhere", callback_data=f"pubdel_yes_{publication_id}"),
+        types.InlineKeyboardButton(text="🔙 Back", callback_data=f"pubopen_{publication_id}"),
+    ]]))
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("pubdel_yes_"))
+async def apply_publication_delete(callback: types.CallbackQuery):
+    results = await delete_publication(callback.bot, callback.data.split("_", 2)[2])
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.message.answer(await _results_summary(callback.bot.id, "🗑 Deleted", results), parse_mode=None)
+    await callback.answer()
@@ -1,15 +1,20 @@
 from aiogram import Router, F, types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from sqlalchemy import select
 
 from database.db import get_db_session
 from database.models import Channel, Settings, User
-from utils.keyboards import get_main_menu, get_channels_menu
+from utils.keyboards import get_main_menu, get_channels_menu, get_extra_channels_menu
 from utils.states import ChannelState, PostState
-from utils.texts import get_text
+from utils.texts import get_text, all_texts
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from utils.checks import check_subscription
+from utils.cache import user_lang_cache
+from utils.channel_registry import get_registry, invalidate_channels
+from utils.channel_health import member_rights
+from datetime import datetime, timezone
 
 router = Router()
 
@@ -17,10 +22,15 @@ async def get_lang(user_id: int = None):
     if not user_id:
         # Fallback for system messages or unknown user context (unlikely)
         return 'en'
-        
+
+    lang = user_lang_cache.get(user_id)
+    if lang:
+        return lang
+
     async for session in get_db_session():
         user = await session.get(User, user_id)
         if user:
+            user_lang_cache.set(user_id, user.language)
             return user.language
     return 'en'
 
@@ -61,6 +71,7 @@ async def set_language(callback: types.CallbackQuery):
         else:
             user.language = lang_code
         await session.commit()
+    user_lang_cache.invalidate(user_id)
     
     # SubscriptionFilter will catch next interaction if not subbed.
     # But for UX, we can check here too or just show welcome.
@@ -94,16 +105,67 @@ async def verify_subscription(callback: types.CallbackQuery):
     else:
         await callback.answer(await get_text('sub_check_fail', lang), show_alert=True)
 
-@router.message(F.text.in_({"📢 Channels", "📢 Каналы"}))
-async def show_channels(message: types.Message):
-    async for session in get_db_session():
-        result = await session.execute(select(Channel))
-        channels = result.scalars().all()
-        lang = await get_lang(message.from_user.id)
-        await message.answer(
-            await get_text('channels_list', lang),
-            reply_markup=get_channels_menu(channels)
-        )
+# --- Channel picker (paginated, searchable by title prefix) ---
+
+# State to return to after a search, per picker mode
+PICKER_STATES = {'post': PostState.waiting_for_channel, 'extra': PostState.confirmation, 'list': None}
+
+async def channel_picker_markup(bot_id: int, mode: str, data: dict) -> InlineKeyboardMarkup:
+    registry = await get_registry(bot_id)
+    query = data.get('channel_query', '')
+    channels = registry.search(query)
+    page = data.get('channel_page', 0)
+    if mode == 'extra':
+        return get_extra_channels_menu(channels, data.get('target_channel_id'), data.get('extra_channel_ids', []), page, query)
+    return get_channels_menu(channels, page, mode, query)
+
+@router.callback_query(F.data.startswith("chpage_"))
+async def channel_picker_page(callback: types.CallbackQuery, state: FSMContext):
+    _, mode, page = callback.data.split("_")
+    await state.update_data(channel_page=int(page))
+    try:
+        await callback.message.edit_reply_markup(reply_markup=await channel_picker_markup(callback.bot.id, mode, await state.get_data()))
+    except TelegramBadRequest:
+        pass  # Same page pressed again, nothing changed
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("chsearch_"))
+async def channel_picker_search(callback: types.CallbackQuery, state: FSMContext):
+    lang = await get_lang(callback.from_user.id)
+    await state.update_data(picker_mode=callback.data.split("_")[1])
+    await state.set_state(ChannelState.waiting_for_search)
+    await callback.message.answer(await get_text('channel_search_prompt', lang))
+    await callback.answer()
+
+@router.message(ChannelState.waiting_for_search, F.text)
+async def channel_picker_query(message: types.Message, state: FSMContext):
+    lang = await get_lang(message.from_user.id)
+    data = await state.get_data()
+    mode = data.get('picker_mode', 'list')
+    await state.set_state(PICKER_STATES.get(mode))
+    await state.update_data(channel_query=message.text.strip(), channel_page=0)
+    registry = await get_registry(message.bot.id)
+    await message.answer(
+        await get_text('channels_found', lang, count=len(registry.search(message.text.strip()))),
+        reply_markup=await channel_picker_markup(message.bot.id, mode, await state.get_data())
+    )
+
+@router.callback_query(F.data.startswith("chclear_"))
+async def channel_picker_clear(callback: types.CallbackQuery, state: FSMContext):
+    await state.update_data(channel_query='', channel_page=0)
+    await callback.message.edit_reply_markup(
+        reply_markup=await channel_picker_markup(callback.bot.id, callback.data.split("_")[1], await state.get_data())
+    )
+    await callback.answer()
+
+@router.message(F.text.in_(all_texts('main_menu_channels')))
+async def show_channels(message: types.Message, state: FSMContext):
+    lang = await get_lang(message.from_user.id)
+    await state.update_data(channel_query='', channel_page=0)
+    await message.answer(
+        await get_text('channels_list', lang),
+        reply_markup=await channel_picker_markup(message.bot.id, 'list', {})
+    )
 
 @router.callback_query(F.data == "add_channel")
 async def start_add_channel(callback: types.CallbackQuery, state: FSMContext):
@@ -138,18 +200,27 @@ async def process_channel_forward(message: types.Message, state: FSMContext):
     async for session in get_db_session():
         # Check if exists
         result = await session.execute(select(Channel).where(Channel.telegram_id == chat.id))
-        if result.scalars().first():
-            await message.answer(await get_text('channel_exists', lang))
+        existing = result.scalars().first()
+        if existing:
+            # A channel belongs to one bot; publishing it from two would post everything twice
+            same_bot = existing.bot_id == message.bot.id
+            await message.answer(await get_text('channel_exists' if same_bot else 'channel_other_bot', lang))
             await state.clear()
             return
         
+        can_post, can_pin = member_rights(member)
         new_channel = Channel(
+            bot_id=message.bot.id,
             telegram_id=chat.id,
             title=chat.title,
-            added_by=message.from_user.id
+            added_by=message.from_user.id,
+            can_post=can_post,
+            can_pin=can_pin,
+            rights_checked_at=datetime.now(timezone.utc).replace(tzinfo=None),
         )
         session.add(new_channel)
         await session.commit()
-        
+    invalidate_channels()
+
     await message.answer(await get_text('channel_added', lang, title=chat.title))
     await state.clear()
\ No newline at end of file
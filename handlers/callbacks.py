@@ -3,10 +3,19 @@ from aiogram.fsm.context import FSMContext
 from sqlalchemy import select
 from datetime import datetime
 import json
+import logging
 
+from data.config import LOG_SAMPLE_ALERT_CLICKS
 from database.db import get_db_session
 from database.models import Channel, ScheduledPost, AlertStorage
+from utils.cache import alert_cache
+from utils.click_stats import click_counter
+from utils.post_model import ALERT_CALLBACK_PREFIX, decode_buttons
 
+logger = logging.getLogger(__name__)
+
+# Public: channel subscribers press these buttons, so main.py includes this router
+# outside the admin-only routers
 router = Router()
 
 # Helper to reconstruct keyboard from stored JSON
@@ -15,38 +24,46 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 def reconstruct_keyboard(buttons_data):
     builder = InlineKeyboardBuilder()
-    for i, btn in enumerate(buttons_data):
-        if btn['type'] == 'url':
+    for btn in decode_buttons(buttons_data):
+        if btn.type == 'url':
             # Ensure URL is valid string
-            if btn.get('url'):
-                builder.button(text=btn['text'], url=btn['url'])
-        elif btn['type'] == 'webapp':
+            if btn.url:
+                builder.button(text=btn.text, url=btn.url)
+        elif btn.type == 'webapp':
             # Ensure WebApp URL is valid string
-            if btn.get('url'):
-                builder.button(text=btn['text'], web_app=WebAppInfo(url=btn['url']))
-        elif btn['type'] == 'alert':
+            if btn.url:
+                builder.button(text=btn.text, web_app=WebAppInfo(url=btn.url))
+        elif btn.type == 'alert':
             # Use stored UUID for alert
-            uuid = btn.get('alert_id')
-            if uuid:
-                builder.button(text=btn['text'], callback_data=f"alert_{uuid}")
+            if btn.alert_id:
+                builder.button(text=btn.text, callback_data=f"{ALERT_CALLBACK_PREFIX}{btn.alert_id}")
     builder.adjust(1)
     return builder.as_markup()
 
-@router.callback_query(F.data.startswith("alert_"))
+@router.callback_query(F.data.startswith(ALERT_CALLBACK_PREFIX))
 async def show_alert(callback: types.CallbackQuery):
     # Format: alert_{uuid}
     try:
         uuid = callback.data.split("_")[1]
-        
-        async for session in get_db_session():
-            alert = await session.get(AlertStorage, uuid)
-            if alert:
-                await callback.answer(alert.text, show_alert=True)
-            else:
-                await callback.answer("Alert not found.", show_alert=True)
+
+        text = alert_cache.get(uuid)
+        if text is None:
+            async for session in get_db_session():
+                alert = await session.get(AlertStorage, uuid)
+                if alert:
+                    text = alert.text
+                    alert_cache.set(uuid, text)
+
+        if text is not None:
+            # Counted in memory, written to alert_click_stats in batches
+            click_counter.hit(uuid)
+            logger.info("Alert %s shown", uuid, extra={'sample': LOG_SAMPLE_ALERT_CLICKS})
+            await callback.answer(text, show_alert=True)
+        else:
+            await callback.answer("Alert not found.", show_alert=True)
 
     except Exception as e:
         await callback.answer("Error showing alert.", show_alert=True)
-        print(f"Alert error: {e}")
+        logger.exception("Alert error: %s", e)
 
 # This router should be included in main.py
\ No newline at end of file
@@ -6,19 +6,34 @@ from sqlalchemy import select
 from datetime import datetime, timedelta
 import pytz
 
+from data.config import INSTANCE_ID
 from database.db import get_db_session
 from database.models import Channel, ScheduledPost, AlertStorage
 from utils.states import PostState
-from utils.keyboards import get_channels_menu, get_post_creation_menu, get_publish_options_menu, get_main_menu
+from utils.keyboards import (get_post_creation_menu, get_publish_options_menu, get_main_menu, get_media_source_menu,
+                             get_media_library_menu, get_media_caption_menu)
+from utils.media_library import describe, recent_media, remember_messages, use_media
 from utils.translator import translate_text
-from utils.scheduler import scheduler
-from utils.texts import get_text
-from handlers.base import get_lang
+from utils.scheduler import scheduler, schedule_dispatch
+from database.claims import claim_post
+from utils.dispatcher import scheduled_publication_id
+from utils.outbox import enqueue
+from utils.recurrence import check_rule, finish_or_advance, first_run
+from utils.texts import get_text, all_texts
+from handlers.base import get_lang, channel_picker_markup
+from utils.channel_registry import get_registry
+from utils.cache import published_drafts
 from database.models import User
 import uuid
 
+from utils.post_model import ALERT_CALLBACK_PREFIX, TextContent, MediaContent, Album, Button, decode_content, encode_content, plain_text
+from utils.publisher import INPUT_MEDIA, SEND_SINGLE
+
 router = Router()
 
+SEND_CONTENT = ("✅ Channel selected.\n\nNow send me the content for the post.\n(Text, Photo, Video, Document, or Album)\n"
+                "Or pick a file you sent before from the library.")
+
 # --- Helpers ---
 
 async def render_post_preview(bot: Bot, chat_id: int, data: dict):
@@ -55,58 +70,33 @@ async def render_post_preview(bot: Bot, chat_id: int, data: dict):
                     session.add(AlertStorage(id=btn['alert_id'], text=btn.get('alert_text', '')))
                     await session.commit()
             
-            kb_builder.button(text=btn['text'], callback_data=f"alert_{btn['alert_id']}")
+            kb_builder.button(text=btn['text'], callback_data=f"{ALERT_CALLBACK_PREFIX}{btn['alert_id']}")
     
     kb_builder.adjust(1)
     preview_markup = kb_builder.as_markup()
 
     # Send Content
     try:
-        # Refactored for entities support (stored as JSON dict usually, but here 'content' might be raw text or dict)
-        # We need to handle 'content' variable structure carefully.
-        # In process_content we now save HTML string in 'text' key inside dict, OR raw string if legacy
-        
-        text_content = ""
-        
-        if isinstance(content, dict) and 'text' in content:
-            text_content = content['text']
+        content = decode_content(content)
+        if content.kind == 'text':
             # Send as HTML (default parse_mode). Entities are embedded in HTML string now.
-            await bot.send_message(chat_id, text_content, reply_markup=preview_markup)
-            
-        elif isinstance(content, str):
-            await bot.send_message(chat_id, content, reply_markup=preview_markup)
-        
-        elif isinstance(content, list): # Album
-            # Albums can't have inline keyboards attached to the media group itself easily 
-            # (only the first message usually, but it's tricky).
-            # Usually, buttons are sent as a separate message below the album.
-            # Send media group
-            # We need to reconstruct InputMedia objects
-            media_group = []
-            for item in content:
-                if item['type'] == 'photo':
-                    media_group.append(types.InputMediaPhoto(media=item['file_id'], caption=item.get('caption')))
-                elif item['type'] == 'video':
-                    media_group.append(types.InputMediaVideo(media=item['file_id'], caption=item.get('caption')))
-                elif item['type'] == 'document':
-                    media_group.append(types.InputMediaDocument(media=item['file_id'], caption=item.get('caption')))
-                elif item['type'] == 'audio':
-                    media_group.append(types.InputMediaAudio(media=item['file_id'], caption=item.get('caption')))
-            
+            await bot.send_message(chat_id, content.text, reply_markup=preview_markup)
+
+        elif content.kind == 'album':
+            # Albums can't carry an inline keyboard; buttons are sent as a separate message below.
+            media_group = [
+                INPUT_MEDIA[item.type](media=item.file_id, caption=item.caption)
+                for item in content.items
+            ]
             await bot.send_media_group(chat_id, media=media_group)
             if preview_markup.inline_keyboard:
                 await bot.send_message(chat_id, "⬇️ Buttons for the album above ⬇️", reply_markup=preview_markup)
 
-        elif isinstance(content, dict): # Single Media
-            if content['type'] == 'photo':
-                await bot.send_photo(chat_id, content['file_id'], caption=content.get('caption'), reply_markup=preview_markup)
-            elif content['type'] == 'video':
-                await bot.send_video(chat_id, content['file_id'], caption=content.get('caption'), reply_markup=preview_markup)
-            elif content['type'] == 'document':
-                await bot.send_document(chat_id, content['file_id'], caption=content.get('caption'), reply_markup=preview_markup)
-            elif content['type'] == 'audio':
-                await bot.send_audio(chat_id, content['file_id'], caption=content.get('caption'), reply_markup=preview_markup)
-                
+        else:  # Single Media
+            method, field = SEND_SINGLE[content.type]
+            await bot(method(chat_id=chat_id, caption=content.caption, reply_markup=preview_markup,
+                             **{field: content.file_id}))
+
     except Exception as e:
         await bot.send_message(chat_id, f"Error rendering preview: {e}")
 
@@ -115,68 +105,109 @@ async def render_post_preview(bot: Bot, chat_id: int, data: dict):
 
 # --- Handlers ---
 
-@router.message(F.text.in_({"📝 Create Post", "📝 Создать пост"}))
+@router.message(F.text.in_(all_texts('main_menu_create')))
 async def start_post_creation(message: types.Message, state: FSMContext):
     lang = await get_lang(message.from_user.id)
-    # Fetch channels
-    async for session in get_db_session():
-        result = await session.execute(select(Channel))
-        channels = result.scalars().all()
-        
-        if not channels:
-            await message.answer(await get_text('no_channels', lang))
-            return
+    # Channels come from the in-memory registry, not a query per menu open
+    if not len(await get_registry(message.bot.id)):
+        await message.answer(await get_text('no_channels', lang))
+        return
 
-        await message.answer(await get_text('select_channel', lang), reply_markup=get_channels_menu(channels))
-        await state.set_state(PostState.waiting_for_channel)
+    # draft_id makes publishing this draft idempotent (see published_drafts)
+    await state.update_data(channel_query='', channel_page=0, draft_id=uuid.uuid4().hex)
+    await message.answer(await get_text('select_channel', lang), reply_markup=await channel_picker_markup(message.bot.id, 'post', {}))
+    await state.set_state(PostState.waiting_for_channel)
 
 @router.callback_query(PostState.waiting_for_channel, F.data.startswith("select_channel_"))
 async def channel_selected(callback: types.CallbackQuery, state: FSMContext):
     channel_id = int(callback.data.split("_")[-1])
     await state.update_data(target_channel_id=channel_id)
-    
-    await callback.message.edit_text("✅ Channel selected.\n\nNow send me the content for the post.\n(Text, Photo, Video, Document, or Album)")
+
+    channel = (await get_registry(callback.bot.id)).get(channel_id)
+    warning = "⚠️ The last check found that I can't post in this channel.\n\n" if channel and channel.broken else ""
+    await callback.message.edit_text(warning + SEND_CONTENT, reply_markup=get_media_source_menu())
     await state.set_state(PostState.waiting_for_content)
 
+# --- Media library ---
+
+@router.callback_query(PostState.waiting_for_content, F.data == "medialib_back")
+async def media_library_back(callback: types.CallbackQuery, state: FSMContext):
+    await state.update_data(picked_media=None)
+    await callback.message.edit_text(SEND_CONTENT, reply_markup=get_media_source_menu())
+    await callback.answer()
+
+@router.callback_query(PostState.waiting_for_content, F.data.startswith("medialib_"))
+async def media_library_page(callback: types.CallbackQuery, state: FSMContext):
+    page = int(callback.data.split("_")[1])
+    items, has_more = await recent_media(callback.bot.id, page)
+    if not items and page == 0:
+        await callback.answer("The library is empty: media you send for posts is added to it.", show_alert=True)
+        return
+    await state.update_data(picked_media=None)
+    entries = [(item.file_unique_id, describe(item)) for item in items]
+    await callback.message.edit_text("🖼 Media library, most recently used first:",
+                                     reply_markup=get_media_library_menu(entries, page, has_more))
+    await callback.answer()
+
+@router.callback_query(PostState.waiting_for_content, F.data.startswith("mediapick_"))
+async def media_library_pick(callback: types.CallbackQuery, state: FSMContext):
+    item = await use_media(callback.bot.id, callback.data.split("_", 1)[1])
+    if item is None:
+        await callback.answer("This file is no longer in the library.", show_alert=True)
+        return
+    # The next text message becomes its caption (see process_content)
+    await state.update_data(picked_media={'type': item.media_type, 'file_id': item.file_id})
+    await callback.message.edit_text(f"Selected: {describe(item)}\n\nSend the caption for the post, or continue without one.",
+                                     reply_markup=get_media_caption_menu())
+    await callback.answer()
+
+@router.callback_query(PostState.waiting_for_content, F.data == "media_nocaption")
+async def media_library_no_caption(callback: types.CallbackQuery, state: FSMContext):
+    picked = (await state.get_data()).get('picked_media')
+    if not picked:
+        await callback.answer()
+        return
+    content = MediaContent(picked['type'], picked['file_id'])
+    await state.update_data(content=encode_content(content), content_type=picked['type'], picked_media=None)
+    await callback.answer()
+    await _content_received(callback.message.bot, callback.message.chat.id, callback.from_user.id, state)
+
 @router.message(PostState.waiting_for_content)
 async def process_content(message: types.Message, state: FSMContext, album: list[types.Message] = None):
-    data = {}
-    
-    if album:
+    data = {'picked_media': None}
+    picked = (await state.get_data()).get('picked_media')
+
+    if picked and message.text and not album:
+        # Caption for a file picked from the library
+        data['content'] = encode_content(MediaContent(picked['type'], picked['file_id'], message.html_text))
+        data['content_type'] = picked['type']
+    elif album:
         # Handle Album
-        content_list = []
+        items = []
         for msg in album:
-            item = {'file_id': None, 'type': 'unknown', 'caption': msg.caption or ""}
             if msg.photo:
-                item['type'] = 'photo'
-                item['file_id'] = msg.photo[-1].file_id
+                items.append(MediaContent('photo', msg.photo[-1].file_id, msg.caption))
             elif msg.video:
-                item['type'] = 'video'
-                item['file_id'] = msg.video.file_id
+                items.append(MediaContent('video', msg.video.file_id, msg.caption))
             elif msg.document:
-                item['type'] = 'document'
-                item['file_id'] = msg.document.file_id
+                items.append(MediaContent('document', msg.document.file_id, msg.caption))
             elif msg.audio:
-                item['type'] = 'audio'
-                item['file_id'] = msg.audio.file_id
-            content_list.append(item)
-        data['content'] = content_list
+                items.append(MediaContent('audio', msg.audio.file_id, msg.caption))
+        data['content'] = encode_content(Album(items))
         data['content_type'] = 'album'
-        
+
     elif message.photo:
-        data['content'] = {'type': 'photo', 'file_id': message.photo[-1].file_id, 'caption': message.caption}
+        data['content'] = encode_content(MediaContent('photo', message.photo[-1].file_id, message.caption))
         data['content_type'] = 'photo'
     elif message.video:
-        data['content'] = {'type': 'video', 'file_id': message.video.file_id, 'caption': message.caption}
+        data['content'] = encode_content(MediaContent('video', message.video.file_id, message.caption))
         data['content_type'] = 'video'
     elif message.document:
-        data['content'] = {'type': 'document', 'file_id': message.document.file_id, 'caption': message.caption}
+        data['content'] = encode_content(MediaContent('document', message.document.file_id, message.caption))
         data['content_type'] = 'document'
     elif message.text:
         # Save HTML text to preserve formatting and custom emojis reliably
-        data['content'] = {
-            'text': message.html_text
-        }
+        data['content'] = encode_content(TextContent(message.html_text))
         data['content_type'] = 'text'
     else:
         lang = await get_lang(message.from_user.id)
@@ -184,11 +215,16 @@ async def process_content(message: types.Message, state: FSMContext, album: list
         return
 
     await state.update_data(**data)
+    # Same file sent again refreshes its library entry instead of adding one
+    await remember_messages(message.bot.id, album or [message])
+    await _content_received(message.bot, message.chat.id, message.from_user.id, state)
+
+async def _content_received(bot: Bot, chat_id: int, user_id: int, state: FSMContext):
     await state.update_data(buttons=[]) # Initialize empty buttons list
-    
-    lang = await get_lang(message.from_user.id)
-    await message.answer(await get_text('content_received', lang))
-    await render_post_preview(message.bot, message.chat.id, await state.get_data())
+
+    lang = await get_lang(user_id)
+    await bot.send_message(chat_id, await get_text('content_received', lang))
+    await render_post_preview(bot, chat_id, await state.get_data())
     await state.set_state(PostState.waiting_for_buttons)
 
 # --- Button Handlers ---
@@ -212,11 +248,7 @@ async def get_url_btn_link(message: types.Message, state: FSMContext):
     lang = await get_lang(message.from_user.id)
     data = await state.get_data()
     buttons = data.get('buttons', [])
-    buttons.append({
-        'type': 'url',
-        'text': data['temp_btn_label'],
-        'url': message.text
-    })
+    buttons.append(Button('url', data['temp_btn_label'], url=message.text).to_dict())
     await state.update_data(buttons=buttons)
     await message.answer(await get_text('btn_added', lang))
     await render_post_preview(message.bot, message.chat.id, await state.get_data())
@@ -236,30 +268,9 @@ async def process_translation(message: types.Message, state: FSMContext):
     data = await state.get_data()
     content = data.get('content')
     
-    # Extract text to translate
-    # Content is HTML string. We should strip tags for translation ideally,
-    # but for simplicity let's translate as is, knowing tags might break or be translated.
-    # User requested "Translation without HTML tags".
-    
-    text_source = ""
-    import re
-    text_to_translate = re.sub('<[^<]+?>', '', text_source)
-    if isinstance(content, dict) and 'text' in content:
-        text_source = content.get('text', "")
-    elif isinstance(content, str):
-        text_source = content
-        
-    # Strip HTML tags for translation
-
-    elif isinstance(content, dict): # Single media
-        text_to_translate = content.get('caption', "")
-    elif isinstance(content, list): # Album
-        # Find first caption
-        for item in content:
-            if item.get('caption'):
-                text_to_translate = item['caption']
-                break
-    
+    # Text or caption without HTML tags
+    text_to_translate = plain_text(content)
+
     lang = await get_lang(message.from_user.id)
     if not text_to_translate:
         await message.answer(await get_text('no_text_translate', lang))
@@ -286,11 +297,9 @@ async def process_translation(message: types.Message, state: FSMContext):
 
     # Add button
     buttons = data.get('buttons', [])
-    buttons.append({
-        'type': 'alert',
-        'text': "🇺🇸 English" if target_lang == 'en' else f"{target_lang}",
-        'alert_text': translated_text # Store full translation
-    })
+    # Store full translation
+    buttons.append(Button('alert', "🇺🇸 English" if target_lang == 'en' else f"{target_lang}",
+                          alert_text=translated_text).to_dict())
     await state.update_data(buttons=buttons)
     
     await message.answer("✅ Translation added.")
@@ -316,11 +325,7 @@ async def get_alert_text(message: types.Message, state: FSMContext):
     lang = await get_lang(message.from_user.id)
     data = await state.get_data()
     buttons = data.get('buttons', [])
-    buttons.append({
-        'type': 'alert',
-        'text': data['temp_btn_label'],
-        'alert_text': message.text
-    })
+    buttons.append(Button('alert', data['temp_btn_label'], alert_text=message.text).to_dict())
     await state.update_data(buttons=buttons)
     await message.answer(await get_text('btn_added', lang))
     await render_post_preview(message.bot, message.chat.id, await state.get_data())
@@ -354,7 +359,9 @@ async def toggle_pin(callback: types.CallbackQuery, state: FSMContext):
     await state.update_data(is_pinned=is_pinned)
     
     is_silent = data.get('is_silent', False)
-    await callback.message.edit_reply_markup(reply_markup=get_publish_options_menu(is_pinned, is_silent))
+    extra = len(data.get('extra_channel_ids', []))
+    await callback.message.edit_reply_markup(reply_markup=get_publish_options_menu(is_pinned, is_silent, extra,
+                                                                               data.get('recurrence')))
     await callback.answer()
 
 @router.callback_query(F.data == "toggle_silent")
@@ -364,7 +371,9 @@ async def toggle_silent(callback: types.CallbackQuery, state: FSMContext):
     await state.update_data(is_silent=is_silent)
     
     is_pinned = data.get('is_pinned', False)
-    await callback.message.edit_reply_markup(reply_markup=get_publish_options_menu(is_pinned, is_silent))
+    extra = len(data.get('extra_channel_ids', []))
+    await callback.message.edit_reply_markup(reply_markup=get_publish_options_menu(is_pinned, is_silent, extra,
+                                                                               data.get('recurrence')))
     await callback.answer()
 
 @router.callback_query(PostState.waiting_for_buttons, F.data == "post_done")
@@ -373,6 +382,64 @@ async def post_creation_done(callback: types.CallbackQuery, state: FSMContext):
     await callback.message.answer("Post ready. Choose publication options:", reply_markup=get_publish_options_menu()) # Localization todo
     await state.set_state(PostState.confirmation)
 
+@router.callback_query(PostState.confirmation, F.data == "pick_extra_channels")
+async def pick_extra_channels(callback: types.CallbackQuery, state: FSMContext):
+    await state.update_data(channel_query='', channel_page=0)
+    await show_extra_channels(callback, state)
+
+async def show_extra_channels(callback: types.CallbackQuery, state: FSMContext):
+    await callback.message.edit_reply_markup(reply_markup=await channel_picker_markup(callback.bot.id, 'extra', await state.get_data()))
+    await callback.answer()
+
+@router.callback_query(PostState.confirmation, F.data.startswith("toggle_extra_"))
+async def toggle_extra_channel(callback: types.CallbackQuery, state: FSMContext):
+    channel_id = int(callback.data.split("_")[-1])
+    data = await state.get_data()
+    selected = data.get('extra_channel_ids', [])
+    if channel_id in selected:
+        selected.remove(channel_id)
+    else:
+        selected.append(channel_id)
+    await state.update_data(extra_channel_ids=selected)
+    await show_extra_channels(callback, state)
+
+@router.callback_query(PostState.confirmation, F.data == "back_to_options")
+async def back_to_options(callback: types.CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    await callback.message.edit_reply_markup(reply_markup=get_publish_options_menu(
+        data.get('is_pinned', False), data.get('is_silent', False), len(data.get('extra_channel_ids', [])),
+        data.get('recurrence')
+    ))
+    await callback.answer()
+
+@router.callback_query(PostState.confirmation, F.data == "set_repeat")
+async def ask_repeat(callback: types.CallbackQuery, state: FSMContext):
+    lang = await get_lang(callback.from_user.id)
+    await callback.message.answer(await get_text('repeat_prompt', lang))
+    await state.set_state(PostState.waiting_for_recurrence)
+    await callback.answer()
+
+@router.message(PostState.waiting_for_recurrence, F.text)
+async def process_repeat(message: types.Message, state: FSMContext):
+    lang = await get_lang(message.from_user.id)
+    rule = " ".join(message.text.split())
+    if rule.lower() == 'off':
+        rule = None
+    else:
+        # Only the rule is checked here; the timezone is asked when scheduling
+        error = check_rule(rule, 'UTC')
+        if error:
+            await message.answer(await get_text('repeat_invalid', lang, error=error), parse_mode=None)
+            return
+    await state.update_data(recurrence=rule)
+    await state.set_state(PostState.confirmation)
+    data = await state.get_data()
+    await message.answer(
+        await get_text('repeat_set' if rule else 'repeat_off', lang, rule=rule), parse_mode=None,
+        reply_markup=get_publish_options_menu(data.get('is_pinned', False), data.get('is_silent', False),
+                                              len(data.get('extra_channel_ids', [])), rule)
+    )
+
 # --- Publish Handlers ---
 @router.callback_query(PostState.confirmation, F.data == "pub_schedule")
 async def start_schedule(callback: types.CallbackQuery, state: FSMContext):
@@ -407,6 +474,10 @@ async def process_schedule_time(message: types.Message, state: FSMContext):
         local_dt = tz.localize(naive_dt)
         # Convert to UTC for storage/scheduler (best practice)
         run_date = local_dt.astimezone(pytz.utc)
+        recurrence = data.get('recurrence')
+        if recurrence:
+            # The entered time starts the rule: the first run is its first match from then on
+            run_date = pytz.utc.localize(first_run(recurrence, timezone_str, run_date.replace(tzinfo=None)))
         
         # Save post data same as publish_now but with future date and add to scheduler
         data = await state.get_data()
@@ -425,267 +496,108 @@ async def process_schedule_time(message: types.Message, state: FSMContext):
             await session.commit()
             
             channel = await session.get(Channel, channel_id)
-            if not channel:
+            if not channel or channel.bot_id != message.bot.id:
                 await message.answer("Channel not found!")
                 return
+            if data.get('draft_id') and not published_drafts.first(data['draft_id']):
+                await message.answer("This post is already scheduled.")
+                return
             
             new_post = ScheduledPost(
+                bot_id=message.bot.id,
                 chat_id=channel_id,
                 content=content,
                 buttons=buttons,
                 run_date=run_date,
-                status="pending"
+                status="pending",
+                options={
+                    'is_pinned': data.get('is_pinned', False),
+                    'is_silent': data.get('is_silent', False),
+                    'extra_channel_ids': data.get('extra_channel_ids', []),
+                },
+                recurrence=recurrence,
+                timezone=timezone_str if recurrence else None,
             )
             session.add(new_post)
             await session.commit()
             await session.refresh(new_post)
             
             # Schedule Job
-            # We need a function to execute the post.
-            # We can define it here or import.
-            # APScheduler needs a picklable function or module path.
-            # Let's use a function in this module or separate.
-            scheduler.add_job(
-                publish_scheduled_post,
-                'date',
-                run_date=run_date,
-                args=[new_post.id],
-                id=str(new_post.id)
-            )
+            # One dispatch job per run_date publishes every post due at that moment
+            schedule_dispatch(run_date)
             
             lang = await get_lang(message.from_user.id)
-            await message.answer(await get_text('post_scheduled', lang, date=run_date))
+            text = await get_text('post_scheduled', lang, date=run_date)
+            if recurrence:
+                text += f"\n🔁 {recurrence} ({timezone_str})"
+            await message.answer(text)
             await state.clear()
             
     except ValueError:
         lang = await get_lang(message.from_user.id)
         await message.answer(await get_text('invalid_date', lang))
 
-async def publish_scheduled_post(post_id: int):
-    # This function needs to re-hydrate the Bot instance or pass it.
-    # APScheduler runs in a separate context.
-    # We can get bot from current running app or create new.
-    # For simplicity, we create a Bot instance or use the one from main if global (not clean).
-    # Better: pass bot instance? No, apscheduler stores args.
-    # We will instantiate Bot here.
-    from data.config import BOT_TOKEN
-    bot = Bot(token=BOT_TOKEN)
-    
+async def publish_scheduled_post(post_id: int, delay: float = 0):
+    # Atomic pending -> publishing transition; another instance may have fired the same job
+    if not await claim_post(post_id):
+        return
+
     async for session in get_db_session():
         post = await session.get(ScheduledPost, post_id)
-        if not post or post.status != 'pending':
-            await bot.session.close()
-            return
-            
-        channel = await session.get(Channel, post.chat_id) # post.chat_id in DB is actually channel DB ID or TG ID?
-        # In publish_now we used: channel_id (DB ID) -> channel.telegram_id
-        # In ScheduledPost model: chat_id = mapped_column(BigInteger)
-        # Wait, in publish_now we passed `channel_id` (DB ID) to ScheduledPost(chat_id=...).
-        # So `post.chat_id` IS the DB ID of the channel.
-        # We need to fetch the real telegram ID.
-        
-        target_chat_id = None
-        if channel:
-            target_chat_id = channel.telegram_id
-        else:
-            # Maybe it stored the raw ID? Let's check logic.
-            # logic: `new_post = ScheduledPost(chat_id=channel_id...)` where channel_id came from state `target_channel_id` which is DB ID.
-            # So yes, we need to fetch Channel.
-            pass
-            
-        if not target_chat_id:
-            print(f"Channel for post {post_id} not found")
-            await bot.session.close()
+        if not post:
             return
 
-        # Reconstruct Markup
-        from handlers.callbacks import reconstruct_keyboard
-        # Reconstruct keyboard (post.buttons should have updated IDs now)
-        markup = reconstruct_keyboard(post.buttons)
-        content = post.content
-        
-        # Apply options (ScheduledPost does not store pin/silent metadata yet, need migration or default to False if not present in content json which is bad practice)
-        # Actually `content` column is JSON, `buttons` is JSON.
-        # We did not add `is_pinned` / `is_silent` to `ScheduledPost` model.
-        # However, we can store it in `content` json for convenience if we don't want schema change,
-        # OR we check if we saved it in `data` in `process_schedule_time`...
-        # In `process_schedule_time` we saved `content=content`. `content` from state is just media/text.
-        # `is_pinned` was in `data`.
-        # We need to update `process_schedule_time` to save this metadata.
-        # For now, let's assume defaults or try to read from a metadata field if we add one.
-        # Or hack: store in `content` dict wrapper.
-        # Let's check `content`. If it's the dict we saved, we can put options there.
-        
-        # But wait, `process_schedule_time` does `content = data.get('content')`.
-        # We should wrap it or add columns. Adding columns is cleaner but requires migration.
-        # Wrapping in content dict: `content` is already used by `process_content` logic.
-        # Let's default to False for now to prevent breaking, and fix `process_schedule_time` to include it in a new field if possible or just use defaults.
-        
-        is_pinned = False # Todo: Implement persistence for scheduled posts options
-        is_silent = False
-        
-        sent_message = None
-
-        try:
-             # Logic duplicate from publish_now - should be refactored into a shared function
-            if isinstance(content, dict) and 'text' in content: # New Text format
-                text_content = content.get('text', "")
-                entities = None
-                if content.get('entities'):
-                     from aiogram.types import MessageEntity
-                     entities = [MessageEntity(**e) for e in content['entities']]
-                sent_message = await bot.send_message(target_chat_id, text_content, entities=entities, reply_markup=markup, disable_notification=is_silent)
-
-            elif isinstance(content, str): # Legacy Text (HTML)
-                sent_message = await bot.send_message(target_chat_id, content, reply_markup=markup, disable_notification=is_silent)
-            
-            elif isinstance(content, list): # Album
-                media_group = []
-                for item in content:
-                    entities = [types.MessageEntity(**e) for e in item['caption_entities']] if item.get('caption_entities') else None
-                    if item['type'] == 'photo':
-                        media_group.append(types.InputMediaPhoto(media=item['file_id'], caption=item.get('caption'), caption_entities=entities))
-                    elif item['type'] == 'video':
-                        media_group.append(types.InputMediaVideo(media=item['file_id'], caption=item.get('caption'), caption_entities=entities))
-                    elif item['type'] == 'document':
-                        media_group.append(types.InputMediaDocument(media=item['file_id'], caption=item.get('caption'), caption_entities=entities))
-                    elif item['type'] == 'audio':
-                        media_group.append(types.InputMediaAudio(media=item['file_id'], caption=item.get('caption'), caption_entities=entities))
-                
-                sent_msgs = await bot.send_media_group(target_chat_id, media=media_group, disable_notification=is_silent)
-                sent_message = sent_msgs[0]
-                if markup.inline_keyboard:
-                     await bot.send_message(target_chat_id, "⬇️", reply_markup=markup, disable_notification=is_silent)
-            
-            elif isinstance(content, dict): # Single Media
-                 entities = [types.MessageEntity(**e) for e in content['caption_entities']] if content.get('caption_entities') else None
-                 if content['type'] == 'photo':
-                    sent_message = await bot.send_photo(target_chat_id, content['file_id'], caption=content.get('caption'), caption_entities=entities, reply_markup=markup, disable_notification=is_silent)
-                 elif content['type'] == 'video':
-                    sent_message = await bot.send_video(target_chat_id, content['file_id'], caption=content.get('caption'), caption_entities=entities, reply_markup=markup, disable_notification=is_silent)
-                 elif content['type'] == 'document':
-                    sent_message = await bot.send_document(target_chat_id, content['file_id'], caption=content.get('caption'), caption_entities=entities, reply_markup=markup, disable_notification=is_silent)
-
-            if is_pinned and sent_message:
-                try:
-                    await bot.pin_chat_message(target_chat_id, sent_message.message_id)
-                except Exception as e:
-                    print(f"Failed to pin message: {e}")
-
-            post.status = 'published'
-            await session.commit()
-            
-        except Exception as e:
-            print(f"Failed to publish scheduled post {post_id}: {e}")
-            post.status = 'failed'
-            await session.commit()
-            
-    await bot.session.close()
+        # post.chat_id is the DB id of the channel (target_channel_id from the FSM), not the Telegram id
+        options = post.options or {}
+        payload = {
+            'channel_ids': [post.chat_id] + options.get('extra_channel_ids', []),
+            'content': post.content,
+            'buttons': post.buttons,
+            'is_pinned': options.get('is_pinned', False),
+            'is_silent': options.get('is_silent', False),
+        }
+
+    # The outbox worker sends it and sets the final status ('published' / 'failed')
+    await enqueue(payload, scheduled_post_id=post_id, delay=delay, bot_id=post.bot_id,
+                  publication_id=scheduled_publication_id(post))
+    # A recurring post moves on to its next occurrence instead
+    await finish_or_advance([post], 'queued', INSTANCE_ID)
 
 @router.callback_query(PostState.confirmation, F.data == "pub_now")
 async def publish_now(callback: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    channel_id = data.get('target_channel_id')
-    
-    # Fetch real telegram_id of channel
+    channel_ids = [data.get('target_channel_id')] + data.get('extra_channel_ids', [])
+    buttons = data.get('buttons', [])
+
     async for session in get_db_session():
-        channel = await session.get(Channel, channel_id)
-        if not channel:
+        channel = await session.get(Channel, data.get('target_channel_id'))
+        if not channel or channel.bot_id != callback.bot.id:
             await callback.answer("Channel not found!")
             return
-        target_chat_id = channel.telegram_id
-    
-    # Send content
-    content = data.get('content')
-    buttons = data.get('buttons', [])
-    
-    # Construct Real Keyboard for sending
-    # Save to DB first to get ID for callbacks
-    # Save alerts to AlertStorage immediately
-    async for session in get_db_session():
-         for btn in buttons:
-             if btn['type'] == 'alert' and btn.get('alert_text'):
-                 # Check if already has ID (re-publishing?)
-                 if not btn.get('alert_id'):
-                     new_id = str(uuid.uuid4())
-                     btn['alert_id'] = new_id
-                     session.add(AlertStorage(id=new_id, text=btn['alert_text']))
-                 # Ensure checking for existence if id present (e.g. from preview)?
-                 # Preview saves it, so it should exist. But good to be safe or just trust ID.
-                 # If ID exists from preview, it's already in DB.
-         await session.commit()
-
-    # Reconstruct keyboard
-    from handlers.callbacks import reconstruct_keyboard
-    markup = reconstruct_keyboard(buttons)
-        
-    async for session in get_db_session():
-        # Send Content to Channel
-        try:
-            target_chat_id = None
-            channel = await session.get(Channel, channel_id)
-            if channel:
-                target_chat_id = channel.telegram_id
-            
-            if not target_chat_id:
-                 await callback.message.answer("Error: Channel ID missing.")
-                 return
-            
-            # Apply options
-            is_pinned = data.get('is_pinned', False)
-            is_silent = data.get('is_silent', False)
-            
-            sent_message = None
-
-            if data['content_type'] == 'text':
-                # content is dict {text, entities} if new format, OR str if old.
-                if isinstance(content, dict):
-                    text = content.get('text', "")
-                    entities = [types.MessageEntity(**e) for e in content['entities']] if content.get('entities') else None
-                    # Send with entities (ignores parse_mode=HTML default if entities provided)
-                    sent_message = await callback.bot.send_message(target_chat_id, text, entities=entities, reply_markup=markup, disable_notification=is_silent)
-                else: # Fallback for str (legacy)
-                    # If legacy content is HTML string, sending it with default parse_mode=HTML works.
-                    sent_message = await callback.bot.send_message(target_chat_id, str(content), reply_markup=markup, disable_notification=is_silent)
-            
-            elif data['content_type'] == 'album':
-                media_group = []
-                for item in content:
-                    entities = [types.MessageEntity(**e) for e in item['caption_entities']] if item.get('caption_entities') else None
-                    if item['type'] == 'photo':
-                        media_group.append(types.InputMediaPhoto(media=item['file_id'], caption=item.get('caption'), caption_entities=entities))
-                    elif item['type'] == 'video':
-                        media_group.append(types.InputMediaVideo(media=item['file_id'], caption=item.get('caption'), caption_entities=entities))
-                    elif item['type'] == 'document':
-                        media_group.append(types.InputMediaDocument(media=item['file_id'], caption=item.get('caption'), caption_entities=entities))
-                    elif item['type'] == 'audio':
-                        media_group.append(types.InputMediaAudio(media=item['file_id'], caption=item.get('caption'), caption_entities=entities))
-                
-                sent_msgs = await callback.bot.send_media_group(target_chat_id, media=media_group, disable_notification=is_silent)
-                sent_message = sent_msgs[0] # Pin first
-                if markup.inline_keyboard:
-                     await callback.bot.send_message(target_chat_id, "⬇️", reply_markup=markup, disable_notification=is_silent)
-            
-            else: # Single Media
-                entities = [types.MessageEntity(**e) for e in content['caption_entities']] if content.get('caption_entities') else None
-                if data['content_type'] == 'photo':
-                    sent_message = await callback.bot.send_photo(target_chat_id, content['file_id'], caption=content.get('caption'), caption_entities=entities, reply_markup=markup, disable_notification=is_silent)
-                elif data['content_type'] == 'video':
-                    sent_message = await callback.bot.send_video(target_chat_id, content['file_id'], caption=content.get('caption'), caption_entities=entities, reply_markup=markup, disable_notification=is_silent)
-                elif data['content_type'] == 'document':
-                    sent_message = await callback.bot.send_document(target_chat_id, content['file_id'], caption=content.get('caption'), caption_entities=entities, reply_markup=markup, disable_notification=is_silent)
-            
-            if is_pinned and sent_message:
-                try:
-                    await callback.bot.pin_chat_message(target_chat_id, sent_message.message_id)
-                except Exception as e:
-                    print(f"Failed to pin message: {e}")
-
-            lang = await get_lang(callback.from_user.id)
-            await callback.message.edit_text(await get_text('post_published', lang))
-            await state.clear()
-            
-        except Exception as e:
-            await callback.message.answer(f"❌ Failed to publish: {e}")
-            # If failed, we don't save to scheduled_posts because user didn't want to save published posts to DB
-            pass
\ No newline at end of file
+        # A repeated tap must not publish the same draft twice; a draft that could not be published stays usable
+        if not published_drafts.first(data.get('draft_id') or (callback.message.chat.id, callback.message.message_id)):
+            await callback.answer("Already published.")
+            return
+
+        # Save alerts to AlertStorage first so the callbacks work as soon as the post is out
+        for btn in buttons:
+            if btn['type'] == 'alert' and btn.get('alert_text'):
+                # Preview already stored alerts that have an ID
+                if not btn.get('alert_id'):
+                    new_id = str(uuid.uuid4())
+                    btn['alert_id'] = new_id
+                    session.add(AlertStorage(id=new_id, text=btn['alert_text']))
+        await session.commit()
+
+    # Sending happens in the outbox worker, which retries and reports back to the admin
+    await enqueue({
+        'channel_ids': channel_ids,
+        'content': data.get('content'),
+        'buttons': buttons,
+        'is_pinned': data.get('is_pinned', False),
+        'is_silent': data.get('is_silent', False),
+    }, requested_by=callback.from_user.id, bot_id=callback.bot.id)
+
+    lang = await get_lang(callback.from_user.id)
+    await callback.message.edit_text(await get_text('post_queued', lang))
+    await state.clear()
@@ -1,45 +1,130 @@
+import time
+# Process start for the startup timer, before the heavy imports below
+_BOOT = time.perf_counter()
+
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher
+from typing import List
+from aiogram import Bot, Dispatcher, Router
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 
 
-from data.config import BOT_TOKEN
+from data.config import BOT_TOKEN, BOT_TOKENS, WORKERS, TELEGRAM_API_URL
 from middlewares.album import AlbumMiddleware
+from middlewares.logcontext import LogContextMiddleware
+from middlewares.ordering import ordering
+from middlewares.throttling import throttling
 from filters.admin import AdminFilter
 from filters.subscription import SubscriptionFilter
 from handlers import base, posting, callbacks, admin
-from utils.scheduler import start_scheduler
+from utils.scheduler import scheduler, start_scheduler, enable_lease_recovery
+from utils.catchup import reconcile_overdue_posts
+from utils.outbox import OutboxWorker
+from utils.preflight import enable_preflight
+from utils.channel_registry import get_registry
+from utils.channel_health import enable_channel_health
+from utils.click_stats import click_counter
+from utils.retention import enable_retention
+from utils.tenants import register_bot, adopt_unscoped_rows
+from utils.startup import StartupTimer
+from utils.json_codec import dumps, loads
+from utils.logs import setup_logging
 
-async def main():
-    logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def create_bot(token: str = BOT_TOKEN) -> Bot:
     bot_properties = DefaultBotProperties(parse_mode=ParseMode.HTML)
-    bot = Bot(token=BOT_TOKEN, default=bot_properties)
-    dp = Dispatcher(storage=MemoryStorage())
+    session = AiohttpSession(json_loads=loads, json_dumps=dumps)
+    if TELEGRAM_API_URL:
+        session.api = TelegramAPIServer.from_base(TELEGRAM_API_URL)
+    return Bot(token=token, session=session, default=bot_properties)
+
+def create_bots() -> List[Bot]:
+    """One Bot per BOT_TOKENS entry, registered for the jobs that look bots up by id."""
+    bots = [create_bot(token) for token in BOT_TOKENS]
+    for bot in bots:
+        register_bot(bot)
+    return bots
+
+def build_dispatcher(storage: BaseStorage = None) -> Dispatcher:
+    dp = Dispatcher(storage=storage or MemoryStorage())
+
+    # Admin-only area: everything except the alert buttons pressed by channel subscribers
+    panel = Router(name='panel')
+    panel.message.filter(AdminFilter())
+    panel.callback_query.filter(AdminFilter())
 
-    # Global Filters
-    dp.message.filter(AdminFilter())
-    dp.callback_query.filter(AdminFilter())
-    
     # Subscription Check (After Admin check)
-    dp.message.filter(SubscriptionFilter())
-    dp.callback_query.filter(SubscriptionFilter())
+    panel.message.filter(SubscriptionFilter())
+    panel.callback_query.filter(SubscriptionFilter())
 
     # Middleware
+    # Log context (update/user id) first, then non-admin floods are dropped before the filters,
+    # then per-user ordering and the concurrency cap
+    dp.update.outer_middleware(LogContextMiddleware())
+    dp.update.outer_middleware(throttling)
+    dp.update.outer_middleware(ordering)
     dp.message.middleware(AlbumMiddleware())
 
     # Routers
-    dp.include_router(base.router)
-    dp.include_router(posting.router)
     dp.include_router(callbacks.router)
-    dp.include_router(admin.router)
+    panel.include_router(base.router)
+    panel.include_router(posting.router)
+    panel.include_router(admin.router)
+    dp.include_router(panel)
+    return dp
+
+async def main():
+    setup_logging()
+    timer = StartupTimer(_BOOT)
+    timer.mark('imports')
+    bots = create_bots()
+    dp = build_dispatcher()
+    # Data from before multi-bot support belongs to the first bot
+    await adopt_unscoped_rows(bots[0].id)
+    # Channel menus are served from memory from the first update on
+    for bot in bots:
+        await get_registry(bot.id)
+    timer.mark('db')
+
+    # Paused until overdue posts are reconciled, so they don't all fire at once as misfires
+    await start_scheduler(paused=True)
+    for bot in bots:
+        await reconcile_overdue_posts(bot)
+    timer.mark('scheduler')
+    scheduler.resume()
+    enable_lease_recovery()
+    for bot in bots:
+        enable_preflight(bot)
+        enable_channel_health(bot)
+    enable_retention()
+
+    outbox_worker = OutboxWorker()
+    outbox_worker.start()
+    click_counter.start()
 
-    await start_scheduler()
+    # Cached on the bot, polling doesn't ask again
+    await asyncio.gather(*(bot.me() for bot in bots))
+    timer.mark('getMe')
+    timer.report()
 
-    print("Bot started!")
-    await dp.start_polling(bot)
+    logger.info("Bot started! Serving %s bot(s).", len(bots))
+    try:
+        # One dispatcher polls every bot; handlers scope their data by the bot of the update
+        await dp.start_polling(*bots)
+    finally:
+        await outbox_worker.stop()
+        # Pending click counts are written before exit
+        await click_counter.stop()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if WORKERS > 1:
+        from utils.workers import run_sharded
+        run_sharded(WORKERS)
+    else:
+        asyncio.run(main())
@@ -0,0 +1,28 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from utils.logs import bind, since
+
+logger = logging.getLogger(__name__)
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """Outermost update middleware: every record logged while handling an update carries its update and user id."""
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get('event_from_user')
+        started = time.monotonic()
+        with bind(update_id=event.update_id, user_id=user.id if user else None):
+            try:
+                return await handler(event, data)
+            finally:
+                logger.debug("Update handled", extra={'latency_ms': since(started)})
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from data.config import UPDATE_CONCURRENCY
+from utils.post_model import ALERT_CALLBACK_PREFIX
+
+
+class _KeyedLocks:
+    """One FIFO lock per key, dropped again when nobody holds or waits for it."""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, List] = {}  # key -> [lock, holders + waiters]
+
+    def waiting(self) -> Dict[Hashable, int]:
+        return {key: users - 1 for key, (_, users) in self._locks.items() if users > 1}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        """Yields True when the key was already held, i.e. we waited for someone."""
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        queued = entry[1] > 0
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield queued
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+
+@asynccontextmanager
+async def _nothing():
+    yield
+
+
+class UpdateOrderingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: updates of one user (and callbacks on one message, except
+    alert buttons) run one at a time in arrival order, different users run in parallel, at most
+    UPDATE_CONCURRENCY handlers at once.
+
+    Parts of a media group after the first one skip the user lane: AlbumMiddleware
+    holds the first part while it waits for the rest.
+    """
+
+    def __init__(self, concurrency: int = UPDATE_CONCURRENCY, album_window: float = 10.0):
+        self.users = _KeyedLocks()
+        self.messages = _KeyedLocks()
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self._albums: "OrderedDict[str, float]" = OrderedDict()
+        self._album_window = album_window
+        self.pending = 0
+        self.active = 0
+        self.processed = 0
+        self.max_wait = 0.0
+
+    def _album_follower(self, update: Update) -> bool:
+        message = update.message
+        if message is None or not message.media_group_id:
+            return False
+        now = time.monotonic()
+        while self._albums and next(iter(self._albums.values())) < now - self._album_window:
+            self._albums.popitem(last=False)
+        if message.media_group_id in self._albums:
+            return True
+        self._albums[message.media_group_id] = now
+        return False
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get('event_from_user')
+        if user is None or self._album_follower(event):
+            return await handler(event, data)
+
+        started = time.monotonic()
+        callback = event.callback_query
+        message_key: Optional[Hashable] = None
+        # Alert buttons only show a popup: many subscribers press them on one post at once
+        if (callback is not None and callback.message is not None
+                and not (callback.data or '').startswith(ALERT_CALLBACK_PREFIX)):
+            message_key = (callback.message.chat.id, callback.message.message_id)
+
+        self.pending += 1
+        running = False
+        try:
+            # Always user lock first, then message lock, so two updates can't wait on each other
+            async with self.users.hold(user.id) as queued:
+                async with (self.messages.hold(message_key) if message_key else _nothing()):
+                    async with self._slots:
+                        self.pending -= 1
+                        running = True
+                        self.max_wait = max(self.max_wait, time.monotonic() - started)
+                        self.active += 1
+                        # The FSM middleware read the state before we queued; the update ahead may have changed it
+                        if queued and data.get('state') is not None:
+                            data['raw_state'] = await data['state'].get_state()
+                        return await handler(event, data)
+        finally:
+            if running:
+                self.active -= 1
+                self.processed += 1
+            else:
+                self.pending -= 1
+
+    def stats(self) -> dict:
+        waiting = self.users.waiting()
+        return {
+            'active': self.active,
+            'limit': self.concurrency,
+            'queued': self.pending,
+            'busiest': sorted(waiting.items(), key=lambda item: -item[1])[:5],
+            'processed': self.processed,
+            'max_wait': self.max_wait,
+        }
+
+
+ordering = UpdateOrderingMiddleware()
@@ -0,0 +1,112 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from data.config import (ADMIN_IDS, THROTTLE_RATE, THROTTLE_BURST, THROTTLE_DENY_WINDOW, THROTTLE_BAN_AFTER,
+                         THROTTLE_BAN_SECONDS)
+from utils.post_model import ALERT_CALLBACK_PREFIX
+
+logger = logging.getLogger(__name__)
+
+
+class _Visitor:
+    __slots__ = ('tokens', 'updated', 'denied_at', 'overflow')
+
+    def __init__(self, now: float):
+        self.tokens = float(THROTTLE_BURST)
+        self.updated = now
+        self.denied_at = float('-inf')
+        self.overflow = 0  # updates dropped since the bucket last had a token
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware in front of the filters, for non-admin users only.
+
+    - token bucket per user (THROTTLE_RATE per second, THROTTLE_BURST at once): updates
+      over the limit are dropped without any reply;
+    - messages and callbacks of non-admins would only get the "Access Denied" reply from
+      AdminFilter, so one of them per THROTTLE_DENY_WINDOW is let through, the rest dropped;
+      alert button presses are the exception, subscribers get those answered;
+    - THROTTLE_BAN_AFTER drops in a row ban the user in memory for THROTTLE_BAN_SECONDS.
+
+    Nothing on the dropped path touches the database or the Bot API.
+    """
+
+    def __init__(self):
+        self.visitors: Dict[int, _Visitor] = {}
+        self.banned: Dict[int, float] = {}
+        self.counters = {'passed': 0, 'denied': 0, 'dropped_denied': 0, 'dropped_rate': 0, 'dropped_banned': 0, 'bans': 0}
+        self._next_sweep = 0.0
+
+    def _sweep(self, now: float):
+        # Forget users idle long enough that their bucket is full and their window is over
+        idle = max(THROTTLE_DENY_WINDOW, THROTTLE_BURST / THROTTLE_RATE)
+        self.visitors = {user_id: v for user_id, v in self.visitors.items() if now - v.updated < idle}
+        self.banned = {user_id: until for user_id, until in self.banned.items() if until > now}
+        self._next_sweep = now + 60
+
+    def _take_token(self, visitor: _Visitor, now: float) -> bool:
+        visitor.tokens = min(THROTTLE_BURST, visitor.tokens + (now - visitor.updated) * THROTTLE_RATE)
+        visitor.updated = now
+        if visitor.tokens >= 1:
+            visitor.tokens -= 1
+            visitor.overflow = 0
+            return True
+        visitor.overflow += 1
+        return False
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get('event_from_user')
+        if user is None or user.id in ADMIN_IDS:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        if self.banned.get(user.id, 0) > now:
+            self.counters['dropped_banned'] += 1
+            return None
+
+        visitor = self.visitors.get(user.id)
+        if visitor is None:
+            visitor = self.visitors[user.id] = _Visitor(now)
+
+        if not self._take_token(visitor, now):
+            self.counters['dropped_rate'] += 1
+            if visitor.overflow >= THROTTLE_BAN_AFTER:
+                self.banned[user.id] = now + THROTTLE_BAN_SECONDS
+                self.counters['bans'] += 1
+                logger.warning("Throttling: user %s banned for %ss after %s dropped updates", user.id, THROTTLE_BAN_SECONDS, visitor.overflow)
+            return None
+
+        callback = event.callback_query
+        if callback is not None and (callback.data or '').startswith(ALERT_CALLBACK_PREFIX):
+            # Subscribers pressing alert buttons are served, only the bucket applies
+            self.counters['passed'] += 1
+        elif event.message is not None or callback is not None:
+            # AdminFilter will deny it; one reply per window is enough
+            if now - visitor.denied_at < THROTTLE_DENY_WINDOW:
+                self.counters['dropped_denied'] += 1
+                return None
+            visitor.denied_at = now
+            self.counters['denied'] += 1
+        else:
+            self.counters['passed'] += 1
+        return await handler(event, data)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return dict(self.counters, tracked=len(self.visitors), active_bans=sum(1 for until in self.banned.values() if until > now))
+
+
+throttling = ThrottlingMiddleware()
@@ -0,0 +1,54 @@
+"""
+Tests run against a scratch SQLite file: DATABASE_URL is set before any project
+module is imported, and the tables are created from the models for each test.
+"""
+import asyncio
+import os
+import tempfile
+
+_SCRATCH = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_SCRATCH, 'test.sqlite')}"
+os.environ.setdefault("BOT_TOKEN", "42:test")
+os.environ["ADMIN_IDS"] = "1001"
+
+import pytest
+
+from database.db import Base, engine
+import database.models  # noqa: F401  (registers the tables)
+from utils.publish_executor import executor
+from utils.rate_limiter import rate_limiter
+from utils import tenants
+
+
+async def _reset_schema():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a fresh event loop with an empty schema; pooled connections are closed afterwards."""
+    def runner(coro):
+        async def wrapped():
+            try:
+                return await coro
+            finally:
+                await engine.dispose()
+        return asyncio.run(wrapped())
+
+    asyncio.run(_reset_schema())
+    asyncio.run(engine.dispose())
+    # The executor's queue and the rate limiter's locks belong to the loop that first used them
+    executor.__init__(executor.workers)
+    rate_limiter.__init__()
+    # Tests register the fake bots they use
+    tenants._bots.clear()
+    return runner
+
+
+@pytest.fixture(scope='session')
+def dp():
+    """The app's dispatcher; its routers can be attached only once per process."""
+    from main import build_dispatcher
+    return build_dispatcher()
@@ -0,0 +1,56 @@
+"""A stand-in for aiogram's Bot that records calls and raises queued errors."""
+import asyncio
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+from aiogram.methods import CopyMessages, SendMediaGroup
+
+
+class FakeBot:
+    def __init__(self, bot_id: int = 42):
+        self.id = bot_id
+        self.calls: List[Tuple[str, int]] = []
+        self.methods: list = []
+        # (method name, chat id) -> errors raised by the next calls, one each
+        self.failures: Dict[Tuple[str, int], list] = {}
+        # Set to an unset asyncio.Event to make every call wait for it
+        self.gate = None
+        self._message_id = 100
+
+    def fail(self, method: str, chat_id: int, *errors: Exception):
+        self.failures.setdefault((method, chat_id), []).extend(errors)
+
+    def _message(self):
+        self._message_id += 1
+        return SimpleNamespace(message_id=self._message_id)
+
+    async def __call__(self, method):
+        if self.gate is not None:
+            await self.gate.wait()
+        name = type(method).__name__
+        chat_id = getattr(method, 'chat_id', None)
+        errors = self.failures.get((name, chat_id))
+        if errors:
+            raise errors.pop(0)
+        self.calls.append((name, chat_id))
+        self.methods.append(method)
+        if isinstance(method, SendMediaGroup):
+            return [self._message() for _ in method.media]
+        if isinstance(method, CopyMessages):
+            return [self._message() for _ in method.message_ids]
+        return self._message()
+
+    async def pin_chat_message(self, chat_id: int, message_id: int, **kwargs):
+        self.calls.append(('pin', chat_id))
+
+    async def get_chat_member(self, chat_id, user_id: int, **kwargs):
+        # Subscription checks pass: every user is a member
+        return SimpleNamespace(status='member')
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await asyncio.sleep(0)
+        self.calls.append(('notify', chat_id))
+        return self._message()
+
+    def count(self, method: str, chat_id: int = None) -> int:
+        return sum(1 for name, chat in self.calls if name == method and (chat_id is None or chat == chat_id))
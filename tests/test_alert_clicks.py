@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+from sqlalchemy import select
+
+import utils.click_stats as click_stats
+from database.db import get_db_session
+from database.models import AlertClickStat, AlertStorage
+from tests.fakes import FakeBot
+from utils.click_stats import ClickCounter, click_counter
+
+SUBSCRIBER, ADMIN, CHANNEL = 2002, 1001, -100
+
+
+def _press(update_id: int, user_id: int, data: str) -> Update:
+    post = Message(message_id=7, date=datetime.now(timezone.utc), chat=Chat(id=CHANNEL, type='channel'))
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), from_user=User(id=user_id, is_bot=False, first_name="U"),
+        chat_instance="c", message=post, data=data,
+    ))
+
+
+async def _stored():
+    async for session in get_db_session():
+        result = await session.execute(select(AlertClickStat.alert_id, AlertClickStat.clicks))
+        return sorted(result.all())
+
+
+def test_subscriber_alert_clicks_are_answered_and_counted(run, dp):
+    async def scenario():
+        async for session in get_db_session():
+            session.add(AlertStorage(id='a1', text="Hello"))
+            await session.commit()
+        bot = FakeBot()
+        # Several presses inside the deny window, on one post, from a non-admin
+        for update_id in range(1, 4):
+            await dp.feed_update(bot, _press(update_id, SUBSCRIBER, 'alert_a1'))
+        await dp.feed_update(bot, _press(4, ADMIN, 'alert_a1'))
+        assert bot.count(AnswerCallbackQuery.__name__) == 4
+        await click_counter.flush()
+        return await _stored()
+
+    assert run(scenario()) == [('a1', 4)]
+
+
+def test_flush_without_native_upsert_adds_to_existing_rows(run, monkeypatch):
+    monkeypatch.setattr(click_stats, '_upsert', lambda rows: None)
+
+    async def scenario():
+        counter = ClickCounter()
+        for alert_id in ('a1', 'a1', 'a2'):
+            counter.hit(alert_id)
+        await counter.flush()
+        counter.hit('a1')
+        counter.hit('a3')
+        await counter.flush()
+        return await _stored()
+
+    assert run(scenario()) == [('a1', 3), ('a2', 1), ('a3', 1)]
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+from aiogram.methods import EditMessageCaption, EditMessageText
+
+from database.db import get_db_session
+from database.models import ArchivedPost, PublishedMessage, ScheduledPost
+from tests.fakes import FakeBot
+from utils.bulk_edit import edit_publication
+from utils.post_model import MediaContent, TextContent, encode_content
+from utils.retention import archive_posts
+
+CHANNEL = -10
+BUTTONS = [{'type': 'url', 'text': "Site", 'url': "https://example.com"}]
+
+
+async def _published_and_archived(post_id: int, content) -> str:
+    async for session in get_db_session():
+        session.add(ScheduledPost(id=post_id, chat_id=CHANNEL, content=encode_content(content), buttons=BUTTONS,
+                                  run_date=datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=2), status='published'))
+        session.add(PublishedMessage(publication_id=f"scheduled:{post_id}", bot_id=42, channel_id=CHANNEL, message_id=500 + post_id,
+                                     kind='content'))
+        await session.commit()
+    assert await archive_posts(days=1, export_path="") == 1
+    return f"scheduled:{post_id}"
+
+
+def _keyboard(method):
+    return [[button.text for button in row] for row in method.reply_markup.inline_keyboard]
+
+
+def test_text_edit_of_archived_text_post_keeps_its_keyboard(run):
+    async def scenario():
+        bot = FakeBot()
+        publication_id = await _published_and_archived(1, TextContent("Old"))
+        results = await edit_publication(bot, publication_id, text="New")
+        async for session in get_db_session():
+            archived = await session.get(ArchivedPost, 1)
+        return results, bot.methods, archived
+
+    results, methods, archived = run(scenario())
+    assert results == {CHANNEL: None}
+    [method] = methods
+    assert isinstance(method, EditMessageText) and method.text == "New"
+    assert _keyboard(method) == [["Site"]]
+    assert archived.preview == "New"
+
+
+def test_button_edit_of_archived_media_post_is_kept_for_the_next_edit(run):
+    async def scenario():
+        bot = FakeBot()
+        publication_id = await _published_and_archived(2, MediaContent('photo', 'F', "Old"))
+        await edit_publication(bot, publication_id, buttons=[{'type': 'url', 'text': "Shop", 'url': "https://shop.example"}])
+        await edit_publication(bot, publication_id, text="New")
+        return bot.methods
+
+    _, caption = run(scenario())
+    assert isinstance(caption, EditMessageCaption) and caption.caption == "New"
+    assert _keyboard(caption) == [["Shop"]]
@@ -0,0 +1,58 @@
+import json
+
+from utils.bulk_import import read_rows, validate_rows
+from utils.preflight import check_button_urls
+
+
+class _Channel:
+    id, telegram_id, title = 1, -1001, "News"
+
+
+def _errors(raw: bytes, filename: str = 'posts.jsonl'):
+    return validate_rows(read_rows(raw, filename), [_Channel()])[1]
+
+
+def _row(**fields) -> bytes:
+    row = {'channel': 1, 'text': "Hi", 'run_date': "01.01.2099 10:00"}
+    row.update(fields)
+    return json.dumps(row).encode()
+
+
+def test_valid_row_has_no_errors():
+    assert _errors(_row()) == []
+
+
+def test_non_utf8_file_is_a_row_error():
+    errors = _errors("channel,text\n1,Привет".encode('cp1251'), 'posts.csv')
+    assert len(errors) == 1 and "not UTF-8" in errors[0]
+
+
+def test_jsonl_line_that_is_not_an_object_is_a_row_error():
+    errors = _errors(b'[1, 2]\n"text"\n' + _row())
+    assert errors == ["Row 1: line 1 is not a JSON object", "Row 2: line 2 is not a JSON object"]
+
+
+def test_album_item_that_is_not_an_object_is_a_row_error():
+    errors = _errors(_row(type='album', media=["photo:A", {'type': 'photo', 'file_id': 'B'}]))
+    assert len(errors) == 1 and "invalid album item" in errors[0]
+
+
+def test_button_urls_follow_the_preflight_rules():
+    buttons = [{'type': 'url', 'text': "Chat", 'url': "tg://resolve?domain=news"},
+               {'type': 'url', 'text': "Site", 'url': "https://example.com"}]
+    assert _errors(_row(buttons=buttons)) == []
+    assert check_button_urls(buttons) == []
+
+    webapp = [{'type': 'webapp', 'text': "App", 'url': "http://example.com"}]
+    assert len(_errors(_row(buttons=webapp))) == 1
+    assert len(check_button_urls(webapp)) == 1
+
+
+def test_repeat_rule_starts_at_the_first_match_from_run_date():
+    # 01.01.2099 is a Thursday; "every Monday 09:00" in Berlin (UTC+1 in winter) starts on the 5th
+    parsed, errors = validate_rows(read_rows(_row(repeat="0 9 * * 1", timezone="Europe/Berlin"), 'posts.jsonl'),
+                                   [_Channel()])
+    assert errors == []
+    assert parsed[0]['run_date'].strftime('%d.%m.%Y %H:%M') == "05.01.2099 08:00"
+    assert parsed[0]['recurrence'] == "0 9 * * 1" and parsed[0]['timezone'] == "Europe/Berlin"
+    assert "invalid repeat rule" in _errors(_row(repeat="every monday"))[0]
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from database.db import get_db_session
+from database.models import ArchivedPost, Channel, ScheduledPost
+from tests.fakes import FakeBot
+from utils.catchup import reconcile_overdue_posts
+from utils.retention import _utcnow, archive_posts
+from utils.tenants import register_bot
+
+
+async def _post(channel_id: int, run_date, status: str = 'pending') -> int:
+    async for session in get_db_session():
+        post = ScheduledPost(bot_id=42, chat_id=channel_id, content={'v': 1, 'text': "Hi"}, buttons=[], run_date=run_date,
+                             status=status)
+        session.add(post)
+        await session.commit()
+        return post.id
+
+async def _status(post_id: int) -> str:
+    async for session in get_db_session():
+        return (await session.get(ScheduledPost, post_id)).status
+
+
+def test_channel_max_age_zero_is_respected(run):
+    async def scenario():
+        async for session in get_db_session():
+            session.add(Channel(id=1, bot_id=42, telegram_id=-1, title="News", added_by=1, catchup_policy='skip',
+                                catchup_max_age_minutes=0))
+            await session.commit()
+        post_id = await _post(1, _utcnow() - timedelta(minutes=5))
+        report = await reconcile_overdue_posts(FakeBot())
+        return report, await _status(post_id)
+
+    report, status = run(scenario())
+    assert report['skip'] == 1 and report['publish'] == 0
+    assert status == 'skipped'
+
+
+def test_skipped_and_queued_posts_are_archived(run):
+    async def scenario():
+        old = _utcnow() - timedelta(days=60)
+        ids = [await _post(1, old, status) for status in ('skipped', 'queued', 'published', 'pending')]
+        moved = await archive_posts(days=30)
+        async for session in get_db_session():
+            archived = set((await session.execute(select(ArchivedPost.id))).scalars())
+        return ids, moved, archived
+
+    ids, moved, archived = run(scenario())
+    assert moved == 3
+    assert archived == set(ids[:3])
+
+
+def test_dispatch_leaves_catchup_posts_to_the_drain(run):
+    bot = FakeBot()
+
+    async def scenario():
+        import asyncio
+        from database.models import OutboxItem
+        from utils import catchup, dispatcher
+
+        async for session in get_db_session():
+            session.add(Channel(id=1, bot_id=42, telegram_id=-1, title="News", added_by=1, catchup_policy='publish'))
+            await session.commit()
+        ids = [await _post(1, _utcnow() - timedelta(minutes=m)) for m in (3, 2, 1)]
+        report = await reconcile_overdue_posts(bot)
+        register_bot(bot)
+        # A dispatch tick right after the scheduler resumes
+        await dispatcher.dispatch_due_posts()
+        sent_by_dispatch = [call for call in bot.calls if call[0] != 'notify']
+        await asyncio.gather(*catchup._background_tasks)
+        async for session in get_db_session():
+            items = (await session.execute(select(OutboxItem).order_by(OutboxItem.next_attempt_at))).scalars().all()
+        return report, ids, sent_by_dispatch, items, [await _status(post_id) for post_id in ids]
+
+    report, ids, sent_by_dispatch, items, statuses = run(scenario())
+    assert report['publish'] == 3
+    assert sent_by_dispatch == []
+    assert statuses == ['queued'] * 3
+    assert [item.scheduled_post_id for item in items] == ids
+    gaps = [(b.next_attempt_at - a.next_attempt_at).total_seconds() for a, b in zip(items, items[1:])]
+    assert all(gap > 1 for gap in gaps)
@@ -0,0 +1,85 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from database.claims import _utcnow, claim_post, claim_posts, finish_post, recover_expired_leases
+from database.db import get_db_session
+from database.models import ScheduledPost
+
+
+async def _add_posts(count: int, run_date: datetime = None):
+    run_date = run_date or datetime(2024, 1, 1)
+    async for session in get_db_session():
+        posts = [ScheduledPost(chat_id=1, content={'v': 1, 'kind': 'text', 'text': str(i)}, buttons=[],
+                               run_date=run_date, status='pending') for i in range(count)]
+        session.add_all(posts)
+        await session.commit()
+        return [post.id for post in posts]
+
+async def _owners():
+    async for session in get_db_session():
+        result = await session.execute(select(ScheduledPost.id, ScheduledPost.claimed_by, ScheduledPost.status))
+        return {row.id: (row.claimed_by, row.status) for row in result}
+
+
+def test_claim_post_has_one_winner_under_concurrency(run):
+    async def scenario():
+        post_ids = await _add_posts(20)
+        wins = {}
+
+        async def worker(owner: str):
+            ids = post_ids[:]
+            random.shuffle(ids)
+            for post_id in ids:
+                if await claim_post(post_id, owner=owner):
+                    wins.setdefault(post_id, []).append(owner)
+
+        await asyncio.gather(*(worker(f"worker-{i}") for i in range(8)))
+        return post_ids, wins, await _owners()
+
+    post_ids, wins, owners = run(scenario())
+    assert sorted(wins) == sorted(post_ids)
+    for post_id, winners in wins.items():
+        assert len(winners) == 1
+        assert owners[post_id] == (winners[0], 'publishing')
+
+
+def test_claim_posts_batches_do_not_overlap(run):
+    async def scenario():
+        post_ids = await _add_posts(50)
+
+        async def batch(owner: str):
+            ids = random.sample(post_ids, 30)
+            return owner, await claim_posts(ids, owner)
+
+        return post_ids, await asyncio.gather(*(batch(f"batch-{i}") for i in range(6))), await _owners()
+
+    post_ids, results, owners = run(scenario())
+    claimed = [post_id for _, ids in results for post_id in ids]
+    assert len(claimed) == len(set(claimed))
+    for owner, ids in results:
+        assert all(owners[post_id][0] == owner for post_id in ids)
+
+
+def test_expired_lease_is_recovered_and_claimed_once(run):
+    async def scenario():
+        [post_id] = await _add_posts(1)
+        assert await claim_post(post_id, owner='crashed')
+        # Another instance can't take a live lease
+        assert not await claim_post(post_id, owner='other')
+        async for session in get_db_session():
+            await session.execute(update(ScheduledPost).where(ScheduledPost.id == post_id)
+                                  .values(lease_expires_at=_utcnow() - timedelta(seconds=1)))
+            await session.commit()
+        recovered = await recover_expired_leases()
+        results = await asyncio.gather(*(claim_post(post_id, owner=f"worker-{i}") for i in range(5)))
+        # The crashed owner can no longer finish the post
+        stale_finish = await finish_post(post_id, 'published', owner='crashed')
+        return post_id, recovered, results, stale_finish
+
+    post_id, recovered, results, stale_finish = run(scenario())
+    assert recovered == [post_id]
+    assert results.count(True) == 1
+    assert not stale_finish
@@ -0,0 +1,50 @@
+import logging
+import time
+
+from sqlalchemy import select
+
+from data.config import DISPATCH_LAG_TARGET_SECONDS, GLOBAL_RATE_PER_SECOND
+from database.db import get_db_session
+from database.models import Channel, ScheduledPost
+from tests.fakes import FakeBot
+from utils.dispatcher import _utcnow, dispatch_due_posts
+from utils.tenants import register_bot
+
+POSTS = 100
+CHANNELS = 10
+
+
+def test_hundred_posts_due_together_are_sent_within_the_lag_target(run, caplog):
+    bot = FakeBot()
+    register_bot(bot)
+
+    async def scenario():
+        due = _utcnow()
+        async for session in get_db_session():
+            session.add_all(Channel(id=i, bot_id=42, telegram_id=-i, title=f"Channel {i}", added_by=1)
+                            for i in range(1, CHANNELS + 1))
+            session.add_all(ScheduledPost(id=i, bot_id=42, chat_id=i % CHANNELS + 1,
+                                          content={'v': 1, 'text': f"Post {i}"}, buttons=[], run_date=due,
+                                          status='pending')
+                            for i in range(1, POSTS + 1))
+            await session.commit()
+        started = time.monotonic()
+        await dispatch_due_posts()
+        elapsed = time.monotonic() - started
+        async for session in get_db_session():
+            statuses = set((await session.execute(select(ScheduledPost.status))).scalars())
+        return elapsed, statuses
+
+    with caplog.at_level(logging.INFO, logger='utils.dispatcher'):
+        elapsed, statuses = run(scenario())
+
+    assert statuses == {'published'}
+    assert bot.count('SendMessage') == POSTS
+    # Paced by the global rate limit only: a burst of one second's budget, then the rate
+    assert elapsed < (POSTS / GLOBAL_RATE_PER_SECOND) + 1 < DISPATCH_LAG_TARGET_SECONDS
+    # Posts to one channel go out in the order they were scheduled
+    for channel in range(1, CHANNELS + 1):
+        texts = [method.text for method in bot.methods if method.chat_id == -channel]
+        assert texts == sorted(texts, key=lambda text: int(text.split()[1]))
+    [line] = [record for record in caplog.records if record.getMessage().startswith("Dispatched")]
+    assert line.levelname == 'INFO' and f"Dispatched {POSTS}/{POSTS} posts" in line.getMessage()
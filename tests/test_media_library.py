@@ -0,0 +1,47 @@
+import asyncio
+
+import utils.media_library as media_library
+from database.db import get_db_session
+from database.models import MediaItem
+from utils.media_library import MediaFile, recent_media, remember, use_media
+
+BOT_ID = 42
+
+
+async def _library():
+    async for session in get_db_session():
+        items = (await session.execute(MediaItem.__table__.select().order_by(MediaItem.file_unique_id))).all()
+        return [(item.file_unique_id, item.file_id, item.uses) for item in items]
+
+
+def _scenario():
+    async def scenario():
+        await remember(BOT_ID, [MediaFile('U1', 'old-id', 'photo', 1000, 800, 600), MediaFile('U2', 'v1', 'video', duration=5)])
+        # Same banner uploaded again (new file_id) and twice in one album
+        await remember(BOT_ID, [MediaFile('U1', 'new-id', 'photo', 1000, 800, 600), MediaFile('U1', 'new-id', 'photo', 1000, 800, 600)])
+        return await _library()
+    return scenario()
+
+
+def test_reupload_refreshes_file_id_instead_of_adding_a_row(run):
+    assert run(_scenario()) == [('U1', 'new-id', 2), ('U2', 'v1', 1)]
+
+
+def test_reupload_without_native_upsert(run, monkeypatch):
+    monkeypatch.setattr(media_library, '_upsert', lambda rows: None)
+    assert run(_scenario()) == [('U1', 'new-id', 2), ('U2', 'v1', 1)]
+
+
+def test_recent_media_pages_and_picking_moves_to_top(run):
+    async def scenario():
+        for n in range(5):
+            await remember(BOT_ID, [MediaFile(f'U{n}', f'f{n}', 'photo')])
+            await asyncio.sleep(0.01)
+        first, more = await recent_media(BOT_ID, 0, page_size=2)
+        last, no_more = await recent_media(BOT_ID, 2, page_size=2)
+        await asyncio.sleep(0.01)
+        picked = await use_media(BOT_ID, 'U0')
+        top, _ = await recent_media(BOT_ID, 0, page_size=1)
+        return [i.file_unique_id for i in first], more, [i.file_unique_id for i in last], no_more, picked.file_id, top[0].file_unique_id
+
+    assert run(scenario()) == (['U4', 'U3'], True, ['U0'], False, 'f0', 'U0')
@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timezone
+
+from aiogram.methods import AnswerCallbackQuery, EditMessageText
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+from sqlalchemy import select
+
+from database.db import get_db_session
+from database.models import Channel, OutboxItem
+from handlers.posting import PostState
+from middlewares.ordering import UpdateOrderingMiddleware
+from tests.fakes import FakeBot
+
+ADMIN = 1001
+
+
+def _user(user_id: int) -> User:
+    return User(id=user_id, is_bot=False, first_name="U")
+
+def _press(update_id: int, user_id: int, data: str, chat_id: int = None, message_id: int = 7) -> Update:
+    chat_id = chat_id or user_id
+    message = Message(message_id=message_id, date=datetime.now(timezone.utc), chat=Chat(id=chat_id, type='private'))
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), from_user=_user(user_id), chat_instance="c", message=message, data=data,
+    ))
+
+def _album_part(update_id: int, user_id: int) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(timezone.utc), chat=Chat(id=user_id, type='private'),
+        from_user=_user(user_id), media_group_id="album",
+    ))
+
+
+class _Handler:
+    """Stub handler: records start/end per update and waits for `release` in between."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.log = []
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, event: Update, data: dict):
+        self.log.append(('start', event.update_id))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await self.release.wait()
+        self.running -= 1
+        self.log.append(('end', event.update_id))
+
+async def _feed(middleware, handler, *updates):
+    tasks = []
+    for update in updates:
+        user = update.callback_query.from_user if update.callback_query else update.message.from_user
+        tasks.append(asyncio.create_task(middleware(handler, update, {'event_from_user': user})))
+        # Let each one reach its lock before the next arrives
+        await asyncio.sleep(0)
+    return tasks
+
+
+def test_double_tap_on_publish_runs_in_order_and_enqueues_once(run, dp):
+    async def scenario():
+        async for session in get_db_session():
+            session.add(Channel(id=1, bot_id=42, telegram_id=-1, title="News", added_by=ADMIN))
+            await session.commit()
+        bot = FakeBot()
+        state = dp.fsm.get_context(bot, chat_id=ADMIN, user_id=ADMIN)
+        await state.set_state(PostState.confirmation)
+        await state.set_data({'target_channel_id': 1, 'content': {'v': 1, 'text': "Hi"}, 'buttons': [],
+                              'draft_id': "draft-1"})
+        # The first tap stops at its first Bot API call; the second must not start meanwhile
+        bot.gate = asyncio.Event()
+        first = asyncio.create_task(dp.feed_update(bot, _press(1, ADMIN, 'pub_now')))
+        await asyncio.sleep(0.2)
+        second = asyncio.create_task(dp.feed_update(bot, _press(2, ADMIN, 'pub_now')))
+        await asyncio.sleep(0.2)
+        async for session in get_db_session():
+            queued = len((await session.execute(select(OutboxItem))).scalars().all())
+        bot.gate.set()
+        await asyncio.gather(first, second)
+        async for session in get_db_session():
+            items = (await session.execute(select(OutboxItem))).scalars().all()
+        return bot, queued, items
+
+    bot, queued, items = run(scenario())
+    assert queued == 1
+    assert len(items) == 1 and items[0].requested_by == ADMIN
+    # The second tap saw the state the first one left (cleared), not the one read on arrival
+    assert [type(method).__name__ for method in bot.methods] == [EditMessageText.__name__]
+
+
+def test_published_draft_is_not_enqueued_again(run, dp):
+    async def scenario():
+        async for session in get_db_session():
+            session.add(Channel(id=1, bot_id=42, telegram_id=-1, title="News", added_by=ADMIN))
+            await session.commit()
+        bot = FakeBot()
+        state = dp.fsm.get_context(bot, chat_id=ADMIN, user_id=ADMIN)
+        for update_id in (1, 2):
+            # Same draft confirmed again, e.g. from a preview left open on another device
+            await state.set_state(PostState.confirmation)
+            await state.set_data({'target_channel_id': 1, 'content': {'v': 1, 'text': "Hi"}, 'buttons': [],
+                                  'draft_id': "draft-2"})
+            await dp.feed_update(bot, _press(update_id, ADMIN, 'pub_now'))
+        async for session in get_db_session():
+            items = (await session.execute(select(OutboxItem))).scalars().all()
+        return bot, items
+
+    bot, items = run(scenario())
+    assert len(items) == 1
+    assert [type(method).__name__ for method in bot.methods] == [EditMessageText.__name__, AnswerCallbackQuery.__name__]
+    assert bot.methods[1].text == "Already published."
+
+
+def test_one_user_runs_in_order_and_different_users_in_parallel(run):
+    async def scenario():
+        middleware, handler = UpdateOrderingMiddleware(concurrency=8), _Handler()
+        tasks = await _feed(middleware, handler, _press(1, 1, 'x'), _press(2, 1, 'y', message_id=8),
+                            _press(3, 2, 'x'))
+        await asyncio.sleep(0.05)
+        during = list(handler.log), middleware.stats()
+        handler.release.set()
+        await asyncio.gather(*tasks)
+        return during, handler.log, middleware.stats()
+
+    (during, stats), log, after = run(scenario())
+    assert during == [('start', 1), ('start', 3)]
+    assert stats['active'] == 2 and stats['queued'] == 1 and stats['busiest'] == [(1, 1)]
+    assert log.index(('end', 1)) < log.index(('start', 2))
+    assert after['processed'] == 3 and after['active'] == after['queued'] == 0
+    assert after['max_wait'] > 0
+
+
+def test_callbacks_on_one_message_wait_except_alert_buttons(run):
+    async def scenario():
+        middleware, handler = UpdateOrderingMiddleware(concurrency=8), _Handler()
+        # Three users press buttons on the same channel post
+        tasks = await _feed(middleware, handler, _press(1, 1, 'vote', chat_id=-100), _press(2, 2, 'vote', chat_id=-100),
+                            _press(3, 3, 'alert_a1', chat_id=-100))
+        await asyncio.sleep(0.05)
+        during = list(handler.log)
+        handler.release.set()
+        await asyncio.gather(*tasks)
+        return during
+
+    assert run(scenario()) == [('start', 1), ('start', 3)]
+
+
+def test_concurrency_cap_queues_the_rest(run):
+    async def scenario():
+        middleware, handler = UpdateOrderingMiddleware(concurrency=2), _Handler()
+        tasks = await _feed(middleware, handler, *(_press(i, i, 'x') for i in range(1, 5)))
+        await asyncio.sleep(0.05)
+        stats = middleware.stats()
+        handler.release.set()
+        await asyncio.gather(*tasks)
+        return stats, handler.max_running
+
+    stats, max_running = run(scenario())
+    assert stats['active'] == 2 and stats['queued'] == 2
+    assert max_running == 2
+
+
+def test_album_parts_after_the_first_skip_the_user_lane(run):
+    async def scenario():
+        middleware, handler = UpdateOrderingMiddleware(concurrency=8), _Handler()
+        # The first part is held (as AlbumMiddleware does while collecting); the rest must reach it
+        tasks = await _feed(middleware, handler, _album_part(1, 1), _album_part(2, 1), _album_part(3, 1))
+        await asyncio.sleep(0.05)
+        during = list(handler.log)
+        handler.release.set()
+        await asyncio.gather(*tasks)
+        return during
+
+    assert run(scenario()) == [('start', 1), ('start', 2), ('start', 3)]
@@ -0,0 +1,142 @@
+import asyncio
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from sqlalchemy import select, update
+
+from data.config import OUTBOX_MAX_ATTEMPTS
+from database.db import get_db_session
+from database.models import OutboxItem, PublishedMessage
+from tests.fakes import FakeBot
+from utils.outbox import OutboxWorker, _utcnow, enqueue
+from utils.post_model import Album, MediaContent, encode_content
+from utils.tenants import register_bot
+
+SOURCE, COPY_A, COPY_B = -1, -2, -3
+PAYLOAD = {
+    'channel_ids': [1, 2, 3],
+    'content': encode_content(Album([MediaContent('photo', 'A', "caption"), MediaContent('photo', 'B')])),
+    'buttons': [{'type': 'url', 'text': "Site", 'url': "https://example.com"}],
+}
+METHOD = SendMessage(chat_id=0, text="x")
+
+
+async def _attempt(worker: OutboxWorker, item_id: int, chat_ids=(SOURCE, COPY_A, COPY_B)) -> OutboxItem:
+    """Make the item due, claim it and run one publish attempt; returns the item afterwards."""
+    async for session in get_db_session():
+        await session.execute(update(OutboxItem).where(OutboxItem.id == item_id).values(next_attempt_at=_utcnow()))
+        await session.commit()
+    assert await worker._claim(item_id)
+    async for session in get_db_session():
+        item = await session.get(OutboxItem, item_id)
+    await worker.process(item, list(chat_ids))
+    async for session in get_db_session():
+        return await session.get(OutboxItem, item_id)
+
+async def _recorded(publication_id: str):
+    async for session in get_db_session():
+        result = await session.execute(select(PublishedMessage.channel_id, PublishedMessage.kind)
+                                       .where(PublishedMessage.publication_id == publication_id))
+        return sorted(result.all())
+
+
+def test_retry_sends_only_the_missing_steps(run):
+    bot = FakeBot()
+    # The album goes out, the keyboard message under it fails
+    bot.fail('SendMessage', SOURCE, TelegramNetworkError(METHOD, "timeout"))
+    # One copy hits a flood limit
+    bot.fail('CopyMessages', COPY_B, TelegramRetryAfter(METHOD, "flood", 0))
+
+    async def scenario():
+        register_bot(bot)
+        worker = OutboxWorker()
+        item_id = await enqueue(PAYLOAD, requested_by=7)
+        first = await _attempt(worker, item_id)
+        second = await _attempt(worker, item_id)
+        third = await _attempt(worker, item_id)
+        return item_id, first, second, third, await _recorded(f"outbox:{item_id}")
+
+    item_id, first, second, third, recorded = run(scenario())
+    assert first.status == 'pending' and second.status == 'pending'
+    assert third.status == 'done' and third.last_error is None
+    # Every step went out exactly once
+    assert bot.count('SendMediaGroup') == 1
+    assert bot.count('SendMessage', SOURCE) == 1
+    assert bot.count('CopyMessages', COPY_A) == 1 and bot.count('CopyMessages', COPY_B) == 1
+    assert bot.count('CopyMessage', COPY_A) == 1 and bot.count('CopyMessage', COPY_B) == 1
+    assert recorded == sorted([(SOURCE, 'album')] * 2 + [(SOURCE, 'keyboard')]
+                              + [(chat, 'album') for chat in (COPY_A, COPY_B) for _ in range(2)]
+                              + [(COPY_A, 'keyboard'), (COPY_B, 'keyboard')])
+    assert bot.count('notify', 7) == 1
+
+
+def test_permanent_copy_error_is_not_retried(run):
+    bot = FakeBot()
+    bot.fail('CopyMessages', COPY_A, TelegramForbiddenError(METHOD, "bot was kicked"))
+
+    async def scenario():
+        register_bot(bot)
+        worker = OutboxWorker()
+        item_id = await enqueue(PAYLOAD, scheduled_post_id=5)
+        return await _attempt(worker, item_id)
+
+    item = run(scenario())
+    assert item.status == 'done' and str(COPY_A) in item.last_error
+    # Scheduled posts have no requester: admins hear about the failed channel
+    assert bot.count('notify', 1001) == 1
+
+
+def test_dead_scheduled_post_notifies_admins(run):
+    bot = FakeBot()
+    bot.fail('SendMediaGroup', SOURCE, TelegramForbiddenError(METHOD, "bot was kicked"))
+
+    async def scenario():
+        register_bot(bot)
+        worker = OutboxWorker()
+        item_id = await enqueue(PAYLOAD, scheduled_post_id=5)
+        return await _attempt(worker, item_id)
+
+    item = run(scenario())
+    assert item.status == 'dead'
+    assert bot.count('notify', 1001) == 1
+
+
+def test_flood_limited_item_dies_after_the_attempts_budget(run):
+    bot = FakeBot()
+    bot.fail('SendMediaGroup', SOURCE, *[TelegramRetryAfter(METHOD, "flood", 0)] * OUTBOX_MAX_ATTEMPTS)
+
+    async def scenario():
+        register_bot(bot)
+        worker = OutboxWorker()
+        item_id = await enqueue(PAYLOAD, requested_by=7)
+        return [await _attempt(worker, item_id) for _ in range(OUTBOX_MAX_ATTEMPTS)]
+
+    attempts = run(scenario())
+    assert [item.status for item in attempts[:-1]] == ['pending'] * (OUTBOX_MAX_ATTEMPTS - 1)
+    assert attempts[-1].status == 'dead' and attempts[-1].attempts == OUTBOX_MAX_ATTEMPTS
+    assert bot.count('SendMediaGroup') == 0
+    assert bot.count('notify', 7) == 1
+
+
+def test_stop_hands_back_items_still_publishing(run):
+    bot = FakeBot()
+
+    async def scenario():
+        bot.gate = asyncio.Event()
+        register_bot(bot)
+        worker = OutboxWorker()
+        item_id = await enqueue(PAYLOAD, requested_by=7)
+        assert await worker._claim(item_id)
+        async for session in get_db_session():
+            item = await session.get(OutboxItem, item_id)
+        task = asyncio.create_task(worker.process(item, [SOURCE]))
+        worker._running[task] = item_id
+        await asyncio.sleep(0.05)
+        await worker.stop(timeout=0.1)
+        async for session in get_db_session():
+            return task, await session.get(OutboxItem, item_id)
+
+    task, item = run(scenario())
+    assert task.cancelled()
+    assert item.status == 'pending' and item.locked_until is None
+    assert bot.calls == []
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from aiogram.methods import SendMessage
+
+from tests.fakes import FakeBot
+from utils.publish_executor import PublishExecutor
+
+
+def _job(bot: FakeBot, started: list, chat_id: int, text: str):
+    async def job():
+        started.append((chat_id, text))
+        return await bot(SendMessage(chat_id=chat_id, text=text))
+    return job
+
+def _sent(bot: FakeBot):
+    return [(method.chat_id, method.text) for method in bot.methods]
+
+async def _stop(executor: PublishExecutor):
+    for task in executor._tasks:
+        task.cancel()
+    await asyncio.gather(*executor._tasks, return_exceptions=True)
+
+
+def test_one_lane_runs_its_jobs_one_at_a_time_in_order(run):
+    async def scenario():
+        bot, executor, started = FakeBot(), PublishExecutor(workers=4), []
+        bot.gate = asyncio.Event()
+        futures = [executor.submit(-1, _job(bot, started, -1, str(i))) for i in range(3)]
+        await asyncio.sleep(0.05)
+        during = list(started), executor.stats()
+        bot.gate.set()
+        results = await asyncio.gather(*futures)
+        after = executor.stats()
+        await _stop(executor)
+        return bot, during, results, after
+
+    bot, (started, [lane]), results, [done] = run(scenario())
+    # Four workers, but the lane hands out one job at a time
+    assert started == [(-1, "0")]
+    assert lane['depth'] == 2 and lane['active'] and lane['oldest_wait'] > 0
+    assert _sent(bot) == [(-1, "0"), (-1, "1"), (-1, "2")]
+    assert [message.message_id for message in results] == [101, 102, 103]
+    assert done['depth'] == 0 and not done['active'] and done['processed'] == 3
+    # Jobs 1 and 2 waited behind the gated job 0
+    assert done['max_wait'] >= 0.05
+
+
+def test_two_lanes_run_in_parallel_and_each_keeps_its_order(run):
+    async def scenario():
+        bot, executor, started = FakeBot(), PublishExecutor(workers=4), []
+        bot.gate = asyncio.Event()
+        futures = [executor.submit(chat_id, _job(bot, started, chat_id, f"{chat_id}:{i}"))
+                   for i in range(3) for chat_id in (-1, -2)]
+        await asyncio.sleep(0.05)
+        during = list(started), {lane['lane']: lane['depth'] for lane in executor.stats()}
+        bot.gate.set()
+        await asyncio.gather(*futures)
+        await _stop(executor)
+        return bot, during
+
+    bot, (started, depths) = run(scenario())
+    assert started == [(-1, "-1:0"), (-2, "-2:0")]
+    assert depths == {-1: 2, -2: 2}
+    for chat_id in (-1, -2):
+        assert [text for chat, text in _sent(bot) if chat == chat_id] == [f"{chat_id}:{i}" for i in range(3)]
+
+
+def test_failed_job_does_not_block_its_lane(run):
+    async def scenario():
+        bot, executor, started = FakeBot(), PublishExecutor(workers=2), []
+        bot.fail('SendMessage', -1, RuntimeError("boom"))
+        first = executor.submit(-1, _job(bot, started, -1, "0"))
+        second = executor.submit(-1, _job(bot, started, -1, "1"))
+        with pytest.raises(RuntimeError):
+            await first
+        await second
+        stats = executor.stats()
+        await _stop(executor)
+        return bot, stats
+
+    bot, [lane] = run(scenario())
+    assert _sent(bot) == [(-1, "1")]
+    assert lane['processed'] == 2 and lane['depth'] == 0
@@ -0,0 +1,48 @@
+from aiogram.methods import CopyMessage, CopyMessages, SendMediaGroup, SendMessage
+
+from tests.fakes import FakeBot
+from utils.publisher import CompiledPost, payload_size, publish_to_channels
+
+CHANNELS = [-1, -2, -3, -4, -5]
+BUTTONS = [{'type': 'url', 'text': "Site", 'url': "https://example.com"}]
+ALBUM = {'v': 1, 'type': 'album', 'items': [
+    {'type': 'photo', 'file_id': f"AgACAgIAAxkBAAI{i}" * 4, 'caption': "Caption " * 40 if i == 0 else ""}
+    for i in range(4)]}
+
+
+def _publish(run, content):
+    bot = FakeBot()
+    post = CompiledPost(content, BUTTONS)
+    result = run(publish_to_channels(bot, CHANNELS, post))
+    direct = sum(payload_size(method) for chat_id in CHANNELS for method, _ in post.send_methods(chat_id))
+    return bot, result, direct
+
+
+def test_text_post_is_sent_once_and_copied_to_the_other_channels(run):
+    bot, result, direct = _publish(run, {'v': 1, 'text': "<b>News</b> " * 200})
+
+    assert bot.calls == [('SendMessage', -1)] + [('CopyMessage', chat_id) for chat_id in CHANNELS[1:]]
+    assert result.api_calls == result.direct_api_calls == len(CHANNELS)
+    assert result.payload_bytes == sum(payload_size(method) for method in bot.methods)
+    assert result.direct_payload_bytes == direct
+    # Each copy carries ids and the keyboard instead of 2 KB of text
+    assert result.direct_payload_bytes - result.payload_bytes > 4 * 1500
+    assert all(result.sent[chat_id] for chat_id in CHANNELS) and not result.errors
+
+
+def test_album_is_copied_with_one_call_and_its_keyboard_with_another(run):
+    bot, result, direct = _publish(run, ALBUM)
+
+    assert bot.count('SendMediaGroup') == 1 and bot.count('SendMessage') == 1
+    assert [bot.count(method) for method in ('CopyMessages', 'CopyMessage')] == [4, 4]
+    copied = [method for method in bot.methods if isinstance(method, CopyMessages)]
+    album = next(method for method in bot.methods if isinstance(method, SendMediaGroup))
+    assert all(method.from_chat_id == -1 and len(method.message_ids) == len(album.media) for method in copied)
+    keyboards = [method for method in bot.methods if isinstance(method, (SendMessage, CopyMessage))]
+    assert all(method.reply_markup is not None for method in keyboards)
+
+    assert result.api_calls == result.direct_api_calls == 2 * len(CHANNELS)
+    assert result.payload_bytes == sum(payload_size(method) for method in bot.methods)
+    assert result.direct_payload_bytes == direct
+    assert result.payload_bytes < direct / 2
+    assert [len(result.sent[chat_id]) for chat_id in CHANNELS] == [len(album.media) + 1] * len(CHANNELS)
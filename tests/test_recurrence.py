@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from database.db import get_db_session
+from database.models import Channel, OutboxItem, PublishedMessage, ScheduledPost
+from tests.fakes import FakeBot
+from utils.catchup import reconcile_overdue_posts
+from utils.dispatcher import dispatch_due_posts
+from utils.outbox import OutboxWorker
+from utils.recurrence import _utcnow, next_run
+from utils.tenants import register_bot
+
+
+def _runs(rule: str, tz_name: str, after: datetime, count: int):
+    runs = []
+    for _ in range(count):
+        after = next_run(rule, tz_name, after)
+        runs.append(after.strftime('%m-%d %H:%M'))
+    return runs
+
+
+def test_daily_rule_keeps_its_wall_clock_time_across_dst():
+    # Berlin moves to summer time on 29.03.2026: 09:00 local is 08:00 UTC before, 07:00 after
+    assert _runs("0 9 * * *", "Europe/Berlin", datetime(2026, 3, 27, 12), 3) == ["03-28 08:00", "03-29 07:00", "03-30 07:00"]
+
+
+def test_skipped_wall_time_runs_after_the_jump_and_repeated_one_runs_once():
+    # 02:30 does not exist on 29.03 (runs at 03:30 CEST) and happens twice on 25.10 (runs once, in CEST)
+    assert _runs("30 2 * * *", "Europe/Berlin", datetime(2026, 3, 28, 12), 2) == ["03-29 01:30", "03-30 00:30"]
+    assert _runs("30 2 * * *", "Europe/Berlin", datetime(2026, 10, 24, 12), 2) == ["10-25 00:30", "10-26 01:30"]
+
+
+def test_cron_weekdays_count_from_sunday():
+    # 01.01.2099 is a Thursday
+    assert next_run("0 9 * * 1", "UTC", datetime(2099, 1, 1)) == datetime(2099, 1, 5, 9)
+    assert next_run("0 9 * * 7", "UTC", datetime(2099, 1, 1)) == datetime(2099, 1, 4, 9)
+    assert next_run("0 9 * * 5-7", "UTC", datetime(2099, 1, 1)) == datetime(2099, 1, 2, 9)
+
+
+async def _setup(*posts):
+    async for session in get_db_session():
+        session.add(Channel(id=1, bot_id=42, telegram_id=-1, title="News", added_by=1))
+        session.add_all(posts)
+        await session.commit()
+
+async def _posts():
+    async for session in get_db_session():
+        return {post.id: post for post in (await session.execute(select(ScheduledPost))).scalars()}
+
+
+def test_dispatch_sends_the_occurrence_and_moves_the_post_to_the_next_one(run):
+    bot = FakeBot()
+    register_bot(bot)
+
+    async def scenario():
+        due = _utcnow() - timedelta(seconds=5)
+        await _setup(
+            ScheduledPost(id=1, bot_id=42, chat_id=1, content={'v': 1, 'text': "Rules"}, buttons=[], run_date=due,
+                          status='pending', recurrence="0 9 * * *", timezone="Europe/Berlin"),
+            ScheduledPost(id=2, bot_id=42, chat_id=1, content={'v': 1, 'text': "Once"}, buttons=[], run_date=due,
+                          status='pending'),
+        )
+        await dispatch_due_posts()
+        async for session in get_db_session():
+            publications = set((await session.execute(select(PublishedMessage.publication_id))).scalars())
+        return due, await _posts(), publications
+
+    due, posts, publications = run(scenario())
+    assert bot.count('SendMessage', -1) == 2
+    assert posts[2].status == 'published'
+    recurring = posts[1]
+    assert recurring.status == 'pending' and recurring.claimed_by is None
+    assert recurring.run_date == next_run("0 9 * * *", "Europe/Berlin", _utcnow())
+    # Each occurrence is its own publication, so the next one is not taken for already sent
+    assert publications == {f"scheduled:1@{due:%Y%m%d%H%M%S}", "scheduled:2"}
+
+
+def test_outbox_does_not_finish_a_recurring_post(run):
+    bot = FakeBot()
+    register_bot(bot)
+
+    async def scenario():
+        later = _utcnow() + timedelta(days=1)
+        await _setup(ScheduledPost(id=1, bot_id=42, chat_id=1, content={'v': 1, 'text': "Rules"}, buttons=[],
+                                   run_date=later, status='pending', recurrence="0 9 * * *", timezone="UTC"))
+        async for session in get_db_session():
+            item = OutboxItem(payload={'channel_ids': [1], 'content': {'v': 1, 'text': "Rules"}, 'buttons': []},
+                              bot_id=42, status='processing', attempts=1, next_attempt_at=_utcnow(),
+                              scheduled_post_id=1, publication_id="scheduled:1@20260101090000")
+            session.add(item)
+            await session.commit()
+        await OutboxWorker().process(item, [-1])
+        return later, await _posts()
+
+    later, posts = run(scenario())
+    assert posts[1].status == 'pending' and posts[1].run_date == later
+
+
+def test_catchup_skips_a_missed_occurrence_to_the_next_one(run):
+    async def scenario():
+        missed = _utcnow() - timedelta(days=2)
+        await _setup(ScheduledPost(id=1, bot_id=42, chat_id=1, content={'v': 1, 'text': "Rules"}, buttons=[],
+                                   run_date=missed, status='pending', recurrence="0 9 * * *", timezone="UTC"))
+        async for session in get_db_session():
+            channel = await session.get(Channel, 1)
+            channel.catchup_policy, channel.catchup_max_age_minutes = 'ask', 0
+            await session.commit()
+        report = await reconcile_overdue_posts(FakeBot())
+        return report, await _posts()
+
+    report, posts = run(scenario())
+    assert report['skip'] == 1 and report['ask'] == 0
+    assert posts[1].status == 'pending' and posts[1].run_date > _utcnow()
@@ -0,0 +1,24 @@
+import logging
+
+from benchmarks.startup import time_to_first_update
+from data.config import STARTUP_BUDGET_SECONDS
+from utils.startup import StartupTimer
+
+
+def test_timer_books_each_phase_and_warns_over_budget(monkeypatch, caplog):
+    clock = iter([10.0, 10.5, 12.0])
+    monkeypatch.setattr('utils.startup.time.perf_counter', lambda: next(clock))
+    timer = StartupTimer()
+    timer.mark('imports')
+    timer.mark('db')
+    with caplog.at_level(logging.INFO, logger='utils.startup'):
+        timer.report(budget=1.5)
+    assert timer.phases == [('imports', 0.5), ('db', 1.5)]
+    assert timer.total == 2.0
+    assert [record.levelname for record in caplog.records] == ['INFO', 'WARNING']
+
+
+def test_first_update_is_answered_within_the_startup_budget(run):
+    elapsed, lines = run(time_to_first_update(timeout=60))
+    assert lines, "main.py logged no startup phases"
+    assert elapsed < STARTUP_BUDGET_SECONDS
@@ -0,0 +1,93 @@
+from sqlalchemy import select, update
+
+from database.db import get_db_session
+from database.models import Channel, OutboxItem, PublishedMessage, ScheduledPost
+from tests.fakes import FakeBot
+from utils.cache import channel_cache
+from utils.channel_registry import get_registry
+from utils.dispatcher import dispatch_due_posts
+from utils.outbox import OutboxWorker, _utcnow, enqueue
+from utils.tenants import adopt_unscoped_rows, register_bot
+
+PAYLOAD = {'content': {'v': 1, 'text': "Hi"}, 'buttons': []}
+
+
+async def _channels():
+    # Channel 1 belongs to bot 42, channel 2 to bot 43
+    async for session in get_db_session():
+        session.add(Channel(id=1, bot_id=42, telegram_id=-1, title="News", added_by=1))
+        session.add(Channel(id=2, bot_id=43, telegram_id=-2, title="Deals", added_by=1))
+        await session.commit()
+
+def _bots():
+    first, second = FakeBot(42), FakeBot(43)
+    register_bot(first)
+    register_bot(second)
+    return first, second
+
+
+def test_each_due_post_is_sent_by_its_own_bot(run):
+    first, second = _bots()
+
+    async def scenario():
+        await _channels()
+        async for session in get_db_session():
+            for bot_id, channel_id in ((42, 1), (43, 2)):
+                session.add(ScheduledPost(bot_id=bot_id, chat_id=channel_id, content=PAYLOAD['content'], buttons=[],
+                                          run_date=_utcnow(), status='pending'))
+            await session.commit()
+        await dispatch_due_posts()
+        async for session in get_db_session():
+            sent = (await session.execute(select(PublishedMessage.bot_id, PublishedMessage.channel_id))).all()
+            statuses = set((await session.execute(select(ScheduledPost.status))).scalars())
+        return sorted(sent), statuses
+
+    sent, statuses = run(scenario())
+    assert statuses == {'published'}
+    assert first.calls == [('SendMessage', -1)]
+    assert second.calls == [('SendMessage', -2)]
+    assert sent == [(42, -1), (43, -2)]
+
+
+def test_outbox_items_use_their_bot(run):
+    first, second = _bots()
+
+    async def scenario():
+        await _channels()
+        served = await enqueue({**PAYLOAD, 'channel_ids': [2]}, bot_id=43)
+        # A bot removed from BOT_TOKENS: its items can't be sent by another bot
+        orphan = await enqueue({**PAYLOAD, 'channel_ids': [2]}, bot_id=44)
+        worker = OutboxWorker()
+        for item_id in (served, orphan):
+            async for session in get_db_session():
+                await session.execute(update(OutboxItem).where(OutboxItem.id == item_id).values(next_attempt_at=_utcnow()))
+                await session.commit()
+            assert await worker._claim(item_id)
+            async for session in get_db_session():
+                item = await session.get(OutboxItem, item_id)
+            await worker.process(item, [-2])
+        async for session in get_db_session():
+            return [(await session.get(OutboxItem, item_id)).status for item_id in (served, orphan)]
+
+    statuses = run(scenario())
+    assert statuses == ['done', 'dead']
+    assert first.count('SendMessage') == 0
+    assert second.count('SendMessage', -2) == 1
+
+
+def test_rows_without_a_bot_go_to_the_primary_bot(run):
+    async def scenario():
+        channel_cache.invalidate()
+        async for session in get_db_session():
+            session.add(Channel(id=1, telegram_id=-1, title="Legacy", added_by=1))
+            session.add(Channel(id=2, bot_id=43, telegram_id=-2, title="Deals", added_by=1))
+            await session.commit()
+        adopted = await adopt_unscoped_rows(42)
+        again = await adopt_unscoped_rows(42)
+        return adopted, again, await get_registry(42), await get_registry(43)
+
+    adopted, again, primary, other = run(scenario())
+    assert adopted == {'channels': 1}
+    assert again == {}
+    assert [channel.title for channel in primary.entries] == ["Legacy"]
+    assert [channel.title for channel in other.entries] == ["Deals"]
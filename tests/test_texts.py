@@ -0,0 +1,15 @@
+import utils.texts as texts
+
+
+def test_language_with_only_format_strings_does_not_fall_back(monkeypatch):
+    monkeypatch.setitem(texts.STATIC, 'xx', {})
+    monkeypatch.setitem(texts.FORMATS, 'xx', {'greeting': "Hi {name}"})
+    assert texts.text('greeting', 'xx', name="Ann") == "Hi Ann"
+    assert texts.text('greeting', 'unknown-lang', name="Ann") == texts.text('greeting', texts.DEFAULT_LANG, name="Ann")
+
+
+def test_all_texts_includes_strings_with_escaped_braces_only(monkeypatch):
+    monkeypatch.setitem(texts.STATIC, 'xx', {})
+    monkeypatch.setitem(texts.FORMATS, 'xx', {'menu': "{{ Menu }}", 'hello': "Hi {name}"})
+    assert "{ Menu }" in texts.all_texts('menu')
+    assert not any('{' in value for value in texts.all_texts('hello'))
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+import middlewares.throttling as throttling_module
+from data.config import THROTTLE_BAN_AFTER, THROTTLE_BAN_SECONDS, THROTTLE_BURST, THROTTLE_DENY_WINDOW, THROTTLE_RATE
+from middlewares.throttling import ThrottlingMiddleware
+
+USER, ADMIN = 2002, 1001
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the middleware's clock: asyncio keeps the real one
+    monkeypatch.setattr(throttling_module, 'time', SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def _message(update_id: int, user_id: int = USER) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(timezone.utc), chat=Chat(id=user_id, type='private'),
+        from_user=User(id=user_id, is_bot=False, first_name="U"), text="hi"))
+
+def _press(update_id: int, data: str, user_id: int = USER) -> Update:
+    post = Message(message_id=7, date=datetime.now(timezone.utc), chat=Chat(id=-100, type='channel'))
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), from_user=User(id=user_id, is_bot=False, first_name="U"), chat_instance="c",
+        message=post, data=data))
+
+def _feed(middleware: ThrottlingMiddleware, *updates: Update) -> list:
+    """Update ids that reached the handler."""
+    handled = []
+
+    async def handler(event: Update, data: dict):
+        handled.append(event.update_id)
+
+    async def feed():
+        for update in updates:
+            user = update.callback_query.from_user if update.callback_query else update.message.from_user
+            await middleware(handler, update, {'event_from_user': user})
+
+    asyncio.run(feed())
+    return handled
+
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate(clock):
+    middleware = ThrottlingMiddleware()
+    presses = [_press(i, 'alert_a1') for i in range(THROTTLE_BURST + 2)]
+    assert _feed(middleware, *presses) == list(range(THROTTLE_BURST))
+    assert middleware.counters['dropped_rate'] == 2
+
+    clock.now += 1 / THROTTLE_RATE
+    assert _feed(middleware, _press(100, 'alert_a1'), _press(101, 'alert_a1')) == [100]
+    assert middleware.counters['passed'] == THROTTLE_BURST + 1
+
+
+def test_one_denied_update_per_window(clock):
+    middleware = ThrottlingMiddleware()
+    assert _feed(middleware, _message(1), _message(2), _press(3, 'menu')) == [1]
+    assert middleware.counters['denied'] == 1 and middleware.counters['dropped_denied'] == 2
+
+    clock.now += THROTTLE_DENY_WINDOW
+    assert _feed(middleware, _message(4), _message(5)) == [4]
+
+
+def test_alert_buttons_are_not_limited_by_the_deny_window(clock):
+    middleware = ThrottlingMiddleware()
+    assert _feed(middleware, _message(1), _press(2, 'alert_a1'), _press(3, 'alert_a2'), _message(4)) == [1, 2, 3]
+    assert middleware.counters['passed'] == 2
+
+
+def test_user_is_banned_after_too_many_drops_in_a_row(clock):
+    middleware = ThrottlingMiddleware()
+    flood = [_press(i, 'alert_a1') for i in range(THROTTLE_BURST + THROTTLE_BAN_AFTER)]
+    assert _feed(middleware, *flood) == list(range(THROTTLE_BURST))
+    assert middleware.counters['bans'] == 1 and middleware.stats()['active_bans'] == 1
+
+    # Even with a full bucket again, nothing gets through until the ban ends
+    clock.now += THROTTLE_BAN_SECONDS - 1
+    assert _feed(middleware, _press(100, 'alert_a1')) == []
+    assert middleware.counters['dropped_banned'] == 1
+
+    clock.now += 1
+    assert _feed(middleware, _press(101, 'alert_a1')) == [101]
+
+
+def test_admins_and_updates_without_a_user_are_never_throttled(clock):
+    middleware = ThrottlingMiddleware()
+    admin = [_message(i, ADMIN) for i in range(THROTTLE_BURST * 3)]
+    assert len(_feed(middleware, *admin)) == len(admin)
+    assert middleware.stats()['tracked'] == 0
+
+    async def handler(event, data):
+        return 'handled'
+
+    assert asyncio.run(middleware(handler, Update(update_id=1), {})) == 'handled'
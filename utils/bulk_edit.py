@@ -0,0 +1,220 @@
+"""
+Edit or delete every copy of a published post.
+
+`published_messages` keeps each sent message per channel (content, album parts and
+the separate keyboard message of albums). An edit or delete is turned into one job
+per channel on that channel's executor lane; all channels run concurrently and every
+call goes through the rate limiter. The result is a per-channel summary.
+"""
+import asyncio
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.methods import TelegramMethod, EditMessageText, EditMessageCaption, EditMessageReplyMarkup, DeleteMessages
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import select, update, delete, func
+
+from database.db import get_db_session
+from database.models import PublishedMessage, ScheduledPost, ArchivedPost, OutboxItem
+from handlers.callbacks import reconstruct_keyboard
+from utils.post_model import TextContent, decode_buttons, decode_content, encode_content, encode_buttons, plain_text
+from utils.publish_executor import executor
+from utils.publisher import SentMessages, call_api
+
+# Unchanged content is not an error when the same edit is applied twice
+NOT_MODIFIED = "message is not modified"
+
+
+async def recent_publications(bot_id: int, limit: int = 10) -> List[Tuple[str, int, object]]:
+    """(publication_id, channel count, first sent at) of the latest publications of a bot."""
+    async for session in get_db_session():
+        result = await session.execute(
+            select(PublishedMessage.publication_id,
+                   func.count(func.distinct(PublishedMessage.channel_id)),
+                   func.min(PublishedMessage.created_at).label('sent_at'))
+            .where(PublishedMessage.bot_id == bot_id)
+            .group_by(PublishedMessage.publication_id)
+            .order_by(func.max(PublishedMessage.id).desc())
+            .limit(limit)
+        )
+        return list(result.all())
+    return []
+
+async def publication_messages(publication_id: str, bot_id: int) -> Dict[int, SentMessages]:
+    """channel telegram id -> [(message_id, kind)] in sending order, for the messages `bot_id` sent."""
+    async for session in get_db_session():
+        result = await session.execute(
+            select(PublishedMessage.channel_id, PublishedMessage.message_id, PublishedMessage.kind)
+            .where(PublishedMessage.publication_id == publication_id, PublishedMessage.bot_id == bot_id)
+            .order_by(PublishedMessage.id)
+        )
+        messages: Dict[int, SentMessages] = defaultdict(list)
+        for channel_id, message_id, kind in result.all():
+            messages[channel_id].append((message_id, kind))
+        return dict(messages)
+    return {}
+
+def _source_row(publication_id: str):
+    kind, _, row_id = publication_id.partition(':')
+    # Occurrences of a recurring post ("scheduled:<id>@<run date>") share its row
+    row_id = row_id.partition('@')[0]
+    if kind == 'scheduled' and row_id.isdigit():
+        return ScheduledPost, int(row_id)
+    if kind == 'outbox' and row_id.isdigit():
+        return OutboxItem, int(row_id)
+    return None, None
+
+def _kind(content) -> Optional[str]:
+    try:
+        return decode_content(content).kind
+    except ValueError:
+        return None
+
+def _with_text(content, text: str) -> dict:
+    return encode_content(decode_content(content).with_text(text) if content else TextContent(text))
+
+async def publication_source(publication_id: str) -> Tuple[Optional[str], Optional[dict], Optional[list]]:
+    """
+    (kind, content, buttons) the publication was sent with. Posts moved to the archive by
+    retention keep their kind and buttons but not the content; all None if nothing is left.
+    """
+    model, row_id = _source_row(publication_id)
+    if model is None:
+        return None, None, None
+    async for session in get_db_session():
+        row = await session.get(model, row_id)
+        if row is None and model is ScheduledPost:
+            archived = await session.get(ArchivedPost, row_id)
+            if archived is not None:
+                return archived.kind, None, archived.buttons
+        if row is None:
+            return None, None, None
+        content = row.content if model is ScheduledPost else row.payload.get('content')
+        buttons = row.buttons if model is ScheduledPost else row.payload.get('buttons')
+        return _kind(content), content, buttons or []
+    return None, None, None
+
+async def _save_source(publication_id: str, text: Optional[str] = None, buttons: Optional[list] = None):
+    """Keep the stored post in line with the edit, so later edits start from it."""
+    if '@' in publication_id:
+        return  # one occurrence of a recurring post; its next ones keep the stored content
+    model, row_id = _source_row(publication_id)
+    if model is None:
+        return
+    async for session in get_db_session():
+        row = await session.get(model, row_id)
+        if row is None and model is ScheduledPost:
+            model, row = ArchivedPost, await session.get(ArchivedPost, row_id)
+        if row is None:
+            return
+        if model is ArchivedPost:
+            values = {}
+            if text is not None:
+                values['preview'] = plain_text(TextContent(text).to_dict())[:200]
+            if buttons is not None:
+                values['buttons'] = buttons or None
+                values['alert_ids'] = [button.alert_id for button in decode_buttons(buttons) if button.alert_id] or None
+            await session.execute(update(ArchivedPost).where(ArchivedPost.id == row_id).values(**values))
+        elif model is ScheduledPost:
+            values = {}
+            if text is not None:
+                values['content'] = _with_text(row.content, text)
+            if buttons is not None:
+                values['buttons'] = buttons
+            await session.execute(update(ScheduledPost).where(ScheduledPost.id == row_id).values(**values))
+        else:
+            payload = dict(row.payload)
+            if text is not None:
+                payload['content'] = _with_text(payload.get('content'), text)
+            if buttons is not None:
+                payload['buttons'] = buttons
+            await session.execute(update(OutboxItem).where(OutboxItem.id == row_id).values(payload=payload))
+        await session.commit()
+
+def _edit_methods(chat_id: int, sent: SentMessages, kind: Optional[str], text: Optional[str],
+                  markup: Optional[InlineKeyboardMarkup]) -> List[TelegramMethod]:
+    """
+    Calls for one channel. `text` replaces the text/caption, `markup` the keyboard;
+    for text-only edits the current keyboard is passed again (editing drops it otherwise).
+    """
+    methods: List[TelegramMethod] = []
+    first = {}
+    for message_id, message_kind in sent:
+        first.setdefault(message_kind, message_id)
+
+    if text is not None:
+        if 'album' in first:
+            # The album caption lives on its first item
+            methods.append(EditMessageCaption(chat_id=chat_id, message_id=first['album'], caption=text))
+        elif 'content' in first:
+            if kind == 'text':
+                methods.append(EditMessageText(chat_id=chat_id, message_id=first['content'], text=text, reply_markup=markup))
+            else:
+                methods.append(EditMessageCaption(chat_id=chat_id, message_id=first['content'], caption=text, reply_markup=markup))
+        return methods
+
+    # Keyboard only: it sits on the content message, or on the separate message below an album
+    target = first.get('content') or first.get('keyboard')
+    if target is None:
+        raise ValueError("album was sent without a keyboard message")
+    methods.append(EditMessageReplyMarkup(chat_id=chat_id, message_id=target, reply_markup=markup))
+    return methods
+
+async def _run_per_channel(jobs: Dict[int, Callable[[], Awaitable[Any]]]) -> Dict[int, Optional[str]]:
+    """Run one job per channel on its lane, all channels at once; chat id -> error or None."""
+    chat_ids = list(jobs)
+    results = await asyncio.gather(*(executor.submit(chat_id, jobs[chat_id]) for chat_id in chat_ids),
+                                   return_exceptions=True)
+    return {chat_id: (str(result) if isinstance(result, Exception) else None) for chat_id, result in zip(chat_ids, results)}
+
+async def edit_publication(bot: Bot, publication_id: str, text: Optional[str] = None,
+                           buttons: Optional[list] = None) -> Dict[int, Optional[str]]:
+    """Apply a new text/caption and/or keyboard to every copy. Returns chat id -> error or None."""
+    messages = await publication_messages(publication_id, bot.id)
+    kind, _, current_buttons = await publication_source(publication_id)
+    markup = reconstruct_keyboard(buttons if buttons is not None else current_buttons or [])
+    markup = markup if markup.inline_keyboard else None
+
+    def job(chat_id: int, sent: SentMessages):
+        async def run():
+            methods = []
+            if text is not None:
+                methods += _edit_methods(chat_id, sent, kind, text, markup)
+            if buttons is not None:
+                methods += _edit_methods(chat_id, sent, kind, None, markup)
+            for method in methods:
+                try:
+                    await call_api(bot, chat_id, method)
+                except Exception as e:
+                    if NOT_MODIFIED not in str(e):
+                        raise
+        return run
+
+    results = await _run_per_channel({chat_id: job(chat_id, sent) for chat_id, sent in messages.items()})
+
+    if any(error is None for error in results.values()):
+        await _save_source(publication_id, text, encode_buttons(buttons) if buttons is not None else None)
+    return results
+
+async def delete_publication(bot: Bot, publication_id: str) -> Dict[int, Optional[str]]:
+    """Delete every message of the publication in every channel (one deleteMessages call each)."""
+    messages = await publication_messages(publication_id, bot.id)
+
+    def job(chat_id: int, sent: SentMessages):
+        async def run():
+            await call_api(bot, chat_id, DeleteMessages(chat_id=chat_id, message_ids=[message_id for message_id, _ in sent]))
+        return run
+
+    results = await _run_per_channel({chat_id: job(chat_id, sent) for chat_id, sent in messages.items()})
+
+    deleted = [chat_id for chat_id, error in results.items() if error is None]
+    if deleted:
+        async for session in get_db_session():
+            await session.execute(
+                delete(PublishedMessage)
+                .where(PublishedMessage.publication_id == publication_id, PublishedMessage.bot_id == bot.id,
+                       PublishedMessage.channel_id.in_(deleted))
+            )
+            await session.commit()
+    return results
@@ -0,0 +1,219 @@
+"""
+Bulk scheduling import.
+
+Accepts a CSV (with header) or JSONL document, one post per row:
+    channel   - channel DB id, Telegram id or exact title
+    text      - post text (HTML), or caption for media
+    type      - text | photo | video | document | audio | album (default: text)
+    file_id   - file_id for media; for albums "photo:ID;video:ID;..."
+    buttons   - JSON list, e.g. [{"type": "url", "text": "Site", "url": "https://..."},
+                                 {"type": "alert", "text": "Info", "alert_text": "..."}]
+    run_date  - "DD.MM.YYYY HH:MM" or ISO format
+    timezone  - e.g. Europe/Moscow (default UTC)
+    repeat    - optional cron rule ("0 9 * * 1"), read in `timezone`; run_date is then when it
+                starts and the first run is its first match from then on (utils/recurrence.py)
+All rows are validated before anything is written.
+"""
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+from sqlalchemy import select
+
+from database.db import get_db_session
+from database.models import Channel, ScheduledPost, AlertStorage
+from utils.post_model import MEDIA_TYPES, TextContent, MediaContent, Album, encode_content, valid_button_url
+from utils.recurrence import check_rule, first_run
+
+
+class ImportRowError(Exception):
+    pass
+
+
+def read_rows(raw: bytes, filename: str) -> List[dict]:
+    """Rows as dicts; unreadable input becomes rows with '__error__', reported like any invalid row."""
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        return [{'__error__': f"file is not UTF-8 text ({e.reason} at byte {e.start})"}]
+    if filename.lower().endswith(('.jsonl', '.json', '.ndjson')):
+        rows = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                rows.append({'__error__': f"invalid JSON on line {line_no}: {e}"})
+                continue
+            if not isinstance(row, dict):
+                row = {'__error__': f"line {line_no} is not a JSON object"}
+            rows.append(row)
+        return rows
+    return list(csv.DictReader(io.StringIO(text)))
+
+def _find_channel(value, channels: List[Channel]) -> Channel:
+    value = str(value or '').strip()
+    for channel in channels:
+        if value in (str(channel.id), str(channel.telegram_id), channel.title):
+            return channel
+    raise ImportRowError(f"unknown channel '{value}'")
+
+def _parse_run_date(value, tz_name) -> datetime:
+    try:
+        tz = pytz.timezone(str(tz_name or 'UTC').strip())
+    except pytz.UnknownTimeZoneError:
+        raise ImportRowError(f"unknown timezone '{tz_name}'")
+
+    value = str(value or '').strip()
+    try:
+        naive_dt = datetime.strptime(value, "%d.%m.%Y %H:%M")
+    except ValueError:
+        try:
+            naive_dt = datetime.fromisoformat(value)
+        except ValueError:
+            raise ImportRowError(f"invalid run_date '{value}'")
+    if naive_dt.tzinfo is None:
+        local_dt = tz.localize(naive_dt)
+    else:
+        local_dt = naive_dt
+    run_date = local_dt.astimezone(pytz.utc)
+    if run_date <= datetime.now(pytz.utc):
+        raise ImportRowError(f"run_date {value} is in the past")
+    return run_date
+
+def _parse_recurrence(value, tz_name) -> Optional[str]:
+    rule = " ".join(str(value or '').split())
+    if not rule:
+        return None
+    error = check_rule(rule, str(tz_name or 'UTC').strip())
+    if error:
+        raise ImportRowError(error)
+    return rule
+
+def _parse_content(row: dict):
+    content_type = str(row.get('type') or 'text').strip().lower()
+    text = str(row.get('text') or '')
+    file_id = (row.get('file_id') or '').strip() if isinstance(row.get('file_id'), str) else row.get('file_id')
+
+    if content_type == 'text':
+        if not text:
+            raise ImportRowError("text post without text")
+        return encode_content(TextContent(text))
+    if content_type in MEDIA_TYPES:
+        if not file_id:
+            raise ImportRowError(f"{content_type} post without file_id")
+        return encode_content(MediaContent(content_type, file_id, text or None))
+    if content_type == 'album':
+        # JSONL may give a list of {"type", "file_id"}; CSV uses "type:ID;type:ID"
+        items = row.get('media') or file_id
+        if isinstance(items, str):
+            items = [dict(zip(('type', 'file_id'), part.strip().split(':', 1))) for part in items.split(';') if part.strip()]
+        if not isinstance(items, list) or len(items) < 2 or len(items) > 10:
+            raise ImportRowError("album needs 2-10 media items")
+        album = []
+        for i, item in enumerate(items):
+            if not isinstance(item, dict) or item.get('type') not in MEDIA_TYPES or not item.get('file_id'):
+                raise ImportRowError(f"invalid album item {item}")
+            # Caption goes on the first item, like an album sent to the bot
+            album.append(MediaContent(item['type'], item['file_id'], text if i == 0 else None))
+        return encode_content(Album(album))
+    raise ImportRowError(f"unknown type '{content_type}'")
+
+def _parse_buttons(value) -> List[dict]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ImportRowError("buttons is not valid JSON")
+    if not isinstance(value, list):
+        raise ImportRowError("buttons must be a list")
+    buttons = []
+    for btn in value:
+        btn_type = btn.get('type') if isinstance(btn, dict) else None
+        if btn_type in ('url', 'webapp'):
+            if not btn.get('text') or not valid_button_url(btn_type, btn.get('url')):
+                raise ImportRowError(f"invalid {btn_type} button {btn}")
+            buttons.append({'type': btn_type, 'text': btn['text'], 'url': btn['url']})
+        elif btn_type == 'alert':
+            if not btn.get('text') or not btn.get('alert_text'):
+                raise ImportRowError(f"invalid alert button {btn}")
+            buttons.append({'type': 'alert', 'text': btn['text'], 'alert_text': btn['alert_text']})
+        else:
+            raise ImportRowError(f"unknown button {btn}")
+    return buttons
+
+def validate_rows(rows: List[dict], channels: List[Channel]) -> Tuple[List[dict], List[str]]:
+    """Returns (parsed rows, errors). Nothing is imported if errors is not empty."""
+    parsed, errors = [], []
+    for row_no, row in enumerate(rows, start=1):
+        try:
+            if '__error__' in row:
+                raise ImportRowError(row['__error__'])
+            run_date = _parse_run_date(row.get('run_date'), row.get('timezone'))
+            recurrence = _parse_recurrence(row.get('repeat'), row.get('timezone'))
+            tz_name = str(row.get('timezone') or 'UTC').strip()
+            if recurrence:
+                run_date = pytz.utc.localize(first_run(recurrence, tz_name, run_date.replace(tzinfo=None)))
+            parsed.append({
+                'channel': _find_channel(row.get('channel'), channels),
+                'content': _parse_content(row),
+                'buttons': _parse_buttons(row.get('buttons')),
+                'run_date': run_date,
+                'recurrence': recurrence,
+                'timezone': tz_name if recurrence else None,
+            })
+        except ImportRowError as e:
+            errors.append(f"Row {row_no}: {e}")
+    return parsed, errors
+
+async def import_posts(raw: bytes, filename: str, bot_id: int) -> Tuple[List[ScheduledPost], List[str]]:
+    """Validate everything against the bot's channels, then insert all alerts and posts in a single transaction."""
+    rows = read_rows(raw, filename)
+    if not rows:
+        return [], ["File contains no rows"]
+
+    async for session in get_db_session():
+        channels = (await session.execute(select(Channel).where(Channel.bot_id == bot_id))).scalars().all()
+        parsed, errors = validate_rows(rows, channels)
+        if errors:
+            return [], errors
+
+        alerts, posts = [], []
+        for item in parsed:
+            for btn in item['buttons']:
+                if btn['type'] == 'alert':
+                    btn['alert_id'] = str(uuid.uuid4())
+                    alerts.append(AlertStorage(id=btn['alert_id'], text=btn['alert_text']))
+            posts.append(ScheduledPost(
+                bot_id=bot_id,
+                chat_id=item['channel'].id,
+                content=item['content'],
+                buttons=item['buttons'],
+                run_date=item['run_date'],
+                status="pending",
+                recurrence=item['recurrence'],
+                timezone=item['timezone'],
+            ))
+        session.add_all(alerts)
+        session.add_all(posts)
+        await session.commit()
+        return posts, []
+    return [], ["Database unavailable"]
+
+def summarize(posts: List[ScheduledPost], channels_by_id: Dict[int, str]) -> str:
+    per_channel: Dict[str, int] = {}
+    for post in posts:
+        name = channels_by_id.get(post.chat_id, str(post.chat_id))
+        per_channel[name] = per_channel.get(name, 0) + 1
+    first = min(post.run_date for post in posts)
+    last = max(post.run_date for post in posts)
+    lines = [f"📥 Imported {len(posts)} posts", f"🕒 {first:%d.%m.%Y %H:%M} — {last:%d.%m.%Y %H:%M} UTC", ""]
+    lines += [f"📢 {name}: {count}" for name, count in sorted(per_channel.items())]
+    return "\n".join(lines)
@@ -0,0 +1,102 @@
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Shared generation counters (multiprocessing.Array) bound in worker mode, one slot per cache.
+# Bumping a slot makes every process drop its local entries of that cache on next access.
+GENERATION_SLOTS = 16
+_generations = None
+# Slot of each cache in creation order; caches are module-level, so the order is the same in every process
+_slots: Dict[str, int] = {}
+
+
+def bind_generation(value) -> None:
+    global _generations
+    _generations = value
+
+
+def _current_generation(slot: int) -> int:
+    return _generations[slot] if _generations is not None else 0
+
+
+class TTLCache:
+    """Small per-process cache for hot DB lookups (language, settings, alerts)."""
+
+    def __init__(self, name: str, ttl: float = 300, maxsize: int = 10000):
+        assert len(_slots) < GENERATION_SLOTS and name not in _slots, name
+        self.name = name
+        self.slot = _slots[name] = len(_slots)
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._generation = 0
+
+    def _sync_generation(self) -> None:
+        generation = _current_generation(self.slot)
+        if generation != self._generation:
+            self._data.clear()
+            self._generation = generation
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self._sync_generation()
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._sync_generation()
+        if key not in self._data and len(self._data) >= self.maxsize:
+            # Drop the oldest inserted entry
+            self._data.pop(next(iter(self._data)))
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one key (or everything) locally and tell other processes to resync this cache."""
+        if key is None:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
+        if _generations is not None:
+            with _generations.get_lock():
+                _generations[self.slot] += 1
+                self._generation = _generations[self.slot]
+
+
+class OnceGuard:
+    """
+    Idempotency keys of actions already taken in this process (publish of a draft).
+    Unlike TTLCache it has no invalidation: forgetting a key would allow a repeat.
+    Updates of one user always reach the same process, so a per-process record is enough.
+    """
+
+    def __init__(self, ttl: float = 86400, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._seen: Dict[Hashable, float] = {}
+
+    def first(self, key: Hashable) -> bool:
+        """True the first time `key` is seen within `ttl`, False for repeats."""
+        now = time.monotonic()
+        expires_at = self._seen.get(key)
+        if expires_at is not None and expires_at >= now:
+            return False
+        if len(self._seen) >= self.maxsize:
+            self._seen.pop(next(iter(self._seen)))
+        self._seen[key] = now + self.ttl
+        return True
+
+
+# User.language by telegram id
+user_lang_cache = TTLCache('user_lang', ttl=600)
+# Settings row (access denied text) by bot id
+settings_cache = TTLCache('settings', ttl=60, maxsize=64)
+# AlertStorage text by id; alerts never change once written
+alert_cache = TTLCache('alert', ttl=3600, maxsize=5000)
+# Channel registry snapshot (utils/channel_registry.py) by bot id, dropped when channels change
+channel_cache = TTLCache('channel', ttl=3600, maxsize=64)
+# Drafts already published or scheduled (draft_id from the FSM data)
+published_drafts = OnceGuard()
@@ -0,0 +1,157 @@
+"""
+Startup reconciliation between `scheduled_posts` and the scheduler.
+
+Runs while the scheduler is still paused, so APScheduler's misfire handling never
+sees overdue jobs. Overdue pending posts are found with one query and sorted into
+buckets by the channel's catch-up policy. The ones to publish are claimed at once
+(so the coalesced dispatch leaves them alone), then handed to the outbox with a
+stagger between them to stay clear of flood limits, and the outbox worker sends
+them with its bounded concurrency. With several bots it runs once per bot, on that
+bot's posts, and reports to the admins through it. Recurring posts are never asked
+about: an occurrence that is not published is skipped and the post moves on to its
+next one.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from apscheduler.jobstores.base import JobLookupError
+from sqlalchemy import select, update
+
+from data.config import (
+    ADMIN_IDS, CATCHUP_POLICY, CATCHUP_MAX_AGE_MINUTES, CATCHUP_STAGGER_SECONDS, INSTANCE_ID,
+)
+from database.claims import claim_posts, hold_lease
+from database.db import get_db_session
+from database.models import ScheduledPost, Channel
+from utils.recurrence import advance, finish_or_advance
+from utils.scheduler import scheduler, dispatch_job_id
+
+logger = logging.getLogger(__name__)
+
+# Keeps a reference to the background drain task
+_background_tasks = set()
+
+async def _notify_admins(bot: Bot, text: str, reply_markup=None):
+    for admin_id in ADMIN_IDS:
+        try:
+            await bot.send_message(admin_id, text, reply_markup=reply_markup, parse_mode=None)
+        except Exception as e:
+            logger.warning("Failed to notify admin %s: %s", admin_id, e)
+
+async def _drain(posts: List[ScheduledPost], owner: str) -> Dict[str, int]:
+    """Queue claimed posts in the outbox; post N becomes due N * stagger seconds after the first one."""
+    from utils.dispatcher import scheduled_payload, scheduled_publication_id
+    from utils.outbox import enqueue
+
+    post_ids = [post.id for post in posts]
+    queued = []
+    # The lease keeps lease recovery away while the queue is filled
+    async with hold_lease(post_ids, owner):
+        for index, post in enumerate(posts):
+            try:
+                await enqueue(scheduled_payload(post), scheduled_post_id=post.id, delay=index * CATCHUP_STAGGER_SECONDS,
+                              bot_id=post.bot_id, publication_id=scheduled_publication_id(post))
+            except Exception as e:
+                logger.error("Catch-up failed to queue the post: %s", e, extra={'post_id': post.id})
+                continue
+            queued.append(post)
+    await finish_or_advance(queued, 'queued', owner)
+    # Not queued: the lease runs out and lease recovery hands them to the normal dispatch
+    return {'queued': len(queued), 'failed': len(posts) - len(queued)}
+
+async def reconcile_overdue_posts(bot: Bot) -> Dict[str, int]:
+    """
+    Sort overdue pending posts of `bot` into publish / skip / ask buckets.
+    Must run before the scheduler is resumed. Publishing continues in the background.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    async for session in get_db_session():
+        result = await session.execute(
+            select(ScheduledPost, Channel)
+            .outerjoin(Channel, Channel.id == ScheduledPost.chat_id)
+            .where(ScheduledPost.bot_id == bot.id, ScheduledPost.status == 'pending', ScheduledPost.run_date <= now)
+            .order_by(ScheduledPost.run_date)
+        )
+        rows = result.all()
+
+    buckets: Dict[str, List[ScheduledPost]] = {'publish': [], 'skip': [], 'ask': [], 'no_channel': []}
+    # Overdue jobs are handled here, not by APScheduler's misfire logic
+    for job_id in {str(post.id) for post, _ in rows} | {dispatch_job_id(post.run_date) for post, _ in rows}:
+        try:
+            scheduler.remove_job(job_id)
+        except JobLookupError:
+            pass
+
+    for post, channel in rows:
+
+        if channel is None:
+            buckets['no_channel'].append(post)
+            continue
+        policy = channel.catchup_policy or CATCHUP_POLICY
+        # 0 is a valid per-channel max age
+        max_age = CATCHUP_MAX_AGE_MINUTES if channel.catchup_max_age_minutes is None else channel.catchup_max_age_minutes
+        too_old = now - post.run_date > timedelta(minutes=max_age)
+
+        if policy == 'ask' and post.recurrence:
+            buckets['skip'].append(post)
+        elif policy == 'ask':
+            buckets['ask'].append(post)
+        elif policy == 'skip' and too_old:
+            buckets['skip'].append(post)
+        else:
+            buckets['publish'].append(post)
+
+    # Claimed right away, before the scheduler resumes: a dispatch tick only takes 'pending'
+    # posts, so it can't fire the whole backlog at once while the drain spaces it out
+    owner = f"{INSTANCE_ID}:catchup:{bot.id}"
+    claimed = set(await claim_posts([post.id for post in buckets['publish']], owner))
+    buckets['publish'] = [post for post in buckets['publish'] if post.id in claimed]
+
+    report = {name: len(posts) for name, posts in buckets.items()}
+    if not rows:
+        return report
+
+    async for session in get_db_session():
+        # 'awaiting' keeps the ask bucket out of the next coalesced dispatch until an admin decides
+        for bucket, status in (('skip', 'skipped'), ('no_channel', 'failed'), ('ask', 'awaiting')):
+            # Skipped recurring posts move on to their next occurrence below instead
+            post_ids = [post.id for post in buckets[bucket] if not (bucket == 'skip' and post.recurrence)]
+            if post_ids:
+                await session.execute(
+                    update(ScheduledPost)
+                    .where(ScheduledPost.id.in_(post_ids), ScheduledPost.status == 'pending')
+                    .values(status=status)
+                )
+        await session.commit()
+    await advance(buckets['skip'])
+
+    for post in buckets['ask']:
+        kb = InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text="🚀 Publish now", callback_data=f"catchup_pub_{post.id}"),
+            InlineKeyboardButton(text="⏭ Skip", callback_data=f"catchup_skip_{post.id}"),
+        ]])
+        await _notify_admins(bot, f"⏰ Post {post.id} was due at {post.run_date:%d.%m.%Y %H:%M} UTC while the bot was offline.", kb)
+
+    summary = (
+        f"♻️ Catch-up after downtime: {len(rows)} overdue posts\n"
+        f"🚀 To publish: {report['publish']}\n"
+        f"⏭ Skipped (too old): {report['skip']}\n"
+        f"❓ Waiting for decision: {report['ask']}\n"
+        f"❌ Channel missing: {report['no_channel']}"
+    )
+    logger.info(summary)
+    await _notify_admins(bot, summary)
+
+    if buckets['publish']:
+        async def drain_and_report():
+            counts = await _drain(buckets['publish'], owner)
+            await _notify_admins(bot, f"♻️ Catch-up: {counts['queued']} posts queued for publishing, {counts['failed']} failed.")
+        task = asyncio.create_task(drain_and_report())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    return report
@@ -0,0 +1,105 @@
+"""
+Background health check of the bot's rights in every channel.
+
+Every CHANNEL_HEALTH_INTERVAL seconds all channels are checked concurrently
+(CHANNEL_HEALTH_CONCURRENCY at a time, each call through the global rate limiter)
+with getChatMember and getChat. The result is stored on the channel (can_post,
+can_pin, rights_checked_at, refreshed title), so the picker can flag broken channels
+and the publish path can skip them without any API call at publish time. Each bot
+checks its own channels.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound
+from sqlalchemy import select, update
+
+from data.config import CHANNEL_HEALTH_INTERVAL, CHANNEL_HEALTH_CONCURRENCY
+from database.db import get_db_session
+from database.models import Channel
+from utils.channel_registry import invalidate_channels
+from utils.rate_limiter import rate_limiter
+from utils.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+# The bot was removed, demoted or the chat is gone: a definite answer, not a transient error
+LOST_ACCESS_ERRORS = (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound)
+
+
+def member_rights(member) -> Tuple[bool, bool]:
+    """(can_post, can_pin) from a ChatMember of the bot."""
+    if member.status == 'creator':
+        return True, True
+    if member.status != 'administrator':
+        return False, False
+    # None means the right doesn't apply to this chat type (groups)
+    can_post = getattr(member, 'can_post_messages', None) is not False
+    # Channels have no separate pin right, editing messages allows pinning
+    can_pin = bool(getattr(member, 'can_pin_messages', None) or getattr(member, 'can_edit_messages', None))
+    return can_post, can_pin
+
+async def check_channel_rights(bot: Bot, telegram_id: int) -> Optional[dict]:
+    """Values to store for one channel, or None when the check itself failed (retry next time)."""
+    try:
+        await rate_limiter.acquire(bot_id=bot.id)
+        member = await bot.get_chat_member(telegram_id, bot.id)
+        await rate_limiter.acquire(bot_id=bot.id)
+        chat = await bot.get_chat(telegram_id)
+    except LOST_ACCESS_ERRORS as e:
+        return {'can_post': False, 'can_pin': False, 'rights_error': str(e)[:200]}
+    except Exception as e:
+        logger.warning("Health check failed: %s", e, extra={'channel_id': telegram_id})
+        return None
+    can_post, can_pin = member_rights(member)
+    values = {'can_post': can_post, 'can_pin': can_pin,
+              'rights_error': None if can_post else f"no posting rights (status: {member.status})"}
+    if chat.title:
+        values['title'] = chat.title
+    return values
+
+async def check_all_channels(bot: Bot) -> Dict[str, int]:
+    async for session in get_db_session():
+        result = await session.execute(
+            select(Channel.id, Channel.telegram_id, Channel.title, Channel.can_post, Channel.can_pin)
+            .where(Channel.bot_id == bot.id)
+        )
+        channels = result.all()
+
+    semaphore = asyncio.Semaphore(CHANNEL_HEALTH_CONCURRENCY)
+
+    async def check(telegram_id: int):
+        async with semaphore:
+            return await check_channel_rights(bot, telegram_id)
+
+    results = await asyncio.gather(*(check(channel.telegram_id) for channel in channels))
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    changed = False
+    report = {'ok': 0, 'broken': 0, 'unknown': 0}
+    async for session in get_db_session():
+        for channel, values in zip(channels, results):
+            if values is None:
+                report['unknown'] += 1
+                continue
+            report['ok' if values['can_post'] else 'broken'] += 1
+            if (values['can_post'], values['can_pin'], values.get('title', channel.title)) != (channel.can_post, channel.can_pin, channel.title):
+                changed = True
+                if values['can_post'] is False and channel.can_post is not False:
+                    logger.warning("Lost posting rights in channel %s: %s", channel.title, values['rights_error'],
+                                   extra={'channel_id': channel.telegram_id})
+            await session.execute(update(Channel).where(Channel.id == channel.id).values(rights_checked_at=now, **values))
+        await session.commit()
+
+    # Picker and publish paths read rights and titles from the registry
+    if changed:
+        invalidate_channels()
+    logger.info("Channel health: %s ok, %s broken, %s not checked", report['ok'], report['broken'], report['unknown'])
+    return report
+
+def enable_channel_health(bot: Bot, interval: int = CHANNEL_HEALTH_INTERVAL):
+    scheduler.add_job(check_all_channels, 'interval', seconds=interval, args=[bot], id=f'channel_health_{bot.id}',
+                      jobstore='local', replace_existing=True, next_run_time=datetime.now(timezone.utc))
@@ -0,0 +1,77 @@
+"""
+In-memory registry of channels.
+
+Menus used to run `select(Channel)` on every open. The registry loads id, telegram id
+and title of every channel once, keeps them sorted by title, and answers lookups and
+title-prefix searches from memory (prefix search is a bisect over the sorted titles).
+There is one registry per bot (each bot has its own channels). They live in
+`channel_cache`, so adding a channel in any process drops them everywhere.
+"""
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import select
+
+from database.db import get_db_session
+from database.models import Channel
+from utils.cache import channel_cache
+
+
+class ChannelEntry(NamedTuple):
+    id: int
+    telegram_id: int
+    title: str
+    # From the background rights check; None = not checked yet
+    can_post: Optional[bool] = None
+    can_pin: Optional[bool] = None
+
+    @property
+    def broken(self) -> bool:
+        return self.can_post is False
+
+
+class ChannelRegistry:
+    def __init__(self, entries: List[ChannelEntry]):
+        self.entries = sorted(entries, key=lambda entry: (entry.title or "").casefold())
+        self._keys = [(entry.title or "").casefold() for entry in self.entries]
+        self._by_id: Dict[int, ChannelEntry] = {entry.id: entry for entry in self.entries}
+        self._by_telegram_id: Dict[int, ChannelEntry] = {entry.telegram_id: entry for entry in self.entries}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, channel_id: int) -> Optional[ChannelEntry]:
+        return self._by_id.get(channel_id)
+
+    def by_telegram_id(self, telegram_id: int) -> Optional[ChannelEntry]:
+        return self._by_telegram_id.get(telegram_id)
+
+    def titles(self) -> Dict[int, str]:
+        return {entry.id: entry.title for entry in self.entries}
+
+    def search(self, prefix: str = "") -> List[ChannelEntry]:
+        """Channels whose title starts with `prefix` (case-insensitive), in title order."""
+        if not prefix:
+            return self.entries
+        key = prefix.casefold()
+        start = bisect_left(self._keys, key)
+        end = bisect_left(self._keys, key + "\U0010ffff", lo=start)
+        return self.entries[start:end]
+
+
+async def get_registry(bot_id: int) -> ChannelRegistry:
+    """Channels of one bot."""
+    registry = channel_cache.get(bot_id)
+    if registry is None:
+        async for session in get_db_session():
+            result = await session.execute(
+                select(Channel.id, Channel.telegram_id, Channel.title, Channel.can_post, Channel.can_pin)
+                .where(Channel.bot_id == bot_id)
+            )
+            registry = ChannelRegistry([ChannelEntry(*row) for row in result.all()])
+        channel_cache.set(bot_id, registry)
+    return registry
+
+def invalidate_channels():
+    """Call after adding or removing channels, or when their titles or rights change."""
+    channel_cache.invalidate()
@@ -1,3 +1,8 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
 async def check_subscription(bot, user_id: int) -> bool:
     target_channel = "@highprod"
     try:
@@ -6,7 +11,7 @@ async def check_subscription(bot, user_id: int) -> bool:
             return False
         return True
     except Exception as e:
-        print(f"Error checking sub: {e}")
+        logger.warning("Error checking sub: %s", e, extra={'user_id': user_id})
         # In case of error (e.g. bot not admin), assume allowed to prevent lock-out? 
         # Or False to enforce?
         # Assuming False to force fixing the bot rights in channel if that's the issue.
@@ -0,0 +1,134 @@
+"""
+Write-behind click counters for alert buttons.
+
+`show_alert` only increments an in-memory counter keyed by (alert id, UTC day).
+A background task flushes the counters every CLICK_FLUSH_INTERVAL seconds as one
+batched upsert (`clicks = clicks + excluded.clicks`, ON DUPLICATE KEY UPDATE on MySQL)
+into `alert_click_stats`; other dialects add the counts row by row in one transaction.
+`stop()` flushes whatever is left on graceful shutdown. Every process that handles
+updates runs its own counter; the upsert adds their counts together.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, insert, select, tuple_, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from data.config import CLICK_FLUSH_INTERVAL
+from database.db import engine, get_db_session
+from database.models import AlertClickStat
+
+logger = logging.getLogger(__name__)
+
+_INSERT = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert, 'mysql': mysql.insert, 'mariadb': mysql.insert}
+
+
+def _upsert(rows: List[dict]):
+    """One INSERT .. ON CONFLICT/ON DUPLICATE KEY statement adding to existing rows, None if the dialect has none."""
+    dialect = engine.dialect.name
+    if dialect not in _INSERT:
+        return None
+    stmt = _INSERT[dialect](AlertClickStat).values(rows)
+    if dialect in ('mysql', 'mariadb'):
+        return stmt.on_duplicate_key_update(clicks=AlertClickStat.clicks + stmt.inserted.clicks)
+    return stmt.on_conflict_do_update(
+        index_elements=['alert_id', 'day'],
+        set_={'clicks': AlertClickStat.clicks + stmt.excluded.clicks},
+    )
+
+
+class ClickCounter:
+    def __init__(self, interval: int = CLICK_FLUSH_INTERVAL):
+        self.interval = interval
+        self._counts: Dict[Tuple[str, date], int] = defaultdict(int)
+        self._task: Optional[asyncio.Task] = None
+
+    def hit(self, alert_id: str):
+        self._counts[(alert_id, datetime.now(timezone.utc).date())] += 1
+
+    async def flush(self) -> int:
+        """Write the pending counts in one statement; returns the number of rows touched."""
+        if not self._counts:
+            return 0
+        # Swap first: clicks arriving during the write go into the next batch
+        counts, self._counts = self._counts, defaultdict(int)
+        rows = [{'alert_id': alert_id, 'day': day, 'clicks': clicks} for (alert_id, day), clicks in counts.items()]
+        stmt = _upsert(rows)
+        try:
+            async for session in get_db_session():
+                if stmt is not None:
+                    await session.execute(stmt)
+                else:
+                    await self._add_rows(session, rows)
+                await session.commit()
+        except Exception:
+            # Keep the counts for the next attempt
+            for key, clicks in counts.items():
+                self._counts[key] += clicks
+            raise
+        return len(counts)
+
+    @staticmethod
+    async def _add_rows(session, rows: List[dict]):
+        # Generic fallback: update the (alert, day) rows that exist, insert the others
+        keys = [(row['alert_id'], row['day']) for row in rows]
+        result = await session.execute(
+            select(AlertClickStat.alert_id, AlertClickStat.day)
+            .where(tuple_(AlertClickStat.alert_id, AlertClickStat.day).in_(keys))
+        )
+        existing = set(result.all())
+        for row in rows:
+            if (row['alert_id'], row['day']) in existing:
+                await session.execute(
+                    update(AlertClickStat)
+                    .where(AlertClickStat.alert_id == row['alert_id'], AlertClickStat.day == row['day'])
+                    .values(clicks=AlertClickStat.clicks + row['clicks'])
+                )
+        missing = [row for row in rows if (row['alert_id'], row['day']) not in existing]
+        if missing:
+            await session.execute(insert(AlertClickStat), missing)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Failed to flush click stats: %s", e)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Failed to flush click stats on shutdown: %s", e)
+
+
+click_counter = ClickCounter()
+
+
+async def clicks_by_alert(alert_ids: List[str]) -> Dict[str, Tuple[int, int]]:
+    """alert id -> (total clicks, clicks today) from the aggregates."""
+    if not alert_ids:
+        return {}
+    today = datetime.now(timezone.utc).date()
+    async for session in get_db_session():
+        result = await session.execute(
+            select(
+                AlertClickStat.alert_id,
+                func.sum(AlertClickStat.clicks),
+                # CASE rather than FILTER (...): MySQL has no aggregate FILTER clause
+                func.sum(case((AlertClickStat.day == today, AlertClickStat.clicks), else_=0)),
+            )
+            .where(AlertClickStat.alert_id.in_(alert_ids))
+            .group_by(AlertClickStat.alert_id)
+        )
+        return {alert_id: (total or 0, today_clicks or 0) for alert_id, total, today_clicks in result.all()}
+    return {}
@@ -0,0 +1,174 @@
+"""
+Coalesced dispatch of scheduled posts.
+
+Posts are commonly scheduled for the same minute. Instead of one scheduler job per
+post (each one claiming, loading and enqueueing its post separately), there is one
+job per run_date. When it fires, every due post is loaded with one query, claimed
+with one UPDATE, compiled once, and all of them are sent concurrently through the
+per-channel executor lanes and the shared rate limiter. Posts that fail, or whose
+copies failed with a transient error, are handed to the outbox, which retries only
+the steps that are missing. With several bots (utils/tenants.py) the one job serves
+all of them: each post is sent by the bot it belongs to. Recurring posts are moved on
+to their next occurrence afterwards (utils/recurrence.py).
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from sqlalchemy import select, update
+
+from data.config import INSTANCE_ID, DISPATCH_LAG_TARGET_SECONDS
+from database.claims import claim_posts, finish_posts, hold_lease
+from database.db import get_db_session
+from database.models import ScheduledPost, Channel, PublishedMessage
+from utils.outbox import enqueue
+from utils.preflight import take_compiled
+from utils.publisher import CompiledPost, SentMessages, publish_to_channels
+from utils.recurrence import advance
+from utils.tenants import get_bot
+
+logger = logging.getLogger(__name__)
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def scheduled_payload(post: ScheduledPost) -> dict:
+    # post.chat_id is the DB id of the channel, extra targets live in options
+    options = post.options or {}
+    return {
+        'channel_ids': [post.chat_id] + options.get('extra_channel_ids', []),
+        'content': post.content,
+        'buttons': post.buttons,
+        'is_pinned': options.get('is_pinned', False),
+        'is_silent': options.get('is_silent', False),
+    }
+
+def scheduled_publication_id(post: ScheduledPost) -> str:
+    # Each occurrence of a recurring post is a publication of its own
+    if post.recurrence:
+        return f"scheduled:{post.id}@{post.run_date:%Y%m%d%H%M%S}"
+    return f"scheduled:{post.id}"
+
+async def _load_due() -> List[int]:
+    async for session in get_db_session():
+        result = await session.execute(
+            select(ScheduledPost.id)
+            .where(ScheduledPost.status == 'pending', ScheduledPost.run_date <= _utcnow())
+            .order_by(ScheduledPost.run_date, ScheduledPost.id)
+        )
+        return list(result.scalars().all())
+    return []
+
+async def dispatch_due_posts():
+    """Publish every pending post whose run_date has passed, as one batch."""
+    due_ids = await _load_due()
+    if not due_ids:
+        return
+    # Unique owner per batch so the claim read-back only sees our rows
+    owner = f"{INSTANCE_ID}:{uuid.uuid4().hex[:8]}"
+    claimed = await claim_posts(due_ids, owner)
+    if not claimed:
+        return
+
+    async for session in get_db_session():
+        result = await session.execute(
+            select(ScheduledPost).where(ScheduledPost.id.in_(claimed)).order_by(ScheduledPost.run_date, ScheduledPost.id)
+        )
+        posts = list(result.scalars().all())
+        publication_ids = {post.id: scheduled_publication_id(post) for post in posts}
+        channel_ids = {cid for post in posts for cid in scheduled_payload(post)['channel_ids']}
+        # Channels without posting rights (background health check) are skipped, no API call needed
+        result = await session.execute(
+            select(Channel.id, Channel.telegram_id)
+            .where(Channel.id.in_(channel_ids), Channel.can_post.is_not(False))
+        )
+        telegram_ids: Dict[int, int] = dict(result.all())
+        # Steps sent before a crash (post put back by lease recovery) are not sent again
+        result = await session.execute(
+            select(PublishedMessage.publication_id, PublishedMessage.channel_id, PublishedMessage.message_id,
+                   PublishedMessage.kind)
+            .where(PublishedMessage.publication_id.in_(list(publication_ids.values())))
+            .order_by(PublishedMessage.id)
+        )
+        progress: Dict[str, Dict[int, SentMessages]] = {}
+        for publication_id, channel_id, message_id, kind in result:
+            progress.setdefault(publication_id, {}).setdefault(channel_id, []).append((message_id, kind))
+
+    started = time.monotonic()
+    published: List[int] = []
+    to_retry: List[ScheduledPost] = []
+    messages: List[PublishedMessage] = []
+
+    async def publish(post: ScheduledPost):
+        bot = get_bot(post.bot_id)
+        if bot is None:
+            # Bot not served by this process: the outbox reports it
+            to_retry.append(post)
+            return
+        payload = scheduled_payload(post)
+        chat_ids = [telegram_ids[cid] for cid in dict.fromkeys(payload['channel_ids']) if cid in telegram_ids]
+        if not chat_ids:
+            to_retry.append(post)  # the outbox marks it dead with a clear error
+            return
+        publication_id = publication_ids[post.id]
+
+        async def on_sent(chat_id: int, sent: SentMessages):
+            # Collected per step: what a failed post did send is written before the outbox retries it
+            messages.extend(PublishedMessage(publication_id=publication_id, bot_id=bot.id, channel_id=chat_id,
+                                             message_id=message_id, kind=kind) for message_id, kind in sent)
+
+        try:
+            # Usually already built by the pre-flight check a few minutes earlier
+            compiled = take_compiled(post.id) or CompiledPost(payload['content'], payload['buttons'])
+            result = await publish_to_channels(bot, chat_ids, compiled,
+                                               is_silent=payload['is_silent'], is_pinned=payload['is_pinned'],
+                                               done=progress.get(publication_id), on_sent=on_sent)
+        except Exception as e:
+            logger.warning("Dispatch failed (%s), handing the post to the outbox", e, extra={'post_id': post.id})
+            to_retry.append(post)
+            return
+        if result.errors:
+            logger.warning("Post not replicated to: %s", result.errors, extra={'post_id': post.id})
+        if result.retry:
+            # The outbox sends only the copies that are missing
+            to_retry.append(post)
+        else:
+            published.append(post.id)
+
+    async with hold_lease(claimed, owner):
+        # Tasks are created in run_date order and submit to their lanes before awaiting,
+        # so posts to the same channel keep their order
+        await asyncio.gather(*(publish(post) for post in posts))
+
+    recurring = [post for post in posts if post.recurrence]
+    once = {post.id for post in posts if not post.recurrence}
+    # One write for all message ids and one UPDATE for the final statuses
+    async for session in get_db_session():
+        session.add_all(messages)
+        if once.intersection(published):
+            await session.execute(
+                update(ScheduledPost)
+                .where(ScheduledPost.id.in_(once.intersection(published)), ScheduledPost.claimed_by == owner)
+                .values(status='published', lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            )
+        await session.commit()
+
+    for post in to_retry:
+        await enqueue(scheduled_payload(post), scheduled_post_id=post.id, bot_id=post.bot_id,
+                      publication_id=publication_ids[post.id])
+    await finish_posts([post.id for post in to_retry if post.id in once], 'queued', owner)
+    # Recurring posts move on whatever happened to this occurrence (the outbox retries it); one UPDATE
+    await advance(recurring, owner)
+
+    elapsed = time.monotonic() - started
+    lag = (_utcnow() - max(post.run_date for post in posts)).total_seconds()
+    line = (f"Dispatched {len(published)}/{len(posts)} posts in {elapsed:.1f}s, "
+            f"last one {lag:.1f}s after its run date")
+    if lag > DISPATCH_LAG_TARGET_SECONDS:
+        line += f" (over the {DISPATCH_LAG_TARGET_SECONDS:.0f}s target)"
+    logger.log(logging.WARNING if lag > DISPATCH_LAG_TARGET_SECONDS else logging.INFO, line,
+               extra={'latency_ms': int(elapsed * 1000)})
@@ -0,0 +1,57 @@
+"""
+One JSON codec for the whole app.
+
+`dumps`/`loads` use orjson or ujson when installed and fall back to the stdlib `json`.
+They are plugged into the SQLAlchemy engine (JSON columns, including the FSM storage
+table) and into the aiogram session that parses every Bot API response.
+JSON_LIBRARY picks a library explicitly ('orjson', 'ujson', 'json'); 'auto' takes the
+fastest one available. `dumps` always returns str, as SQLAlchemy and aiohttp expect.
+"""
+import json
+import logging
+from typing import Any, Callable, Tuple
+
+from data.config import JSON_LIBRARY
+
+logger = logging.getLogger(__name__)
+
+
+def _orjson() -> Tuple[Callable[[Any], str], Callable[[Any], Any]]:
+    import orjson
+    # Non-str keys are accepted by the stdlib json, keep that behaviour
+    options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any, **kwargs) -> str:
+        return orjson.dumps(obj, option=options).decode()
+
+    return dumps, orjson.loads
+
+def _ujson() -> Tuple[Callable[[Any], str], Callable[[Any], Any]]:
+    import ujson
+
+    def dumps(obj: Any, **kwargs) -> str:
+        return ujson.dumps(obj, ensure_ascii=False)
+
+    return dumps, ujson.loads
+
+def _stdlib() -> Tuple[Callable[[Any], str], Callable[[Any], Any]]:
+    def dumps(obj: Any, **kwargs) -> str:
+        return json.dumps(obj, ensure_ascii=False, **kwargs)
+
+    return dumps, json.loads
+
+_LIBRARIES = {'orjson': _orjson, 'ujson': _ujson, 'json': _stdlib}
+
+
+def load_codec(name: str = JSON_LIBRARY) -> Tuple[str, Callable[[Any], str], Callable[[Any], Any]]:
+    """(library name, dumps, loads) for `name`; 'auto' or a missing library falls back in speed order."""
+    for candidate in (list(_LIBRARIES) if name == 'auto' else [name]):
+        try:
+            return (candidate, *_LIBRARIES[candidate]())
+        except (ImportError, KeyError):
+            if name != 'auto':
+                logger.warning("JSON library '%s' is not available, falling back to json", name)
+    return ('json', *_stdlib())
+
+
+JSON_NAME, dumps, loads = load_codec()
@@ -1,25 +1,71 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, KeyboardButton, ReplyKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
-from database.models import Channel
-from typing import List
-from utils.texts import get_text
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from utils.texts import text
 
-async def get_main_menu(lang: str = 'ru') -> ReplyKeyboardMarkup:
+# Static markups are built once per variant and shared; handlers must not mutate them
+
+@lru_cache(maxsize=None)
+def main_menu(lang: str = 'ru') -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
-    builder.button(text=await get_text('main_menu_create', lang))
-    builder.button(text=await get_text('main_menu_channels', lang))
-    builder.button(text=await get_text('main_menu_settings', lang))
+    builder.button(text=text('main_menu_create', lang))
+    builder.button(text=text('main_menu_channels', lang))
+    builder.button(text=text('main_menu_settings', lang))
     builder.adjust(2)
     return builder.as_markup(resize_keyboard=True)
 
-def get_channels_menu(channels: List[Channel]) -> InlineKeyboardMarkup:
+async def get_main_menu(lang: str = 'ru') -> ReplyKeyboardMarkup:
+    return main_menu(lang)
+
+CHANNELS_PAGE_SIZE = 10
+
+def get_channels_menu(channels: list, page: int = 0, mode: str = 'post', query: str = '',
+                      selected: Optional[List[int]] = None) -> InlineKeyboardMarkup:
+    """
+    Paginated channel picker; `channels` is the already filtered list and only one page
+    of it becomes buttons. Modes: 'post' picks the target channel, 'extra' toggles
+    replication targets, 'list' is the channel list from the main menu.
+    """
     builder = InlineKeyboardBuilder()
-    for channel in channels:
-        builder.button(text=channel.title, callback_data=f"select_channel_{channel.id}")
-    builder.button(text="➕ Add Channel", callback_data="add_channel")
-    builder.adjust(1)
+    pages = max(1, -(-len(channels) // CHANNELS_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    shown = channels[page * CHANNELS_PAGE_SIZE:(page + 1) * CHANNELS_PAGE_SIZE]
+    for channel in shown:
+        # Channels where the last health check found no posting rights are flagged
+        title = f"⚠️ {channel.title}" if getattr(channel, 'broken', False) else channel.title
+        if mode == 'extra':
+            mark = "✅" if channel.id in (selected or []) else "▫️"
+            builder.button(text=f"{mark} {title}", callback_data=f"toggle_extra_{channel.id}")
+        else:
+            builder.button(text=title, callback_data=f"select_channel_{channel.id}")
+    sizes = [1] * len(shown)
+
+    if pages > 1:
+        nav = 1
+        if page > 0:
+            builder.button(text="◀️", callback_data=f"chpage_{mode}_{page - 1}")
+            nav += 1
+        builder.button(text=f"{page + 1}/{pages}", callback_data=f"chpage_{mode}_{page}")
+        if page < pages - 1:
+            builder.button(text="▶️", callback_data=f"chpage_{mode}_{page + 1}")
+            nav += 1
+        sizes.append(nav)
+    if pages > 1 or query:
+        builder.button(text=f"🔍 {query}..." if query else "🔍 Search", callback_data=f"chsearch_{mode}")
+        if query:
+            builder.button(text="✖️ Clear", callback_data=f"chclear_{mode}")
+        sizes.append(2 if query else 1)
+
+    if mode == 'extra':
+        builder.button(text="🔙 Back", callback_data="back_to_options")
+    else:
+        builder.button(text="➕ Add Channel", callback_data="add_channel")
+    sizes.append(1)
+    builder.adjust(*sizes)
     return builder.as_markup()
 
+@lru_cache(maxsize=None)
 def get_post_creation_menu(has_content: bool = False, has_buttons: bool = False) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
@@ -35,7 +81,9 @@ def get_post_creation_menu(has_content: bool = False, has_buttons: bool = False)
     builder.adjust(2, 2, 2)
     return builder.as_markup()
 
-def get_publish_options_menu(is_pinned: bool = False, is_silent: bool = False) -> InlineKeyboardMarkup:
+@lru_cache(maxsize=256)
+def get_publish_options_menu(is_pinned: bool = False, is_silent: bool = False, extra_channels: int = 0,
+                             recurrence: Optional[str] = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="🚀 Publish Now", callback_data="pub_now")
     builder.button(text="📅 Schedule", callback_data="pub_schedule")
@@ -45,7 +93,52 @@ def get_publish_options_menu(is_pinned: bool = False, is_silent: bool = False) -
     
     silent_text = "🔕 Silent: On" if is_silent else "🔕 Silent: Off"
     builder.button(text=silent_text, callback_data="toggle_silent")
-    
+
+    extra_text = f"📢 Also post to: {extra_channels}" if extra_channels else "📢 Also post to..."
+    builder.button(text=extra_text, callback_data="pick_extra_channels")
+
+    builder.button(text=f"🔁 Repeat: {recurrence}" if recurrence else "🔁 Repeat: Off", callback_data="set_repeat")
+
     builder.button(text="🔙 Back", callback_data="back_to_edit")
-    builder.adjust(2, 2, 1)
-    return builder.as_markup()
\ No newline at end of file
+    builder.adjust(2, 2, 1, 1, 1)
+    return builder.as_markup()
+
+def get_extra_channels_menu(channels: list, primary_id: int, selected: List[int], page: int = 0,
+                            query: str = '') -> InlineKeyboardMarkup:
+    channels = [channel for channel in channels if channel.id != primary_id]
+    return get_channels_menu(channels, page, mode='extra', query=query, selected=selected)
+
+@lru_cache(maxsize=None)
+def get_media_source_menu() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.button(text="🖼 Pick from library", callback_data="medialib_0")
+    return builder.as_markup()
+
+def get_media_library_menu(entries: List[Tuple[str, str]], page: int, has_more: bool) -> InlineKeyboardMarkup:
+    """entries: (file_unique_id, label) of one library page."""
+    builder = InlineKeyboardBuilder()
+    for file_unique_id, label in entries:
+        builder.button(text=label, callback_data=f"mediapick_{file_unique_id}")
+    sizes = [1] * len(entries)
+
+    nav = 0
+    if page > 0:
+        builder.button(text="◀️", callback_data=f"medialib_{page - 1}")
+        nav += 1
+    if has_more:
+        builder.button(text="▶️", callback_data=f"medialib_{page + 1}")
+        nav += 1
+    if nav:
+        sizes.append(nav)
+    builder.button(text="🔙 Back", callback_data="medialib_back")
+    sizes.append(1)
+    builder.adjust(*sizes)
+    return builder.as_markup()
+
+@lru_cache(maxsize=None)
+def get_media_caption_menu() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.button(text="➡️ No caption", callback_data="media_nocaption")
+    builder.button(text="🔙 Library", callback_data="medialib_0")
+    builder.adjust(1)
+    return builder.as_markup()
@@ -0,0 +1,119 @@
+"""
+Logging setup: a QueueHandler on the root logger, so the event loop only puts records
+on a queue and a listener thread does the formatting and the writes to stdout.
+
+Records are JSON lines (LOG_FORMAT=json, default) or plain text. Context fields
+(update id, user id, channel id, post id, latency) come from `log_context`, which the
+update middleware binds per update, or from `extra=` on the call; both are read in the
+calling task, before the record crosses to the listener thread.
+
+High-volume events pass `extra={'sample': rate}`: only that fraction of them is kept.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from data.config import LOG_LEVEL, LOG_FORMAT
+
+CONTEXT_FIELDS = ('update_id', 'user_id', 'channel_id', 'post_id', 'latency_ms')
+
+log_context: ContextVar[dict] = ContextVar('log_context', default={})
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+@contextmanager
+def bind(**fields):
+    """Add context fields to every record logged inside the block (and the tasks it starts)."""
+    token = log_context.set({**log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Runs in the calling task: applies sampling and copies the context onto the record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        sample = getattr(record, 'sample', None)
+        if sample is not None and random.random() >= sample:
+            return False
+        for key, value in log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep the extra fields as attributes (the stock prepare formats everything into msg)
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key in CONTEXT_FIELDS + ('sample',):
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(f"{key}={getattr(record, key)}" for key in CONTEXT_FIELDS if getattr(record, key, None) is not None)
+        return f"{line} [{fields}]" if fields else line
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Replace the root handlers with the queue handler; safe to call once per process."""
+    global _listener
+    if _listener is not None:
+        return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(ContextFilter())
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def since(started: float) -> int:
+    """Milliseconds since a time.monotonic() value, for the latency_ms field."""
+    return int((time.monotonic() - started) * 1000)
@@ -0,0 +1,149 @@
+"""
+Library of media admins sent to the bot.
+
+Every photo, video, document or audio that arrives in the post flow is recorded once
+per bot and `file_unique_id` (the same file always has the same one, whichever upload it
+came from; a `file_id` only works for the bot that received it), with its type, size, dimensions and the `file_id` of the latest upload. A
+repeated upload only refreshes that row. The "pick from library" step lists the bot's
+rows by `last_used_at` (indexed with bot_id) and reuses the stored `file_id`, so nothing is uploaded again.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiogram import types
+from sqlalchemy import select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from database.db import engine, get_db_session
+from database.models import MediaItem
+
+logger = logging.getLogger(__name__)
+
+MEDIA_PAGE_SIZE = 8
+# Columns a newer upload of the same file overwrites
+_REFRESHED = ('file_id', 'media_type', 'file_size', 'width', 'height', 'duration', 'file_name', 'last_used_at')
+_INSERT = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert, 'mysql': mysql.insert, 'mariadb': mysql.insert}
+
+
+@dataclass(frozen=True)
+class MediaFile:
+    file_unique_id: str
+    file_id: str
+    media_type: str
+    file_size: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    duration: Optional[int] = None
+    file_name: Optional[str] = None
+
+
+def media_file(message: types.Message) -> Optional[MediaFile]:
+    """The media of a message (largest photo size), None for anything else."""
+    if message.photo:
+        photo = message.photo[-1]
+        return MediaFile(photo.file_unique_id, photo.file_id, 'photo', photo.file_size, photo.width, photo.height)
+    if message.video:
+        video = message.video
+        return MediaFile(video.file_unique_id, video.file_id, 'video', video.file_size, video.width, video.height,
+                         video.duration, video.file_name)
+    if message.document:
+        document = message.document
+        return MediaFile(document.file_unique_id, document.file_id, 'document', document.file_size,
+                         file_name=document.file_name)
+    if message.audio:
+        audio = message.audio
+        return MediaFile(audio.file_unique_id, audio.file_id, 'audio', audio.file_size, duration=audio.duration,
+                         file_name=audio.file_name or audio.title)
+    return None
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _upsert(rows: List[dict]):
+    """INSERT .. ON CONFLICT/ON DUPLICATE KEY refreshing the row, None if the dialect has none."""
+    dialect = engine.dialect.name
+    if dialect not in _INSERT:
+        return None
+    stmt = _INSERT[dialect](MediaItem).values(rows)
+    if dialect in ('mysql', 'mariadb'):
+        refreshed = {column: getattr(stmt.inserted, column) for column in _REFRESHED}
+        return stmt.on_duplicate_key_update(uses=MediaItem.uses + 1, **refreshed)
+    refreshed = {column: getattr(stmt.excluded, column) for column in _REFRESHED}
+    return stmt.on_conflict_do_update(index_elements=['bot_id', 'file_unique_id'], set_={'uses': MediaItem.uses + 1, **refreshed})
+
+async def remember(bot_id: int, files: Iterable[MediaFile]) -> int:
+    """Record the files of a bot, one row per file_unique_id; returns the number of distinct files."""
+    now = _utcnow()
+    # An album may hold the same file twice; one statement must not touch a row twice
+    rows: Dict[str, dict] = {}
+    for file in files:
+        rows[file.file_unique_id] = {'bot_id': bot_id, **file.__dict__, 'uses': 1, 'last_used_at': now}
+    if not rows:
+        return 0
+    stmt = _upsert(list(rows.values()))
+    async for session in get_db_session():
+        if stmt is not None:
+            await session.execute(stmt)
+        else:
+            for row in rows.values():
+                item = await session.get(MediaItem, (bot_id, row['file_unique_id']))
+                if item is None:
+                    session.add(MediaItem(**row))
+                else:
+                    for column in _REFRESHED:
+                        setattr(item, column, row[column])
+                    item.uses += 1
+        await session.commit()
+    return len(rows)
+
+async def remember_messages(bot_id: int, messages: Iterable[types.Message]):
+    """Record the media of the messages; the post flow goes on if the library can't be written."""
+    try:
+        await remember(bot_id, (file for file in map(media_file, messages) if file is not None))
+    except Exception as e:
+        logger.error("Failed to update the media library: %s", e)
+
+async def recent_media(bot_id: int, page: int = 0, page_size: int = MEDIA_PAGE_SIZE) -> Tuple[List[MediaItem], bool]:
+    """One page of the bot's library, most recently used first, and whether another page follows."""
+    async for session in get_db_session():
+        result = await session.execute(
+            select(MediaItem)
+            .where(MediaItem.bot_id == bot_id)
+            .order_by(MediaItem.last_used_at.desc(), MediaItem.file_unique_id)
+            .offset(page * page_size)
+            # One extra row tells whether there is a next page, without counting the table
+            .limit(page_size + 1)
+        )
+        items = list(result.scalars())
+        return items[:page_size], len(items) > page_size
+    return [], False
+
+async def use_media(bot_id: int, file_unique_id: str) -> Optional[MediaItem]:
+    """The library entry picked for a post, moved to the top of the list; None if it is gone."""
+    async for session in get_db_session():
+        item = await session.get(MediaItem, (bot_id, file_unique_id))
+        if item is None:
+            return None
+        await session.execute(
+            update(MediaItem)
+            .where(MediaItem.bot_id == bot_id, MediaItem.file_unique_id == file_unique_id)
+            .values(uses=MediaItem.uses + 1, last_used_at=_utcnow())
+        )
+        await session.commit()
+        return item
+    return None
+
+def describe(item: MediaItem) -> str:
+    """Short button label: icon, name or dimensions, duration and size."""
+    icon = {'photo': "🖼", 'video': "🎬", 'document': "📄", 'audio': "🎵"}.get(item.media_type, "📎")
+    parts = [item.file_name or item.media_type]
+    if item.width and item.height:
+        parts.append(f"{item.width}×{item.height}")
+    if item.duration:
+        parts.append(f"{item.duration // 60}:{item.duration % 60:02d}")
+    if item.file_size:
+        parts.append(f"{item.file_size / 1024 / 1024:.1f} MB" if item.file_size >= 1024 * 1024
+                     else f"{item.file_size // 1024} KB")
+    return f"{icon} " + " · ".join(parts)
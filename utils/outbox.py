@@ -0,0 +1,321 @@
+"""
+Durable publish outbox.
+
+Publish requests are written to `publish_outbox` and return immediately; a background
+worker drains due items and retries them according to the error class:
+
+- TelegramRetryAfter           -> retry after the delay Telegram asked for
+- network / server errors      -> exponential backoff with jitter
+- permanent 4xx (bad request,  -> 'dead' right away, shown in the admin outbox view
+  forbidden, not found)
+Items that keep failing, flood limits included, become 'dead' after OUTBOX_MAX_ATTEMPTS.
+
+Every sent step (message, album, keyboard message) is recorded in published_messages
+right away, so a retry only sends what is missing: the rest of the first channel, and
+the copies that failed with a transient error.
+
+One worker serves every bot of the process (utils/tenants.py): each item is sent by
+the bot it was queued for.
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from aiogram.exceptions import TelegramRetryAfter
+from sqlalchemy import select, update, or_, and_
+
+from data.config import (ADMIN_IDS, OUTBOX_MAX_ATTEMPTS, OUTBOX_BACKOFF_BASE, OUTBOX_BACKOFF_MAX, OUTBOX_POLL_INTERVAL,
+                         PUBLISH_WORKERS)
+from database.db import get_db_session
+from database.models import OutboxItem, ScheduledPost
+from utils.publisher import (PERMANENT_ERRORS, CompiledPost, load_progress, publish_to_channels, record_sent,
+                             resolve_chat_ids)
+from utils.tenants import get_bot, primary_bot
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed item stays locked before another worker may take it over
+LOCK_SECONDS = 300
+# How long stop() waits for items being published before handing them back
+STOP_TIMEOUT = 30
+
+
+class PermanentPublishError(Exception):
+    pass
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: base * 2^(attempts-1), capped, randomized to 50-100%."""
+    delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+_wakeup = asyncio.Event()
+
+def notify():
+    """Wake the worker in this process (other processes pick items up on their next poll)."""
+    _wakeup.set()
+
+async def enqueue(payload: dict, requested_by: Optional[int] = None, scheduled_post_id: Optional[int] = None,
+                  delay: float = 0, bot_id: Optional[int] = None, publication_id: Optional[str] = None) -> int:
+    """`publication_id` is given for occurrences of recurring posts, which share their scheduled_post_id."""
+    async for session in get_db_session():
+        item = OutboxItem(
+            payload=payload,
+            bot_id=bot_id,
+            status='pending',
+            attempts=0,
+            next_attempt_at=_utcnow() + timedelta(seconds=delay),
+            requested_by=requested_by,
+            scheduled_post_id=scheduled_post_id,
+            publication_id=publication_id,
+        )
+        session.add(item)
+        await session.commit()
+        notify()
+        return item.id
+
+
+class OutboxWorker:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        # Claimed items waiting in executor lanes; keeps claims well inside LOCK_SECONDS
+        self._in_flight = asyncio.Semaphore(PUBLISH_WORKERS * 4)
+        self._running: Dict[asyncio.Task, int] = {}  # task -> outbox item id
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = STOP_TIMEOUT):
+        """Stop claiming, let claimed items finish, and hand back the ones that don't in time."""
+        if self._task:
+            self._task.cancel()
+        if not self._running:
+            return
+        running = dict(self._running)
+        _, unfinished = await asyncio.wait(running, timeout=timeout)
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.wait(unfinished)
+            # Recorded steps are skipped on the next attempt, so these can be taken again at once
+            await self._release([running[task] for task in unfinished])
+
+    async def _release(self, item_ids: List[int]):
+        async for session in get_db_session():
+            await session.execute(
+                update(OutboxItem).where(OutboxItem.id.in_(item_ids), OutboxItem.status == 'processing')
+                .values(status='pending', locked_until=None, next_attempt_at=_utcnow())
+            )
+            await session.commit()
+
+    async def _run(self):
+        while True:
+            try:
+                for item_id in await self._due_ids():
+                    await self._in_flight.acquire()
+                    if not await self._claim(item_id):
+                        self._in_flight.release()
+                        continue
+                    try:
+                        item, chat_ids = await self._load(item_id)
+                    except Exception:
+                        self._in_flight.release()
+                        raise
+                    # Tasks start in creation order and submit to their lane before awaiting,
+                    # so items for the same channel are published in due order
+                    task = asyncio.create_task(self.process(item, chat_ids))
+                    self._running[task] = item.id
+                    task.add_done_callback(self._task_done)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Outbox worker error: %s", e)
+
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def _task_done(self, task: asyncio.Task):
+        self._running.pop(task, None)
+        self._in_flight.release()
+
+    async def _load(self, item_id: int):
+        async for session in get_db_session():
+            item = await session.get(OutboxItem, item_id)
+            chat_ids = await resolve_chat_ids(session, item.payload.get('channel_ids', []))
+            return item, chat_ids
+
+    async def _due_ids(self) -> List[int]:
+        now = _utcnow()
+        async for session in get_db_session():
+            result = await session.execute(
+                select(OutboxItem.id)
+                .where(or_(
+                    and_(OutboxItem.status == 'pending', OutboxItem.next_attempt_at <= now),
+                    # Item of a worker that died mid-publish
+                    and_(OutboxItem.status == 'processing', OutboxItem.locked_until < now),
+                ))
+                .order_by(OutboxItem.next_attempt_at, OutboxItem.id)
+                .limit(100)
+            )
+            return list(result.scalars().all())
+        return []
+
+    async def _claim(self, item_id: int) -> bool:
+        now = _utcnow()
+        async for session in get_db_session():
+            result = await session.execute(
+                update(OutboxItem)
+                .where(OutboxItem.id == item_id, or_(
+                    and_(OutboxItem.status == 'pending', OutboxItem.next_attempt_at <= now),
+                    and_(OutboxItem.status == 'processing', OutboxItem.locked_until < now),
+                ))
+                .values(status='processing', locked_until=now + timedelta(seconds=LOCK_SECONDS),
+                        attempts=OutboxItem.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            return result.rowcount == 1
+        return False
+
+    async def _publish(self, item: OutboxItem, chat_ids: List[int]):
+        payload = item.payload
+        bot = get_bot(item.bot_id)
+        if bot is None:
+            raise PermanentPublishError(f"Bot {item.bot_id} is not configured in BOT_TOKENS")
+        if not chat_ids:
+            raise PermanentPublishError("No channel to publish to (missing or bot has no posting rights)")
+
+        compiled = CompiledPost(payload.get('content'), payload.get('buttons', []))
+        publication_id = item.publication_id or (
+            f"scheduled:{item.scheduled_post_id}" if item.scheduled_post_id else f"outbox:{item.id}"
+        )
+
+        async def on_sent(chat_id: int, sent):
+            await record_sent(publication_id, chat_id, sent, bot.id)
+
+        result = await publish_to_channels(
+            bot, chat_ids, compiled,
+            is_silent=payload.get('is_silent', False),
+            is_pinned=payload.get('is_pinned', False),
+            done=await load_progress(publication_id),
+            on_sent=on_sent,
+        )
+        return result, publication_id
+
+    async def process(self, item: OutboxItem, chat_ids: List[int]):
+        try:
+            result, publication_id = await self._publish(item, chat_ids)
+        except (PermanentPublishError, ValueError, *PERMANENT_ERRORS) as e:
+            await self._dead(item, str(e))
+        except Exception as e:
+            # RetryAfter, network / server errors and anything unexpected: try again, within the attempts budget
+            if item.attempts >= OUTBOX_MAX_ATTEMPTS:
+                await self._dead(item, str(e))
+            elif isinstance(e, TelegramRetryAfter):
+                await self._retry(item, f"RetryAfter {e.retry_after}s", e.retry_after)
+            else:
+                await self._retry(item, str(e), backoff_delay(item.attempts))
+        else:
+            errors = "; ".join(f"{chat_id}: {error}" for chat_id, error in result.errors.items()) or None
+            if result.retry and item.attempts < OUTBOX_MAX_ATTEMPTS:
+                # Only the failed copies are sent again, the rest is recorded
+                delay = max((e.retry_after for e in result.retry.values() if isinstance(e, TelegramRetryAfter)),
+                            default=backoff_delay(item.attempts))
+                await self._retry(item, errors, delay)
+                return
+            await self._finish(item, 'done', errors, publication_id)
+            if item.requested_by:
+                from utils.texts import get_text
+                from handlers.base import get_lang
+                text = await get_text('post_published', await get_lang(item.requested_by))
+                if errors:
+                    text += f"\n\n❌ {errors}"
+                await self._notify(item, item.requested_by, text)
+            elif errors:
+                await self._notify_admins(item, f"⚠️ Scheduled post {item.scheduled_post_id} was published, "
+                                          f"but not to every channel:\n❌ {errors}")
+
+    async def _retry(self, item: OutboxItem, error: str, delay: float):
+        logger.warning("Outbox item %s attempt %s failed (%s), retrying in %.0fs", item.id, item.attempts, error, delay,
+                       extra={'post_id': item.scheduled_post_id})
+        async for session in get_db_session():
+            await session.execute(
+                update(OutboxItem).where(OutboxItem.id == item.id)
+                .values(status='pending', locked_until=None, last_error=error,
+                        next_attempt_at=_utcnow() + timedelta(seconds=delay))
+            )
+            await session.commit()
+
+    async def _dead(self, item: OutboxItem, error: str):
+        logger.error("Outbox item %s is dead after %s attempts: %s", item.id, item.attempts, error,
+                     extra={'post_id': item.scheduled_post_id})
+        await self._finish(item, 'dead', error)
+        if item.requested_by:
+            await self._notify(item, item.requested_by, f"❌ Failed to publish: {error}")
+        else:
+            await self._notify_admins(item, f"❌ Failed to publish scheduled post {item.scheduled_post_id}: {error}")
+
+    async def _finish(self, item: OutboxItem, status: str, error: Optional[str], publication_id: Optional[str] = None):
+        async for session in get_db_session():
+            await session.execute(
+                update(OutboxItem).where(OutboxItem.id == item.id)
+                .values(status=status, locked_until=None, last_error=error, publication_id=publication_id)
+            )
+            if item.scheduled_post_id:
+                # A recurring post has already moved on to its next occurrence
+                await session.execute(
+                    update(ScheduledPost)
+                    .where(ScheduledPost.id == item.scheduled_post_id, ScheduledPost.recurrence.is_(None))
+                    .values(status='published' if status == 'done' else 'failed')
+                )
+            await session.commit()
+
+    async def _notify(self, item: OutboxItem, chat_id: int, text: str):
+        # Through the item's bot, the one the admin used; any bot if that one isn't served here
+        bot = get_bot(item.bot_id) or primary_bot()
+        if bot is None:
+            return
+        try:
+            await bot.send_message(chat_id, text, parse_mode=None)
+        except Exception as e:
+            logger.warning("Failed to notify %s: %s", chat_id, e)
+
+    async def _notify_admins(self, item: OutboxItem, text: str):
+        # Scheduled posts have no requester; their failures go to every admin
+        for admin_id in ADMIN_IDS:
+            await self._notify(item, admin_id, text)
+
+
+async def retry_dead(item_id: int, bot_id: int) -> bool:
+    """Admin action: put a dead item of this bot back in the queue with a fresh attempt budget."""
+    async for session in get_db_session():
+        result = await session.execute(
+            update(OutboxItem).where(OutboxItem.id == item_id, OutboxItem.bot_id == bot_id, OutboxItem.status == 'dead')
+            .values(status='pending', attempts=0, next_attempt_at=_utcnow(), last_error=None)
+        )
+        await session.commit()
+        notify()
+        return result.rowcount == 1
+    return False
+
+async def stuck_items(bot_id: int, limit: int = 20) -> List[OutboxItem]:
+    """Dead items and pending items of this bot that already failed at least once."""
+    async for session in get_db_session():
+        result = await session.execute(
+            select(OutboxItem)
+            .where(OutboxItem.bot_id == bot_id)
+            .where(or_(OutboxItem.status == 'dead', and_(OutboxItem.status.in_(('pending', 'processing')), OutboxItem.attempts > 0)))
+            .order_by(OutboxItem.id.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    return []
@@ -0,0 +1,180 @@
+"""
+Typed post model and its versioned codec.
+
+Post content is one of `TextContent`, `MediaContent` or `Album`; buttons are `Button`.
+The classes use __slots__ and are built once per decode, so renderers dispatch on
+`content.kind` instead of re-running isinstance chains over dicts.
+
+Encoded form (stored in FSM data and in the JSON columns), version 1:
+
+    text:   {"v": 1, "text": "<html>", "entities": [...]}
+    media:  {"v": 1, "type": "photo", "file_id": "...", "caption": "...", "caption_entities": [...]}
+    album:  {"v": 1, "type": "album", "items": [<media without "v">, ...]}
+    button: {"type": "url" | "webapp" | "alert", "text": "...", "url": ..., "alert_id": ..., "alert_text": ...}
+
+Optional keys are left out when empty. `decode_content` also accepts the legacy
+shapes (bare HTML string, {"text"}, single media dict, list of media dicts), so
+drafts and rows written before the migration keep working.
+"""
+import re
+from typing import Any, Iterable, List, Optional, Union
+from urllib.parse import urlparse
+
+CODEC_VERSION = 1
+MEDIA_TYPES = ('photo', 'video', 'document', 'audio')
+BUTTON_TYPES = ('url', 'webapp', 'alert')
+# callback_data of alert buttons is this prefix + alert id; anyone who sees the post can press them
+ALERT_CALLBACK_PREFIX = 'alert_'
+
+_TAGS = re.compile(r'<[^<]+?>')
+
+
+class TextContent:
+    __slots__ = ('text', 'entities')
+    kind = 'text'
+
+    def __init__(self, text: str, entities: Optional[list] = None):
+        self.text = text
+        self.entities = entities or None
+
+    @property
+    def caption(self) -> str:
+        return self.text
+
+    def file_ids(self) -> List[str]:
+        return []
+
+    def with_text(self, text: str) -> 'TextContent':
+        return TextContent(text)
+
+    def to_dict(self) -> dict:
+        data = {'v': CODEC_VERSION, 'text': self.text}
+        if self.entities:
+            data['entities'] = self.entities
+        return data
+
+
+class MediaContent:
+    __slots__ = ('type', 'file_id', 'caption', 'caption_entities')
+    kind = 'media'
+
+    def __init__(self, type: str, file_id: str, caption: Optional[str] = None, caption_entities: Optional[list] = None):
+        if type not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported content type: {type}")
+        if not file_id:
+            raise ValueError(f"{type} without file_id")
+        self.type = type
+        self.file_id = file_id
+        self.caption = caption or None
+        self.caption_entities = caption_entities or None
+
+    def file_ids(self) -> List[str]:
+        return [self.file_id]
+
+    def with_text(self, text: str) -> 'MediaContent':
+        return MediaContent(self.type, self.file_id, text)
+
+    def item(self) -> dict:
+        data = {'type': self.type, 'file_id': self.file_id}
+        if self.caption:
+            data['caption'] = self.caption
+        if self.caption_entities:
+            data['caption_entities'] = self.caption_entities
+        return data
+
+    def to_dict(self) -> dict:
+        return {'v': CODEC_VERSION, **self.item()}
+
+
+class Album:
+    __slots__ = ('items',)
+    kind = 'album'
+
+    def __init__(self, items: Iterable[MediaContent]):
+        self.items = tuple(items)
+        if not self.items:
+            raise ValueError("Album without media")
+
+    @property
+    def caption(self) -> Optional[str]:
+        # Telegram shows the caption of the first captioned item under the album
+        return next((item.caption for item in self.items if item.caption), None)
+
+    def file_ids(self) -> List[str]:
+        return [item.file_id for item in self.items]
+
+    def with_text(self, text: str) -> 'Album':
+        first, *rest = self.items
+        return Album([first.with_text(text), *rest])
+
+    def to_dict(self) -> dict:
+        return {'v': CODEC_VERSION, 'type': 'album', 'items': [item.item() for item in self.items]}
+
+
+Content = Union[TextContent, MediaContent, Album]
+
+
+class Button:
+    __slots__ = ('type', 'text', 'url', 'alert_id', 'alert_text')
+
+    def __init__(self, type: str, text: str, url: Optional[str] = None, alert_id: Optional[str] = None,
+                 alert_text: Optional[str] = None):
+        if type not in BUTTON_TYPES:
+            raise ValueError(f"Unsupported button type: {type}")
+        self.type = type
+        self.text = text
+        self.url = url
+        self.alert_id = alert_id
+        self.alert_text = alert_text
+
+    def to_dict(self) -> dict:
+        data = {'type': self.type, 'text': self.text}
+        for key in ('url', 'alert_id', 'alert_text'):
+            value = getattr(self, key)
+            if value is not None:
+                data[key] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Button':
+        return cls(data['type'], data.get('text', ''), data.get('url'), data.get('alert_id'), data.get('alert_text'))
+
+
+def valid_button_url(button_type: str, url: Any) -> bool:
+    """Web apps must be https; url buttons may also be http or tg:// links."""
+    parsed = urlparse(url if isinstance(url, str) else '')
+    schemes = ('https',) if button_type == 'webapp' else ('http', 'https', 'tg')
+    return parsed.scheme in schemes and (parsed.scheme == 'tg' or bool(parsed.netloc))
+
+
+def _media(data: dict) -> MediaContent:
+    return MediaContent(data.get('type'), data.get('file_id'), data.get('caption'), data.get('caption_entities'))
+
+def decode_content(raw: Any) -> Content:
+    """Encoded (any version) or legacy content -> typed content. Typed input is returned as is."""
+    if isinstance(raw, (TextContent, MediaContent, Album)):
+        return raw
+    if isinstance(raw, dict):
+        if 'text' in raw:
+            return TextContent(raw.get('text') or "", raw.get('entities'))
+        if raw.get('type') == 'album':
+            return Album(_media(item) for item in raw.get('items', []))
+        return _media(raw)
+    if isinstance(raw, str):  # Legacy text (HTML)
+        return TextContent(raw)
+    if isinstance(raw, list):  # Legacy album; unknown item types were never sendable
+        return Album(_media(item) for item in raw if item.get('type') in MEDIA_TYPES)
+    raise ValueError("Post has no content")
+
+def encode_content(content: Any) -> dict:
+    return decode_content(content).to_dict()
+
+def decode_buttons(raw: Optional[list]) -> List[Button]:
+    return [button if isinstance(button, Button) else Button.from_dict(button) for button in raw or []]
+
+def encode_buttons(buttons: Optional[list]) -> List[dict]:
+    return [button.to_dict() for button in decode_buttons(buttons)]
+
+def plain_text(content: Any) -> str:
+    """Text or caption without HTML tags (translation, previews)."""
+    return _TAGS.sub('', decode_content(content).caption or "")
@@ -0,0 +1,153 @@
+"""
+Pre-flight checks for scheduled posts, PREFLIGHT_MINUTES before their run_date.
+
+A periodic job looks at pending posts that become due soon and checks what would
+otherwise only fail at the publishing second: the bot can still post in every target
+channel, every file_id still resolves, and button URLs are well-formed. Posts that
+pass are compiled and cached for the dispatcher; problems are reported to the admins
+while there is still time to fix them. Each bot checks its own posts.
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from sqlalchemy import select
+
+from data.config import ADMIN_IDS, PREFLIGHT_MINUTES
+from database.db import get_db_session
+from database.models import ScheduledPost, Channel
+from utils.channel_health import member_rights
+from utils.post_model import decode_content, valid_button_url
+from utils.publisher import CompiledPost
+from utils.rate_limiter import rate_limiter
+from utils.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+# post id -> (compiled post, monotonic time it was cached)
+_compiled: Dict[int, Tuple[CompiledPost, float]] = {}
+# Posts already checked, so admins are alerted once per post
+_checked: Dict[int, float] = {}
+# Entries for posts that never got dispatched (deleted, skipped) are dropped after this
+_KEEP_SECONDS = PREFLIGHT_MINUTES * 60 * 3
+
+
+def take_compiled(post_id: int) -> Optional[CompiledPost]:
+    """Used by the dispatcher: the pre-compiled post, if pre-flight already built it."""
+    entry = _compiled.pop(post_id, None)
+    return entry[0] if entry else None
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def check_button_urls(buttons: list) -> List[str]:
+    problems = []
+    for btn in buttons or []:
+        if btn.get('type') not in ('url', 'webapp'):
+            continue
+        # Same rule as /import applies
+        if not valid_button_url(btn['type'], btn.get('url')):
+            problems.append(f"button '{btn.get('text')}' has an invalid URL: {btn.get('url')!r}")
+    return problems
+
+def _file_ids(content) -> List[str]:
+    try:
+        return decode_content(content).file_ids()
+    except ValueError:
+        # Reported by the CompiledPost build below
+        return []
+
+async def check_channel(bot: Bot, telegram_id: int) -> Optional[str]:
+    try:
+        await rate_limiter.acquire(bot_id=bot.id)
+        member = await bot.get_chat_member(telegram_id, bot.id)
+    except Exception as e:
+        return f"cannot access channel {telegram_id}: {e}"
+    can_post, _ = member_rights(member)
+    if not can_post:
+        return f"bot cannot post in channel {telegram_id} (status: {member.status})"
+    return None
+
+async def check_file(bot: Bot, file_id: str) -> Optional[str]:
+    try:
+        await rate_limiter.acquire(bot_id=bot.id)
+        await bot.get_file(file_id)
+    except Exception as e:
+        # getFile refuses files over 20 MB, but the file_id itself is fine for sending
+        if 'too big' in str(e).lower():
+            return None
+        return f"file {file_id[:16]}... is no longer valid: {e}"
+    return None
+
+async def _notify_admins(bot: Bot, text: str):
+    for admin_id in ADMIN_IDS:
+        try:
+            await bot.send_message(admin_id, text, parse_mode=None)
+        except Exception as e:
+            logger.warning("Failed to notify admin %s: %s", admin_id, e)
+
+async def run_preflight(bot: Bot) -> Dict[str, int]:
+    """Check every pending post of `bot` due within PREFLIGHT_MINUTES that hasn't been checked yet."""
+    now = _utcnow()
+    stale = time.monotonic() - _KEEP_SECONDS
+    for post_id in [post_id for post_id, (_, cached_at) in _compiled.items() if cached_at < stale]:
+        del _compiled[post_id]
+    for post_id in [post_id for post_id, checked_at in _checked.items() if checked_at < stale]:
+        del _checked[post_id]
+
+    async for session in get_db_session():
+        result = await session.execute(
+            select(ScheduledPost)
+            .where(ScheduledPost.bot_id == bot.id, ScheduledPost.status == 'pending',
+                   ScheduledPost.run_date <= now + timedelta(minutes=PREFLIGHT_MINUTES))
+            .order_by(ScheduledPost.run_date)
+        )
+        posts = [post for post in result.scalars().all() if post.id not in _checked]
+        if not posts:
+            return {'checked': 0, 'failed': 0}
+        channel_ids = {cid for post in posts for cid in [post.chat_id] + (post.options or {}).get('extra_channel_ids', [])}
+        result = await session.execute(select(Channel).where(Channel.id.in_(channel_ids)))
+        channels = {channel.id: channel for channel in result.scalars().all()}
+
+    # Each channel and file is checked once per run, however many posts use it
+    channel_problems: Dict[int, Optional[str]] = {}
+    file_problems: Dict[str, Optional[str]] = {}
+    failed = 0
+    for post in posts:
+        problems = []
+        for channel_id in [post.chat_id] + (post.options or {}).get('extra_channel_ids', []):
+            channel = channels.get(channel_id)
+            if channel is None:
+                problems.append(f"channel #{channel_id} no longer exists")
+                continue
+            if channel_id not in channel_problems:
+                channel_problems[channel_id] = await check_channel(bot, channel.telegram_id)
+            if channel_problems[channel_id]:
+                problems.append(f"{channel.title}: {channel_problems[channel_id]}")
+        for file_id in _file_ids(post.content):
+            if file_id not in file_problems:
+                file_problems[file_id] = await check_file(bot, file_id)
+            if file_problems[file_id]:
+                problems.append(file_problems[file_id])
+        problems.extend(check_button_urls(post.buttons))
+
+        if not problems:
+            try:
+                _compiled[post.id] = (CompiledPost(post.content, post.buttons), time.monotonic())
+            except Exception as e:
+                problems.append(f"post cannot be built: {e}")
+
+        _checked[post.id] = time.monotonic()
+        if problems:
+            failed += 1
+            lines = "\n".join(f"• {problem}" for problem in problems)
+            await _notify_admins(bot, f"⚠️ Post {post.id} due at {post.run_date:%d.%m.%Y %H:%M} UTC will likely fail:\n{lines}")
+
+    logger.info("Pre-flight: checked %s posts, %s with problems", len(posts), failed)
+    return {'checked': len(posts), 'failed': failed}
+
+def enable_preflight(bot: Bot, interval: int = 60):
+    scheduler.add_job(run_preflight, 'interval', seconds=interval, args=[bot], id=f'preflight_{bot.id}',
+                      jobstore='local', replace_existing=True, next_run_time=datetime.now(timezone.utc))
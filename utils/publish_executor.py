@@ -0,0 +1,96 @@
+"""
+Publish executor: one FIFO lane per target channel, one worker pool across lanes.
+
+A lane is handed to at most one worker at a time, so jobs for the same channel run
+strictly in submission order, while jobs for different channels run in parallel
+(up to PUBLISH_WORKERS at once). `submit` is synchronous, so the order in which
+callers submit is the order in which a lane runs its jobs.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from data.config import PUBLISH_WORKERS
+
+Job = Tuple[Callable[[], Awaitable[Any]], asyncio.Future, float]
+
+
+class Lane:
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.jobs: Deque[Job] = deque()
+        self.scheduled = False  # in the ready queue or being processed
+        self.processed = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+
+
+class PublishExecutor:
+    def __init__(self, workers: int = PUBLISH_WORKERS):
+        self.workers = workers
+        self.lanes: Dict[Hashable, Lane] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _ensure_started(self):
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, lane_key: Hashable, job: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Queue `job()` on the lane of `lane_key`; returns a future with its result."""
+        self._ensure_started()
+        lane = self.lanes.get(lane_key)
+        if lane is None:
+            lane = self.lanes[lane_key] = Lane(lane_key)
+        future = asyncio.get_running_loop().create_future()
+        lane.jobs.append((job, future, time.monotonic()))
+        if not lane.scheduled:
+            lane.scheduled = True
+            self._ready.put_nowait(lane)
+        return future
+
+    async def run(self, lane_key: Hashable, job: Callable[[], Awaitable[Any]]) -> Any:
+        return await self.submit(lane_key, job)
+
+    async def _worker(self):
+        while True:
+            lane = await self._ready.get()
+            job, future, enqueued_at = lane.jobs.popleft()
+            lane.last_wait = time.monotonic() - enqueued_at
+            lane.max_wait = max(lane.max_wait, lane.last_wait)
+            try:
+                if not future.cancelled():
+                    future.set_result(await job())
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                lane.processed += 1
+                if lane.jobs:
+                    # Back of the ready queue: other channels get their turn first
+                    self._ready.put_nowait(lane)
+                else:
+                    lane.scheduled = False
+
+    def stats(self) -> List[dict]:
+        """Per-lane queue depth and wait times (lanes are kept, one per channel ever used)."""
+        now = time.monotonic()
+        result = []
+        for key, lane in self.lanes.items():
+            oldest_wait = now - lane.jobs[0][2] if lane.jobs else 0.0
+            result.append({
+                'lane': key,
+                'depth': len(lane.jobs),
+                'active': lane.scheduled,
+                'oldest_wait': oldest_wait,
+                'last_wait': lane.last_wait,
+                'max_wait': lane.max_wait,
+                'processed': lane.processed,
+            })
+        result.sort(key=lambda item: (-item['depth'], -item['oldest_wait']))
+        return result
+
+
+executor = PublishExecutor()
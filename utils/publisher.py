@@ -0,0 +1,315 @@
+"""
+Shared publishing logic for `publish_now` and `publish_scheduled_post`.
+
+A post is compiled once into Bot API method calls. The first channel receives the
+full payload; every other channel gets a `copy_message`/`copy_messages` of what was
+just sent, with the inline keyboard passed again for each target, instead of
+re-uploading the whole media group and caption.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramUnauthorizedError
+from aiogram.methods import (
+    TelegramMethod, SendMessage, SendPhoto, SendVideo, SendDocument, SendAudio, SendMediaGroup,
+    CopyMessage, CopyMessages,
+)
+from sqlalchemy import select
+
+from database.db import get_db_session
+from database.models import PublishedMessage, Channel
+from handlers.callbacks import reconstruct_keyboard
+from utils.post_model import decode_content
+from utils.publish_executor import executor
+from utils.rate_limiter import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+INPUT_MEDIA = {
+    'photo': types.InputMediaPhoto,
+    'video': types.InputMediaVideo,
+    'document': types.InputMediaDocument,
+    'audio': types.InputMediaAudio,
+}
+SEND_SINGLE = {
+    'photo': (SendPhoto, 'photo'),
+    'video': (SendVideo, 'video'),
+    'document': (SendDocument, 'document'),
+    'audio': (SendAudio, 'audio'),
+}
+
+# (message_id, kind) where kind is 'content', 'album' or 'keyboard'; each kind is one send step
+SentMessages = List[Tuple[int, str]]
+# Awaited with (chat_id, messages) after every successful API call
+OnSent = Optional[Callable[[int, SentMessages], Awaitable[None]]]
+# Errors a later attempt can't fix
+PERMANENT_ERRORS = (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramUnauthorizedError)
+
+
+def _entities(raw) -> Optional[List[types.MessageEntity]]:
+    return [types.MessageEntity(**e) for e in raw] if raw else None
+
+
+class CompiledPost:
+    """Content + buttons turned into ready-to-send values, built once per post."""
+
+    def __init__(self, content, buttons: list):
+        self.markup = reconstruct_keyboard(buttons or [])
+        self.has_keyboard = bool(self.markup.inline_keyboard)
+        self.kind = 'text'
+        self.text = None
+        self.entities = None
+        self.media_type = None
+        self.file_id = None
+        self.caption = None
+        self.caption_entities = None
+        self.media_group = None
+
+        content = decode_content(content)
+        if content.kind == 'text':
+            self.text = content.text
+            self.entities = _entities(content.entities)
+        elif content.kind == 'album':
+            self.kind = 'album'
+            self.media_group = [
+                INPUT_MEDIA[item.type](
+                    media=item.file_id,
+                    caption=item.caption,
+                    caption_entities=_entities(item.caption_entities),
+                )
+                for item in content.items
+            ]
+        else:
+            self.kind = 'media'
+            self.media_type = content.type
+            self.file_id = content.file_id
+            self.caption = content.caption
+            self.caption_entities = _entities(content.caption_entities)
+
+    def send_methods(self, chat_id: int, is_silent: bool = False) -> List[Tuple[TelegramMethod, str]]:
+        markup = self.markup if self.has_keyboard else None
+        if self.kind == 'text':
+            return [(SendMessage(chat_id=chat_id, text=self.text, entities=self.entities,
+                                 reply_markup=markup, disable_notification=is_silent), 'content')]
+        if self.kind == 'media':
+            method, field = SEND_SINGLE[self.media_type]
+            return [(method(chat_id=chat_id, caption=self.caption, caption_entities=self.caption_entities,
+                            reply_markup=markup, disable_notification=is_silent, **{field: self.file_id}), 'content')]
+        # Albums can't carry an inline keyboard, buttons go in a separate message below
+        methods = [(SendMediaGroup(chat_id=chat_id, media=self.media_group, disable_notification=is_silent), 'album')]
+        if self.has_keyboard:
+            methods.append((SendMessage(chat_id=chat_id, text="⬇️", reply_markup=self.markup,
+                                        disable_notification=is_silent), 'keyboard'))
+        return methods
+
+
+async def resolve_chat_ids(session, channel_ids: list) -> List[int]:
+    """
+    Channel DB ids -> Telegram ids, keeping order (first one is the primary channel).
+    Channels where the health check found no posting rights are left out.
+    """
+    result = await session.execute(select(Channel).where(Channel.id.in_(channel_ids)))
+    by_id = {}
+    for channel in result.scalars().all():
+        if channel.can_post is False:
+            logger.warning("Skipping channel %s: %s", channel.title, channel.rights_error or 'no posting rights',
+                           extra={'channel_id': channel.telegram_id})
+            continue
+        by_id[channel.id] = channel.telegram_id
+    return [by_id[channel_id] for channel_id in dict.fromkeys(channel_ids) if channel_id in by_id]
+
+
+def payload_size(method: TelegramMethod) -> int:
+    return len(method.model_dump_json(exclude_none=True, exclude_defaults=True))
+
+
+class PublishResult:
+    def __init__(self):
+        self.sent: Dict[int, SentMessages] = {}
+        self.errors: Dict[int, str] = {}
+        # Copies that failed with a transient error (RetryAfter, network, server) and are worth retrying
+        self.retry: Dict[int, Exception] = {}
+        # API calls / payload bytes actually used vs. sending the full post to every channel
+        self.api_calls = 0
+        self.payload_bytes = 0
+        self.direct_api_calls = 0
+        self.direct_payload_bytes = 0
+
+    def stats_line(self) -> str:
+        return (f"{len(self.sent)} channels: {self.api_calls} API calls / {self.payload_bytes} bytes "
+                f"(direct send: {self.direct_api_calls} calls / {self.direct_payload_bytes} bytes)")
+
+
+async def call_api(bot: Bot, chat_id: int, method: TelegramMethod):
+    """Every outgoing channel call goes through the bot's global and per-channel rate limits."""
+    await rate_limiter.acquire(chat_id, bot.id)
+    return await bot(method)
+
+def _done_kinds(done: SentMessages) -> set:
+    return {kind for _, kind in done}
+
+async def _call_step(bot: Bot, chat_id: int, method: TelegramMethod, kind: str, on_sent: OnSent) -> SentMessages:
+    response = await call_api(bot, chat_id, method)
+    messages = response if isinstance(response, list) else [response]
+    sent = [(message.message_id, kind) for message in messages]
+    if on_sent is not None:
+        await on_sent(chat_id, sent)
+    return sent
+
+async def send_post(bot: Bot, chat_id: int, post: CompiledPost, is_silent: bool = False,
+                    result: Optional[PublishResult] = None, done: SentMessages = (),
+                    on_sent: OnSent = None) -> SentMessages:
+    """Send the steps of `post` not yet in `done`; returns the messages sent by this call."""
+    sent: SentMessages = []
+    skip = _done_kinds(done)
+    for method, kind in post.send_methods(chat_id, is_silent):
+        if kind in skip:
+            continue
+        if result is not None:
+            size = payload_size(method)
+            result.api_calls += 1
+            result.payload_bytes += size
+            result.direct_api_calls += 1
+            result.direct_payload_bytes += size
+        sent.extend(await _call_step(bot, chat_id, method, kind, on_sent))
+    return sent
+
+async def copy_post(bot: Bot, source_chat_id: int, source: SentMessages, chat_id: int, post: CompiledPost,
+                    is_silent: bool = False, result: Optional[PublishResult] = None, done: SentMessages = (),
+                    on_sent: OnSent = None) -> SentMessages:
+    """Copy already published messages into another channel, except the steps already in `done`."""
+    skip = _done_kinds(done)
+    album_ids = [message_id for message_id, kind in source if kind == 'album' and kind not in skip]
+    single = [(message_id, kind) for message_id, kind in source if kind != 'album' and kind not in skip]
+    markup = post.markup if post.has_keyboard else None
+
+    methods: List[Tuple[TelegramMethod, str]] = []
+    if album_ids:
+        methods.append((CopyMessages(chat_id=chat_id, from_chat_id=source_chat_id, message_ids=album_ids,
+                                     disable_notification=is_silent), 'album'))
+    for message_id, kind in single:
+        methods.append((CopyMessage(chat_id=chat_id, from_chat_id=source_chat_id, message_id=message_id,
+                                    reply_markup=markup, disable_notification=is_silent), kind))
+
+    sent: SentMessages = []
+    for method, kind in methods:
+        if result is not None:
+            result.api_calls += 1
+            result.payload_bytes += payload_size(method)
+        sent.extend(await _call_step(bot, chat_id, method, kind, on_sent))
+
+    if result is not None:
+        for method, _ in post.send_methods(chat_id, is_silent):
+            result.direct_api_calls += 1
+            result.direct_payload_bytes += payload_size(method)
+    return sent
+
+async def pin_first(bot: Bot, chat_id: int, sent: SentMessages):
+    if not sent:
+        return
+    try:
+        await rate_limiter.acquire(bot_id=bot.id)
+        await bot.pin_chat_message(chat_id, sent[0][0])
+    except Exception as e:
+        logger.warning("Failed to pin message: %s", e, extra={'channel_id': chat_id})
+
+def _in_order(post: CompiledPost, chat_id: int, messages: SentMessages) -> SentMessages:
+    order = [kind for _, kind in post.send_methods(chat_id)]
+    return sorted(messages, key=lambda message: order.index(message[1]) if message[1] in order else len(order))
+
+def is_transient(error: Exception) -> bool:
+    """RetryAfter, network and server errors may pass on a later attempt; permanent 4xx errors won't."""
+    return not isinstance(error, PERMANENT_ERRORS)
+
+async def publish_to_channels(bot: Bot, chat_ids: List[int], post: CompiledPost,
+                              is_silent: bool = False, is_pinned: bool = False,
+                              done: Optional[Dict[int, SentMessages]] = None,
+                              on_sent: OnSent = None) -> PublishResult:
+    """
+    Send to the first channel, then replicate to the rest by copying.
+    Each step runs on its channel's executor lane, so posts to one channel keep their
+    order; the copies to different channels run in parallel.
+
+    `done` holds what an earlier attempt already sent (see load_progress); those steps
+    are skipped. `on_sent` is awaited after every API call, so progress can be stored
+    before the next step.
+    A failure on the first channel raises; failures on copies are collected in
+    `result.errors`, the transient ones also in `result.retry`.
+    """
+    done = done or {}
+    result = PublishResult()
+    source_chat_id = chat_ids[0]
+
+    async def send_source():
+        before = done.get(source_chat_id, [])
+        sent = await send_post(bot, source_chat_id, post, is_silent, result, before, on_sent)
+        source = _in_order(post, source_chat_id, list(before) + sent)
+        # Pinned once the post is complete; an attempt that sent nothing new has nothing to pin
+        if is_pinned and sent:
+            await pin_first(bot, source_chat_id, source)
+        return source
+
+    # Submitted before the first await: the lane order follows the caller's order
+    source = await executor.submit(source_chat_id, send_source)
+    result.sent[source_chat_id] = source
+
+    def copy_job(chat_id: int):
+        async def job():
+            before = done.get(chat_id, [])
+            sent = await copy_post(bot, source_chat_id, source, chat_id, post, is_silent, result, before, on_sent)
+            if is_pinned and sent:
+                await pin_first(bot, chat_id, _in_order(post, chat_id, list(before) + sent))
+            return list(before) + sent
+        return job
+
+    targets = chat_ids[1:]
+    copies = await asyncio.gather(*(executor.submit(chat_id, copy_job(chat_id)) for chat_id in targets),
+                                  return_exceptions=True)
+    for chat_id, sent in zip(targets, copies):
+        if isinstance(sent, Exception):
+            logger.warning("Failed to replicate: %s", sent, extra={'channel_id': chat_id})
+            result.errors[chat_id] = str(sent)
+            if is_transient(sent):
+                result.retry[chat_id] = sent
+        else:
+            result.sent[chat_id] = sent
+
+    if len(chat_ids) > 1:
+        logger.info("Replicated post to %s", result.stats_line())
+    return result
+
+async def load_progress(publication_id: str) -> Dict[int, SentMessages]:
+    """Messages already sent for a publication, per channel, from an earlier (failed) attempt."""
+    progress: Dict[int, SentMessages] = {}
+    async for session in get_db_session():
+        result = await session.execute(
+            select(PublishedMessage.channel_id, PublishedMessage.message_id, PublishedMessage.kind)
+            .where(PublishedMessage.publication_id == publication_id)
+            .order_by(PublishedMessage.id)
+        )
+        for channel_id, message_id, kind in result:
+            progress.setdefault(channel_id, []).append((message_id, kind))
+    return progress
+
+async def record_sent(publication_id: str, chat_id: int, sent: SentMessages, bot_id: Optional[int] = None,
+                      attempts: int = 3):
+    """
+    Store the messages of one step. Retried a few times: once the step is sent, a lost
+    record would make the next attempt send it again.
+    """
+    for attempt in range(attempts):
+        try:
+            async for session in get_db_session():
+                session.add_all([
+                    PublishedMessage(publication_id=publication_id, bot_id=bot_id, channel_id=chat_id,
+                                     message_id=message_id, kind=kind)
+                    for message_id, kind in sent
+                ])
+                await session.commit()
+            return
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(0.5 * 2 ** attempt)
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from typing import Dict, Hashable
+
+from data.config import GLOBAL_RATE_PER_SECOND, CHANNEL_RATE_PER_MINUTE
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per `per` seconds, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, per: float = 1.0, capacity: float = None):
+        self.rate = rate / per
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1):
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    Bot API limits: a global bucket per bot plus a per-chat limit for outgoing channel
+    messages of each bot. Several bots in one process (utils/tenants.py) share the
+    limiter, each with its own budget.
+    """
+
+    def __init__(self, global_rate: float = GLOBAL_RATE_PER_SECOND, chat_rate_per_minute: float = CHANNEL_RATE_PER_MINUTE):
+        self.global_rate = global_rate
+        self.global_buckets: Dict[Hashable, TokenBucket] = {}
+        self.chat_rate_per_minute = chat_rate_per_minute
+        self.chat_buckets: Dict[Hashable, TokenBucket] = {}
+
+    async def acquire(self, chat_id: Hashable = None, bot_id: Hashable = None):
+        if chat_id is not None:
+            key = (bot_id, chat_id)
+            bucket = self.chat_buckets.get(key)
+            if bucket is None:
+                bucket = self.chat_buckets[key] = TokenBucket(self.chat_rate_per_minute, 60.0)
+            await bucket.acquire()
+        bucket = self.global_buckets.get(bot_id)
+        if bucket is None:
+            bucket = self.global_buckets[bot_id] = TokenBucket(self.global_rate, 1.0)
+        await bucket.acquire()
+
+
+rate_limiter = RateLimiter()
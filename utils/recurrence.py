@@ -0,0 +1,149 @@
+"""
+Recurring scheduled posts.
+
+A recurring post is a single `scheduled_posts` row with a cron rule (`recurrence`,
+five fields: minute hour day month weekday, weekday 0 or 7 = Sunday) and the timezone
+it is read in. When both day and weekday are set, both must match. Its `run_date`
+always holds the next occurrence in UTC, computed in advance, so the dispatcher finds
+it through the (status, run_date) index like any one-off post.
+Once an occurrence is sent (or handed to the outbox), all recurring rows of the batch
+move on to their next occurrence with one UPDATE and stay 'pending'. Occurrences missed
+while the bot was down are not sent one by one; the next one is after "now".
+
+Rules are matched against the local wall clock and only then converted to UTC, so
+"0 9 * * 1" in Europe/Berlin stays at 09:00 across DST changes. A wall time skipped by
+the spring change runs after the jump (02:30 -> 03:30); one repeated by the autumn
+change runs once, at its first occurrence.
+"""
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import pytz
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import case, update
+
+from database.claims import finish_posts
+from database.db import get_db_session
+from database.models import ScheduledPost
+from utils.scheduler import schedule_dispatch
+
+# Far enough for any rule that fires at all ("29 2" waits for a leap year)
+_MAX_STEPS = 1000
+# Cron weekday numbers: 0 (and 7) is Sunday
+_DAY_NAMES = ('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat')
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _day_number(value: str) -> int:
+    value = value.strip().lower()
+    if value.isdigit() and int(value) <= 7:
+        return int(value)
+    if value[:3] in _DAY_NAMES:
+        return _DAY_NAMES.index(value[:3])
+    raise ValueError(f"invalid weekday '{value}'")
+
+def _weekdays(field: str) -> str:
+    """Cron weekdays (0 or 7 = Sunday, names allowed) as day names; APScheduler counts from Monday."""
+    if field == '*':
+        return field
+    days = set()
+    for item in field.split(','):
+        span, _, step = item.partition('/')
+        if span == '*':
+            first, last = 0, 6
+        else:
+            start, _, end = span.partition('-')
+            first = _day_number(start)
+            last = _day_number(end) if end else (6 if step else first)
+        days.update(range(first, last + 1, int(step) if step else 1))
+    return ",".join(_DAY_NAMES[day % 7] for day in sorted(days))
+
+@lru_cache(maxsize=256)
+def _trigger(rule: str) -> CronTrigger:
+    # Evaluated in UTC, which has no DST: the times it yields are wall-clock times
+    try:
+        fields = rule.split()
+        if len(fields) != 5:
+            raise ValueError(f"expected 5 fields, got {len(fields)}")
+        minute, hour, day, month, weekday = fields
+        return CronTrigger(minute=minute, hour=hour, day=day, month=month, day_of_week=_weekdays(weekday),
+                           timezone=pytz.utc)
+    except ValueError as e:
+        raise ValueError(f"invalid repeat rule '{rule}': {e}")
+
+def _zone(tz_name: Optional[str]):
+    try:
+        return pytz.timezone(tz_name or 'UTC')
+    except pytz.UnknownTimeZoneError:
+        raise ValueError(f"unknown timezone '{tz_name}'")
+
+def _to_utc(wall: datetime, tz) -> datetime:
+    """Naive UTC of a local wall time, for times the DST change skips or repeats as well."""
+    try:
+        local = tz.localize(wall, is_dst=None)
+    except pytz.AmbiguousTimeError:
+        local = tz.localize(wall, is_dst=True)  # first of the two
+    except pytz.NonExistentTimeError:
+        local = tz.normalize(tz.localize(wall, is_dst=False))  # moved forward by the gap
+    return local.astimezone(pytz.utc).replace(tzinfo=None)
+
+def next_run(rule: str, tz_name: Optional[str], after: datetime) -> datetime:
+    """First occurrence of the rule strictly after `after`; both naive UTC."""
+    trigger, tz = _trigger(rule), _zone(tz_name)
+    wall = pytz.utc.localize(after).astimezone(tz).replace(tzinfo=None)
+    for _ in range(_MAX_STEPS):
+        fire = trigger.get_next_fire_time(None, pytz.utc.localize(wall) + timedelta(microseconds=1))
+        if fire is None:
+            break
+        wall = fire.replace(tzinfo=None)
+        run = _to_utc(wall, tz)
+        # After an autumn change the wall clock repeats an hour that is already behind us
+        if run > after:
+            return run
+    raise ValueError(f"repeat rule '{rule}' never fires")
+
+def first_run(rule: str, tz_name: Optional[str], start: datetime) -> datetime:
+    """First occurrence at or after `start` (naive UTC)."""
+    return next_run(rule, tz_name, start - timedelta(microseconds=1))
+
+def check_rule(rule: str, tz_name: Optional[str]) -> Optional[str]:
+    """Error message for a rule that can't be scheduled, None if it is fine."""
+    try:
+        next_run(rule, tz_name, _utcnow())
+    except ValueError as e:
+        return str(e)
+    return None
+
+async def advance(posts: List[ScheduledPost], owner: Optional[str] = None) -> Dict[int, datetime]:
+    """
+    Move recurring posts to their next occurrence after now, in one UPDATE, and schedule
+    the dispatch jobs. `owner` is the claim holder; without it the posts must be 'pending'.
+    Returns post id -> new run date.
+    """
+    now = _utcnow()
+    next_runs = {post.id: next_run(post.recurrence, post.timezone, max(post.run_date, now))
+                 for post in posts if post.recurrence}
+    if not next_runs:
+        return {}
+    claimed = ((ScheduledPost.status == 'publishing', ScheduledPost.claimed_by == owner) if owner
+               else (ScheduledPost.status == 'pending',))
+    async for session in get_db_session():
+        await session.execute(
+            update(ScheduledPost)
+            .where(ScheduledPost.id.in_(next_runs), *claimed)
+            .values(run_date=case(next_runs, value=ScheduledPost.id), status='pending',
+                    claimed_by=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    for run_date in sorted(set(next_runs.values())):
+        schedule_dispatch(run_date)
+    return next_runs
+
+async def finish_or_advance(posts: List[ScheduledPost], status: str, owner: str):
+    """Claimed posts are done with this occurrence: one-off ones get `status`, recurring ones move on."""
+    await finish_posts([post.id for post in posts if not post.recurrence], status, owner)
+    await advance(posts, owner)
@@ -0,0 +1,190 @@
+"""
+Retention for finished posts and unused alerts.
+
+Once per RETENTION_INTERVAL_HOURS:
+1. Finished posts (see FINISHED) whose run date is older than RETENTION_DAYS are moved, in
+   batches of RETENTION_BATCH (one short transaction each), to `scheduled_posts_archive`
+   as compact rows (kind, text preview, buttons). With RETENTION_EXPORT_PATH set the
+   full rows are appended to that JSONL file first.
+2. Alerts no post, outbox item, draft or recent archive row refers to are deleted.
+   Alerts from before retention existed (created_at NULL) are never deleted: nothing
+   recorded which published posts use them.
+3. On SQLite, free pages are returned to the OS with `PRAGMA incremental_vacuum`, up to
+   VACUUM_STEP_PAGES pages per transaction. This needs auto_vacuum=INCREMENTAL, which an
+   existing file only gets through a one-time full VACUUM: python -m utils.retention --setup-vacuum
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import select, delete
+
+from data.config import (RETENTION_DAYS, ALERT_RETENTION_DAYS, RETENTION_BATCH, RETENTION_INTERVAL_HOURS,
+                         RETENTION_EXPORT_PATH, VACUUM_STEP_PAGES)
+from database.backend import is_sqlite, create_sync_engine
+from database.db import engine, get_db_session
+from database.models import ScheduledPost, ArchivedPost, AlertStorage, OutboxItem, FSMRecord
+from utils.cache import alert_cache
+from utils.json_codec import dumps
+from utils.post_model import decode_content, decode_buttons, plain_text
+from utils.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+# 'queued' rows this old were handed to the outbox long ago; its item holds the outcome.
+# 'cancelled' is a recurring post that was stopped, its run_date is the occurrence it did not reach
+FINISHED = ('published', 'failed', 'skipped', 'queued', 'cancelled')
+# Alerts this young may belong to a draft that is still being written (drafts in MemoryStorage are invisible here)
+ALERT_GRACE = timedelta(days=1)
+# auto_vacuum values of SQLite
+INCREMENTAL = 2
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _alert_ids(buttons) -> List[str]:
+    try:
+        return [button.alert_id for button in decode_buttons(buttons) if button.alert_id]
+    except (ValueError, KeyError, AttributeError):
+        return []
+
+def _archived(post: ScheduledPost) -> ArchivedPost:
+    try:
+        content = decode_content(post.content)
+        kind, preview = content.kind, plain_text(content)[:200]
+    except ValueError:
+        kind, preview = 'unknown', ""
+    return ArchivedPost(id=post.id, chat_id=post.chat_id, run_date=post.run_date, status=post.status,
+                        kind=kind, preview=preview, alert_ids=_alert_ids(post.buttons) or None,
+                        buttons=post.buttons or None)
+
+def _export(posts: Iterable[ScheduledPost], path: str):
+    with open(path, 'a', encoding='utf-8') as f:
+        for post in posts:
+            f.write(dumps({'id': post.id, 'chat_id': post.chat_id, 'run_date': post.run_date.isoformat(),
+                           'status': post.status, 'content': post.content, 'buttons': post.buttons,
+                           'options': post.options}) + "\n")
+
+async def archive_posts(days: int = RETENTION_DAYS, batch: int = RETENTION_BATCH,
+                        export_path: str = RETENTION_EXPORT_PATH) -> int:
+    """Move finished posts older than `days` to the archive; returns the number of rows moved."""
+    cutoff = _utcnow() - timedelta(days=days)
+    moved = 0
+    while True:
+        async for session in get_db_session():
+            result = await session.execute(
+                select(ScheduledPost)
+                .where(ScheduledPost.status.in_(FINISHED), ScheduledPost.run_date < cutoff)
+                .order_by(ScheduledPost.id)
+                .limit(batch)
+            )
+            posts = result.scalars().all()
+            if not posts:
+                return moved
+            if export_path:
+                await asyncio.to_thread(_export, posts, export_path)
+            session.add_all([_archived(post) for post in posts])
+            await session.execute(delete(ScheduledPost).where(ScheduledPost.id.in_([post.id for post in posts])))
+            await session.commit()
+        moved += len(posts)
+        if len(posts) < batch:
+            return moved
+        # Let other writers in between batches
+        await asyncio.sleep(0.05)
+
+async def _referenced_alerts(now: datetime) -> Set[str]:
+    referenced: Set[str] = set()
+    async for session in get_db_session():
+        for buttons in (await session.execute(select(ScheduledPost.buttons))).scalars():
+            referenced.update(_alert_ids(buttons))
+        for payload in (await session.execute(select(OutboxItem.payload))).scalars():
+            referenced.update(_alert_ids((payload or {}).get('buttons')))
+        # Drafts persisted by DatabaseStorage (worker mode)
+        for data in (await session.execute(select(FSMRecord.data))).scalars():
+            referenced.update(_alert_ids((data or {}).get('buttons')))
+        query = select(ArchivedPost.alert_ids).where(ArchivedPost.alert_ids.is_not(None))
+        if ALERT_RETENTION_DAYS:
+            query = query.where(ArchivedPost.run_date >= now - timedelta(days=ALERT_RETENTION_DAYS))
+        for alert_ids in (await session.execute(query)).scalars():
+            referenced.update(alert_ids)
+    return referenced
+
+async def prune_alerts(batch: int = RETENTION_BATCH) -> int:
+    """Delete alerts nothing refers to any more; returns the number deleted."""
+    now = _utcnow()
+    referenced = await _referenced_alerts(now)
+    async for session in get_db_session():
+        result = await session.execute(
+            select(AlertStorage.id)
+            # NULL: written before retention existed, may be on any published post
+            .where(AlertStorage.created_at.is_not(None), AlertStorage.created_at < now - ALERT_GRACE)
+        )
+        unused = [alert_id for alert_id in result.scalars() if alert_id not in referenced]
+
+    for start in range(0, len(unused), batch):
+        async for session in get_db_session():
+            await session.execute(delete(AlertStorage).where(AlertStorage.id.in_(unused[start:start + batch])))
+            await session.commit()
+        await asyncio.sleep(0)
+    if unused:
+        alert_cache.invalidate()
+    return len(unused)
+
+async def incremental_vacuum(step_pages: int = VACUUM_STEP_PAGES) -> int:
+    """Return free pages to the OS, up to `step_pages` per transaction; returns bytes reclaimed (SQLite only)."""
+    if not is_sqlite(str(engine.url)):
+        return 0
+    async with engine.connect() as conn:
+        if (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar() != INCREMENTAL:
+            logger.info("Incremental vacuum is off for this database, run: python -m utils.retention --setup-vacuum")
+            return 0
+        page_size = (await conn.exec_driver_sql("PRAGMA page_size")).scalar()
+        before = (await conn.exec_driver_sql("PRAGMA page_count")).scalar()
+        free = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+        # The pragma frees one page per step and has no result columns, so execute() stops
+        # after the first page; executescript() steps it to the end (and commits before it)
+        driver = (await conn.get_raw_connection()).driver_connection
+        while free:
+            await driver.executescript(f"PRAGMA incremental_vacuum({step_pages})")
+            await asyncio.sleep(0)
+            left = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+            if left >= free:
+                break
+            free = left
+        after = (await conn.exec_driver_sql("PRAGMA page_count")).scalar()
+        await conn.commit()
+    return (before - after) * page_size
+
+async def run_retention() -> Dict[str, int]:
+    report = {'archived': 0, 'alerts_pruned': 0, 'bytes_reclaimed': 0}
+    if RETENTION_DAYS:
+        report['archived'] = await archive_posts()
+    report['alerts_pruned'] = await prune_alerts()
+    report['bytes_reclaimed'] = await incremental_vacuum()
+    logger.info("Retention: archived %s posts, pruned %s alerts, reclaimed %s KiB",
+                report['archived'], report['alerts_pruned'], report['bytes_reclaimed'] // 1024)
+    return report
+
+def enable_retention(interval_hours: int = RETENTION_INTERVAL_HOURS):
+    # First run a few minutes after startup, away from catch-up and the first dispatches
+    scheduler.add_job(run_retention, 'interval', hours=interval_hours, id='retention', jobstore='local',
+                      replace_existing=True, next_run_time=datetime.now(timezone.utc) + timedelta(minutes=5))
+
+def setup_incremental_vacuum():
+    """One-time switch to auto_vacuum=INCREMENTAL; rewrites the whole file, run it while the bot is stopped."""
+    sync_engine = create_sync_engine()
+    with sync_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        print(f"auto_vacuum is now {conn.exec_driver_sql('PRAGMA auto_vacuum').scalar()} (2 = incremental)")
+    sync_engine.dispose()
+
+
+if __name__ == '__main__':
+    if '--setup-vacuum' in sys.argv:
+        setup_incremental_vacuum()
+    else:
+        asyncio.run(run_retention())
@@ -1,6 +1,11 @@
+import logging
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from data.config import DATABASE_URL
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.base import STATE_RUNNING
+from database.backend import create_sync_engine
+
+logger = logging.getLogger(__name__)
 
 # We can use SQLAlchemyJobStore or just memory if we rely on our DB for metadata.
 # Since we have `ScheduledPost` in our DB, we can use MemoryJobStore and reload on restart,
@@ -10,13 +15,63 @@ from data.config import DATABASE_URL
 # Let's use Memory for now and rely on "ScheduledPost" table to re-populate on startup if needed (advanced),
 # or just keep it simple. User requested "SQLite" so we can persist jobs there too.
 
-# Note: sqlite url for apscheduler might need adjustment.
+# The jobstore shares DATABASE_URL and its connection profile with the app (sync driver)
 jobstores = {
-    'default': SQLAlchemyJobStore(url=DATABASE_URL.replace("+aiosqlite", "")) 
+    'default': SQLAlchemyJobStore(engine=create_sync_engine()),
+    # Process-local housekeeping jobs that must not be shared through the DB
+    'local': MemoryJobStore(),
 }
 
 scheduler = AsyncIOScheduler(jobstores=jobstores, timezone="UTC")
 
-async def start_scheduler():
-    scheduler.start()
-    print("Scheduler started!")
\ No newline at end of file
+# Textual reference so jobs can be added without importing the handlers module
+PUBLISH_JOB = 'handlers.posting:publish_scheduled_post'
+# One job per run_date publishes every post due at that moment (see utils/dispatcher.py)
+DISPATCH_JOB = 'utils.dispatcher:dispatch_due_posts'
+
+def dispatch_job_id(run_date) -> str:
+    return f"dispatch_{run_date:%Y%m%d%H%M%S}"
+
+def schedule_dispatch(run_date):
+    """Posts scheduled for the same moment share one job; adding another one just replaces it."""
+    scheduler.add_job(DISPATCH_JOB, 'date', run_date=run_date, id=dispatch_job_id(run_date), replace_existing=True)
+
+async def start_scheduler(paused: bool = False):
+    # Worker processes start paused: they only write jobs into the shared jobstore,
+    # the front process is the one that actually runs them.
+    scheduler.start(paused=paused)
+    logger.info("Scheduler started!" if not paused else "Scheduler started (paused, jobstore writer only)")
+
+def _wakeup():
+    # No-op: running any job makes the scheduler re-read next run times from the jobstore
+    pass
+
+def enable_jobstore_polling(interval: int = 10):
+    """Pick up jobs added by other processes; APScheduler only wakes for its own add_job."""
+    scheduler.add_job(_wakeup, 'interval', seconds=interval, id='jobstore_poll', jobstore='local', replace_existing=True)
+
+async def recover_stale_posts():
+    """Re-queue posts left in 'publishing' by an instance that died before its lease ran out."""
+    from database.claims import recover_expired_leases
+    for post_id in await recover_expired_leases():
+        logger.warning("Recovered expired lease, re-scheduling", extra={'post_id': post_id})
+        scheduler.add_job(PUBLISH_JOB, 'date', args=[post_id], id=str(post_id), replace_existing=True)
+
+def enable_lease_recovery(interval: int = 60):
+    scheduler.add_job(recover_stale_posts, 'interval', seconds=interval, id='lease_recovery', jobstore='local', replace_existing=True)
+
+def add_publish_jobs(posts):
+    """
+    Register many ScheduledPost rows at once: one dispatch job per distinct run_date.
+    add_job wakes the scheduler every time, so processing is paused while the batch
+    is written and resumed once at the end.
+    """
+    was_running = scheduler.state == STATE_RUNNING
+    if was_running:
+        scheduler.pause()
+    try:
+        for run_date in sorted({post.run_date for post in posts}):
+            schedule_dispatch(run_date)
+    finally:
+        if was_running:
+            scheduler.resume()
@@ -0,0 +1,37 @@
+"""
+Startup phase timer.
+
+`main` marks each phase (imports, DB, scheduler, getMe) and logs one line at boot;
+a warning is printed when the total exceeds STARTUP_BUDGET_SECONDS. The end-to-end
+cold-start check is benchmarks/startup.py.
+"""
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from data.config import STARTUP_BUDGET_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else time.perf_counter()
+        self._last = self.started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str):
+        """Close `phase`: the time since the previous mark (or process start) is booked on it."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self._last - self.started
+
+    def report(self, budget: float = STARTUP_BUDGET_SECONDS):
+        phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.phases)
+        logger.info("Startup: %s, total %.2fs", phases, self.total)
+        if budget and self.total > budget:
+            logger.warning("Startup took %.2fs, over the %.1fs budget", self.total, budget)
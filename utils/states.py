@@ -22,6 +22,16 @@ class PostState(StatesGroup):
     # Scheduling
     waiting_for_timezone = State()
     waiting_for_schedule_time = State()
+    waiting_for_recurrence = State()
 
 class ChannelState(StatesGroup):
-    waiting_for_channel_forward = State()
\ No newline at end of file
+    waiting_for_channel_forward = State()
+    # Title prefix for the channel picker; the previous state is restored afterwards
+    waiting_for_search = State()
+
+class ImportState(StatesGroup):
+    waiting_for_file = State()
+class PublishedState(StatesGroup):
+    # Bulk edit of an already published post (publication id kept in FSM data)
+    waiting_for_text = State()
+    waiting_for_buttons = State()
@@ -0,0 +1,66 @@
+"""
+Bots served by this process (multi-bot tenancy).
+
+BOT_TOKENS may list several bots. They are polled by one Dispatcher (the routers are
+module-level, so there is one set of handlers for all of them) and share everything
+else: the DB engine, the scheduler and its dispatch job, the outbox worker, the
+publish executor, the caches and the rate limiter (which keeps one global bucket per
+bot, as Telegram's limits are per bot).
+
+Rows that belong to one bot carry its id in `bot_id`: channels, settings, scheduled
+posts, outbox items, published messages and the media library. Handlers scope their
+queries with the id of the bot that received the update; background jobs pick the bot
+of each row. Users (language) and alerts are shared by all bots.
+"""
+import logging
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from sqlalchemy import update
+
+from database.db import get_db_session
+from database.models import Channel, OutboxItem, PublishedMessage, ScheduledPost, Settings
+
+logger = logging.getLogger(__name__)
+
+# Tables whose rows written before tenancy (bot_id NULL) belong to the primary bot
+SCOPED_MODELS = (Channel, Settings, ScheduledPost, PublishedMessage, OutboxItem)
+
+# bot id -> Bot, in registration order (the first one is the primary bot)
+_bots: Dict[int, Bot] = {}
+
+
+def register_bot(bot: Bot):
+    """The process that runs scheduled jobs and the outbox registers every bot it serves."""
+    _bots[bot.id] = bot
+
+def unregister_bot(bot_id: int):
+    _bots.pop(bot_id, None)
+
+def get_bot(bot_id: Optional[int]) -> Optional[Bot]:
+    """The bot of a row; rows without a bot belong to the primary one. None if it isn't served here."""
+    if bot_id is None:
+        return primary_bot()
+    return _bots.get(bot_id)
+
+def primary_bot() -> Optional[Bot]:
+    return next(iter(_bots.values()), None)
+
+def all_bots() -> List[Bot]:
+    return list(_bots.values())
+
+async def adopt_unscoped_rows(bot_id: int) -> Dict[str, int]:
+    """Give rows without a bot (written before tenancy) to `bot_id`; one UPDATE per table."""
+    adopted = {}
+    async for session in get_db_session():
+        for model in SCOPED_MODELS:
+            result = await session.execute(
+                update(model).where(model.bot_id.is_(None)).values(bot_id=bot_id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                adopted[model.__tablename__] = result.rowcount
+        await session.commit()
+    if adopted:
+        logger.info("Rows without a bot assigned to bot %s: %s", bot_id, adopted)
+    return adopted
@@ -1,4 +1,11 @@
-# Simple localization dictionary
+import json
+import logging
+import os
+from string import Formatter
+
+logger = logging.getLogger(__name__)
+
+# Built-in catalog; compiled at import together with data/locales/*.json (see _compile)
 TEXTS = {
     'en': {
         'start_welcome': "Welcome to Posting Bot! 🚀\nSelect an option from the menu below.",
@@ -6,6 +13,7 @@ TEXTS = {
         'add_channel_prompt': "Please forward a message from the channel you want to add.\nMake sure I am an admin there first!",
         'channel_added': "✅ Channel '{title}' added successfully!",
         'channel_exists': "Channel already added!",
+        'channel_other_bot': "This channel is already served by another of our bots.",
         'not_admin': "I am not an admin in that channel. Please promote me and try again.",
         'select_channel': "Select a channel to post to:",
         'no_channels': "No channels connected. Please add a channel first.",
@@ -18,8 +26,15 @@ TEXTS = {
         'send_webapp_url': "Now send the <b>WebApp URL</b>:",
         'btn_added': "✅ Button added.",
         'post_published': "✅ Published successfully!",
+        'post_queued': "📤 Post queued for publishing. I'll let you know when it's out.",
         'post_scheduled': "✅ Post scheduled for {date}!",
         'schedule_prompt': "Enter date and time for publication.\nFormat: `DD.MM.YYYY HH:MM` (e.g. 31.12.2025 23:59)",
+        'repeat_prompt': "Send a repeat rule in cron format: minute hour day month weekday.\n"
+                         "`0 9 * * 1` is every Monday at 09:00, `30 8 * * *` every day at 08:30.\n"
+                         "The time is read in the timezone you enter when scheduling. Send `off` to publish once.",
+        'repeat_invalid': "Can't use this rule: {error}",
+        'repeat_set': "🔁 Repeats on: {rule}. Schedule the post to start; the first run is the first match from the date you enter.",
+        'repeat_off': "The post will be published once.",
         'invalid_date': "Invalid format. Please use `DD.MM.YYYY HH:MM`",
         'btn_translate_prompt': "Enter language code (e.g. 'en' for English, 'es' for Spanish) or just 'en':",
         'translation_added': "✅ Translation added.",
@@ -37,6 +52,11 @@ TEXTS = {
         'sub_check_btn': "🔗 Subscribe",
         'sub_check_verify': "✅ I have subscribed",
         'sub_check_fail': "❌ You are not subscribed yet. Please subscribe and try again.",
+        'import_prompt': "📥 Send a CSV or JSONL file with posts.\nColumns: channel, text, type, file_id, buttons, run_date, timezone",
+        'import_bad_file': "Please send a .csv or .jsonl document.",
+        'import_failed': "❌ Import rejected, nothing was saved:\n\n{errors}",
+        'channel_search_prompt': "🔍 Send the beginning of the channel title.",
+        'channels_found': "Channels found: {count}",
     },
     'ru': {
         'start_welcome': "Добро пожаловать в Posting Bot! 🚀\nВыберите опцию в меню ниже.",
@@ -44,6 +64,7 @@ TEXTS = {
         'add_channel_prompt': "Пожалуйста, перешлите сообщение из канала, который хотите добавить.\nУбедитесь, что я там админ!",
         'channel_added': "✅ Канал '{title}' успешно добавлен!",
         'channel_exists': "Канал уже добавлен!",
+        'channel_other_bot': "Этот канал уже обслуживает другой наш бот.",
         'not_admin': "Я не админ в этом канале. Пожалуйста, назначьте меня и попробуйте снова.",
         'select_channel': "Выберите канал для публикации:",
         'no_channels': "Нет подключенных каналов. Сначала добавьте канал.",
@@ -56,8 +77,15 @@ TEXTS = {
         'send_webapp_url': "Теперь отправьте <b>WebApp URL</b>:",
         'btn_added': "✅ Кнопка добавлена.",
         'post_published': "✅ Успешно опубликовано!",
+        'post_queued': "📤 Пост поставлен в очередь. Сообщу, когда он выйдет.",
         'post_scheduled': "✅ Пост отложен на {date}!",
         'schedule_prompt': "Введите дату и время публикации.\nФормат: `DD.MM.YYYY HH:MM` (например 31.12.2025 23:59)",
+        'repeat_prompt': "Отправьте правило повтора в формате cron: минута час день месяц день_недели.\n"
+                         "`0 9 * * 1` — каждый понедельник в 09:00, `30 8 * * *` — каждый день в 08:30.\n"
+                         "Время считается в часовом поясе, который вы укажете при планировании. Отправьте `off`, чтобы опубликовать один раз.",
+        'repeat_invalid': "Это правило не подходит: {error}",
+        'repeat_set': "🔁 Повтор: {rule}. Запланируйте пост, чтобы запустить его; первый выход — первое совпадение начиная с указанной даты.",
+        'repeat_off': "Пост будет опубликован один раз.",
         'invalid_date': "Неверный формат. Используйте `DD.MM.YYYY HH:MM`",
         'btn_translate_prompt': "Введите код языка (например 'en' для английского) или просто 'en':",
         'translation_added': "✅ Перевод добавлен.",
@@ -75,11 +103,78 @@ TEXTS = {
         'sub_check_btn': "🔗 Подписаться",
         'sub_check_verify': "✅ Я подписался",
         'sub_check_fail': "❌ Вы еще не подписались. Пожалуйста, подпишитесь и попробуйте снова.",
+        'import_prompt': "📥 Отправьте CSV или JSONL файл с постами.\nКолонки: channel, text, type, file_id, buttons, run_date, timezone",
+        'import_bad_file': "Пожалуйста, отправьте документ .csv или .jsonl.",
+        'import_failed': "❌ Импорт отклонен, ничего не сохранено:\n\n{errors}",
+        'channel_search_prompt': "🔍 Отправьте начало названия канала.",
+        'channels_found': "Найдено каналов: {count}",
     }
 }
 
-async def get_text(key: str, lang: str = 'ru', **kwargs) -> str:
-    # Fallback to English if key missing in lang, or ru if totally missing
-    lang_dict = TEXTS.get(lang, TEXTS['ru'])
-    text = lang_dict.get(key, TEXTS['en'].get(key, key))
-    return text.format(**kwargs)
\ No newline at end of file
+# Extra languages (or overrides) as data/locales/<lang>.json: {"key": "text", ...}
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'locales')
+DEFAULT_LANG = 'ru'  # used for unknown language codes
+FALLBACK_LANG = 'en'  # used for keys a language doesn't have
+
+def _load_locales(directory: str = LOCALES_DIR):
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        lang, ext = os.path.splitext(name)
+        if ext != '.json':
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                TEXTS.setdefault(lang, {}).update(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.error("Failed to load locale %s: %s", name, e)
+
+def _compile():
+    """
+    Flatten TEXTS into one table per language with fallbacks already applied, split
+    into static strings (returned as is) and strings with {fields} (formatted).
+    """
+    keys = set().union(*TEXTS.values())
+    static, formats = {}, {}
+    for lang, texts in TEXTS.items():
+        static[lang], formats[lang] = {}, {}
+        for key in keys:
+            text = texts.get(key, TEXTS[FALLBACK_LANG].get(key, key))
+            # Braces (fields or escaped {{ }}) need str.format, everything else is returned as is
+            (formats if '{' in text or '}' in text else static)[lang][key] = text
+    return static, formats
+
+_load_locales()
+STATIC, FORMATS = _compile()
+
+def text(key: str, lang: str = DEFAULT_LANG, **kwargs) -> str:
+    """Synchronous lookup in the compiled catalog."""
+    # Every language has both tables (possibly empty), so membership decides the fallback, not truthiness
+    if lang not in STATIC:
+        lang = DEFAULT_LANG
+    value = STATIC[lang].get(key)
+    if value is not None:
+        return value
+    template = FORMATS[lang].get(key)
+    return template.format(**kwargs) if template is not None else key
+
+def all_texts(key: str) -> frozenset:
+    """
+    The text of `key` in every language, for F.text.in_() filters on menu buttons.
+    Strings with only escaped braces are included as displayed; strings with {fields}
+    differ per call, so they cannot be matched and are left out.
+    """
+    texts = set()
+    for lang in STATIC:
+        if key in STATIC[lang]:
+            texts.add(STATIC[lang][key])
+        elif key in FORMATS[lang]:
+            template = FORMATS[lang][key]
+            if all(field is None for _, field, _, _ in Formatter().parse(template)):
+                texts.add(template.format())
+        else:
+            texts.add(key)
+    return frozenset(texts)
+
+async def get_text(key: str, lang: str = DEFAULT_LANG, **kwargs) -> str:
+    return text(key, lang, **kwargs)
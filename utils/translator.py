@@ -1,9 +1,14 @@
-from deep_translator import GoogleTranslator
+import logging
+
+logger = logging.getLogger(__name__)
+
 
 def translate_text(text: str, target: str = 'en') -> str:
+    # Imported on first use: deep_translator pulls in requests and bs4, which startup doesn't need
+    from deep_translator import GoogleTranslator
     try:
         translator = GoogleTranslator(source='auto', target=target)
         return translator.translate(text)
     except Exception as e:
-        print(f"Translation error: {e}")
+        logger.warning("Translation error: %s", e)
         return "Translation failed."
\ No newline at end of file
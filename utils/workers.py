@@ -0,0 +1,214 @@
+"""
+Worker mode.
+
+A front process receives updates (long polling or webhook) and shards them by
+`from_user.id` across N worker processes. All updates of one user land on the same
+worker, so FSM steps stay in order, while different users use different cores.
+Workers share FSM state through `DatabaseStorage` and the scheduler jobstore;
+the front process is the only one running scheduled jobs. With several BOT_TOKENS the
+front receives updates for every bot and tags each one with its bot id, so the worker
+feeds it to the dispatcher with the right Bot.
+"""
+import asyncio
+import logging
+import multiprocessing
+from typing import Dict, List, Tuple
+
+from aiogram import Bot
+from aiogram.methods import GetUpdates
+from aiogram.types import Update
+
+from data.config import WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT
+from utils.logs import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def shard_key(update: Update) -> int:
+    """User id for user-originated updates, chat id for the rest (channel posts etc.)."""
+    try:
+        event = update.event
+    except Exception:
+        return update.update_id
+    user = getattr(event, 'from_user', None)
+    if user:
+        return user.id
+    chat = getattr(event, 'chat', None)
+    if chat:
+        return chat.id
+    return update.update_id
+
+
+# --- Worker side ---
+
+def _worker_entry(index: int, queue, generation):
+    asyncio.run(_worker_main(index, queue, generation))
+
+async def _run_in_order(previous: asyncio.Task, dp, bot: Bot, update: Update):
+    # Wait for the previous update of the same user, whatever its outcome
+    if previous is not None and not previous.done():
+        await asyncio.wait({previous})
+    await dp.feed_update(bot, update)
+
+async def _worker_main(index: int, queue, generation):
+    setup_logging()
+    from main import create_bots, build_dispatcher
+    from database.fsm_storage import DatabaseStorage
+    from utils.cache import bind_generation
+    from utils.scheduler import start_scheduler
+    from utils.channel_registry import get_registry
+    from utils.click_stats import click_counter
+
+    bind_generation(generation)
+    bots = {bot.id: bot for bot in create_bots()}
+    dp = build_dispatcher(DatabaseStorage())
+    await start_scheduler(paused=True)
+    for bot_id in bots:
+        await get_registry(bot_id)
+    click_counter.start()
+
+    loop = asyncio.get_running_loop()
+    # (bot id, user id) -> latest update task
+    last_task: Dict[Tuple[int, int], asyncio.Task] = {}
+    logger.info("Worker %s started!", index)
+
+    try:
+        while True:
+            item = await loop.run_in_executor(None, queue.get)
+            if item is None:
+                break
+            bot_id, user_key, raw = item
+            bot = bots[bot_id]
+            update = Update.model_validate_json(raw, context={"bot": bot})
+
+            key = (bot_id, user_key)
+            task = asyncio.create_task(_run_in_order(last_task.get(key), dp, bot, update))
+            last_task[key] = task
+            task.add_done_callback(lambda t, k=key: last_task.pop(k, None) if last_task.get(k) is t else None)
+
+        if last_task:
+            await asyncio.wait(set(last_task.values()))
+    finally:
+        await click_counter.stop()
+        for bot in bots.values():
+            await bot.session.close()
+
+
+# --- Front side ---
+
+def _dispatch(bot: Bot, update: Update, queues: List) -> None:
+    key = shard_key(update)
+    queues[key % len(queues)].put((bot.id, key, update.model_dump_json(exclude_unset=True, by_alias=True)))
+
+async def _poll(bot: Bot, queues: List, allowed_updates: List[str]):
+    await bot.delete_webhook()
+    offset = None
+    while True:
+        try:
+            updates = await bot(GetUpdates(offset=offset, timeout=30, allowed_updates=allowed_updates))
+        except Exception as e:
+            logger.exception("Polling error: %s", e)
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            _dispatch(bot, update, queues)
+            offset = update.update_id + 1
+
+def webhook_path(bot: Bot, bots: List[Bot]) -> str:
+    """WEBHOOK_PATH for a single bot; with several, each gets WEBHOOK_PATH/<bot id>."""
+    return WEBHOOK_PATH if len(bots) == 1 else f"{WEBHOOK_PATH.rstrip('/')}/{bot.id}"
+
+async def _serve_webhook(bots: List[Bot], queues: List, allowed_updates: List[str]):
+    from aiohttp import web
+
+    def handler(bot: Bot):
+        async def handle(request: web.Request) -> web.Response:
+            if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+                return web.Response(status=401)
+            update = Update.model_validate(await request.json(), context={"bot": bot})
+            _dispatch(bot, update, queues)
+            return web.Response()
+        return handle
+
+    app = web.Application()
+    for bot in bots:
+        app.router.add_post(webhook_path(bot, bots), handler(bot))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    for bot in bots:
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + webhook_path(bot, bots),
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=allowed_updates,
+        )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+async def _front_main(queues: List):
+    from main import create_bots, build_dispatcher
+    from utils.scheduler import scheduler, start_scheduler, enable_jobstore_polling, enable_lease_recovery
+    from utils.catchup import reconcile_overdue_posts
+    from utils.outbox import OutboxWorker
+    from utils.preflight import enable_preflight
+    from utils.channel_health import enable_channel_health
+    from utils.retention import enable_retention
+    from utils.tenants import adopt_unscoped_rows
+
+    bots = create_bots()
+    # Only used to know which update types the routers need
+    allowed_updates = build_dispatcher().resolve_used_update_types()
+
+    await adopt_unscoped_rows(bots[0].id)
+    await start_scheduler(paused=True)
+    for bot in bots:
+        await reconcile_overdue_posts(bot)
+    scheduler.resume()
+    enable_jobstore_polling()
+    enable_lease_recovery()
+    for bot in bots:
+        enable_preflight(bot)
+        enable_channel_health(bot)
+    enable_retention()
+
+    # Workers only enqueue publish requests; the front process sends them
+    outbox_worker = OutboxWorker()
+    outbox_worker.start()
+
+    logger.info("Bot started! Front process, %s workers, %s bot(s).", len(queues), len(bots))
+    try:
+        if WEBHOOK_URL:
+            await _serve_webhook(bots, queues, allowed_updates)
+        else:
+            await asyncio.gather(*(_poll(bot, queues, allowed_updates) for bot in bots))
+    finally:
+        await outbox_worker.stop()
+        for bot in bots:
+            await bot.session.close()
+
+def run_sharded(workers: int):
+    setup_logging()
+    ctx = multiprocessing.get_context("spawn")
+    from utils.cache import GENERATION_SLOTS, bind_generation
+    # One invalidation counter per cache, shared by all processes
+    generation = ctx.Array('L', GENERATION_SLOTS)
+    queues = [ctx.Queue() for _ in range(workers)]
+    processes = [
+        ctx.Process(target=_worker_entry, args=(i, queues[i], generation), daemon=True, name=f"worker-{i}")
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    bind_generation(generation)
+    try:
+        asyncio.run(_front_main(queues))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for queue in queues:
+            queue.put(None)
+        for process in processes:
+            process.join(timeout=10)